@@ -0,0 +1,9 @@
+"""
+Benchmark suite for rtreelib. The suite measures insert throughput, window and point query latency, node splits, full
+scans, and get_levels, for each R-tree strategy, over a number of synthetic datasets and max_entries values. Results
+(along with the quality metrics of each tree, see RTreeBase.stats) are written as JSON, so that they can be compared
+between commits. To run the suite (from the root of the project):
+
+    python -m benchmarks --output results.json
+    python -m benchmarks --output new.json --compare results.json
+"""
@@ -0,0 +1,108 @@
+"""
+Runs the benchmark suite, writing the results as JSON and optionally comparing them against the results of a previous
+run. Run "python -m benchmarks --help" (from the root of the project) for the available options.
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+from typing import List, Optional
+from .datasets import DATASETS, load_csv
+from .suite import BENCHMARKS, STRATEGIES, Case, measure, measure_quality
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Runs the rtreelib benchmark suite.')
+    parser.add_argument('--size', type=int, default=1000, help='Number of entries in each dataset (default: 1000)')
+    parser.add_argument('--max-entries', type=int, nargs='+', default=[8, 32],
+                        help='Values of max_entries to measure (default: 8 32)')
+    parser.add_argument('--strategies', nargs='+', choices=list(STRATEGIES), default=list(STRATEGIES),
+                        help='Strategies to measure (default: all)')
+    parser.add_argument('--datasets', nargs='+', choices=list(DATASETS), default=list(DATASETS),
+                        help='Synthetic datasets to measure (default: all)')
+    parser.add_argument('--csv', action='append', default=[], metavar='PATH',
+                        help='Additional dataset to measure, loaded from a CSV file in the format of normal.csv '
+                             '(id,category,x,y). May be given more than once.')
+    parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS),
+                        help='Benchmarks to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs of each benchmark (default: 3)')
+    parser.add_argument('--output', '-o', help='Path of the JSON file to write the results to')
+    parser.add_argument('--compare', metavar='PATH', help='Path of a JSON file with results to compare against')
+    args = parser.parse_args(argv)
+
+    datasets = {name: DATASETS[name](args.size) for name in args.datasets}
+    for path in args.csv:
+        datasets[os.path.basename(path)] = load_csv(path, args.size)
+
+    results = []
+    quality = []
+    for strategy, (dataset, rects), max_entries in itertools.product(args.strategies, datasets.items(),
+                                                                      args.max_entries):
+        case = Case(strategy, dataset, max_entries, rects)
+        for name in args.benchmarks:
+            result = measure(name, case, args.repeat)
+            results.append(result)
+            print(f"{name:<13} {strategy:<8} {dataset:<10} M={max_entries:<4} "
+                  f"{result['us_per_op']:>12.1f} us/op", flush=True)
+        quality.append(measure_quality(case))
+
+    output = {'meta': _get_meta(args.size), 'results': results, 'quality': quality}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2)
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        print()
+        print(compare(baseline, output))
+    return 0
+
+
+def compare(baseline: dict, current: dict) -> str:
+    """
+    Compares two sets of results, returning a table with the ratio of the median time of each benchmark (current over
+    baseline) for the benchmarks that appear in both. A ratio above 1 means the current results are slower.
+    """
+    def key(result):
+        return result['benchmark'], result['strategy'], result['dataset'], result['max_entries'], result['size']
+
+    before = {key(result): result for result in baseline['results']}
+    lines = [f"Comparing against {baseline['meta'].get('commit') or 'baseline'}",
+             f"{'benchmark':<13} {'strategy':<8} {'dataset':<10} {'M':<5} {'before':>12} {'after':>12} {'ratio':>7}"]
+    for result in current['results']:
+        old = before.get(key(result))
+        if old is None:
+            continue
+        ratio = result['median'] / old['median'] if old['median'] > 0 else float('inf')
+        lines.append(f"{result['benchmark']:<13} {result['strategy']:<8} {result['dataset']:<10} "
+                     f"{result['max_entries']:<5} {old['us_per_op']:>9.1f} us {result['us_per_op']:>9.1f} us "
+                     f"{ratio:>7.2f}")
+    return '\n'.join(lines)
+
+
+def _get_meta(size: int) -> dict:
+    return {
+        'commit': _get_commit(),
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'size': size,
+    }
+
+
+def _get_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Synthetic datasets used by the benchmark suite. Each dataset is a list of small rectangles within the square
+[0, EXTENT] x [0, EXTENT], generated from a seeded random number generator so that results are comparable between runs.
+"""
+
+import csv
+import random
+from typing import List, Callable, Dict
+from rtreelib import Rect
+
+EXTENT = 1000.0
+ENTRY_SIZE = 0.1
+
+
+def uniform(count: int, seed: int = 0) -> List[Rect]:
+    """Rectangles whose positions are uniformly distributed."""
+    rnd = random.Random(seed)
+    return [_rect(rnd.uniform(0, EXTENT), rnd.uniform(0, EXTENT)) for _ in range(count)]
+
+
+def clustered(count: int, seed: int = 0, clusters: int = 20) -> List[Rect]:
+    """Rectangles grouped into a number of dense (normally-distributed) clusters at random locations."""
+    rnd = random.Random(seed)
+    centers = [(rnd.uniform(0, EXTENT), rnd.uniform(0, EXTENT)) for _ in range(clusters)]
+    rects = []
+    for _ in range(count):
+        cx, cy = rnd.choice(centers)
+        rects.append(_rect(_clamp(rnd.gauss(cx, EXTENT / 100)), _clamp(rnd.gauss(cy, EXTENT / 100))))
+    return rects
+
+
+def normal(count: int, seed: int = 0) -> List[Rect]:
+    """
+    Rectangles whose positions follow a single normal distribution centered in the middle of the extent (similar to
+    the normal.csv dataset used by tests/test_jh.py).
+    """
+    rnd = random.Random(seed)
+    return [_rect(_clamp(rnd.gauss(EXTENT / 2, EXTENT / 6)), _clamp(rnd.gauss(EXTENT / 2, EXTENT / 6)))
+            for _ in range(count)]
+
+
+def load_csv(path: str, count: int = None, size: float = 1e-7) -> List[Rect]:
+    """
+    Loads points from a CSV file with an "id,category,x,y" header (the format of normal.csv), as small rectangles.
+    :param path: Path of the CSV file
+    :param count: Maximum number of points to load. Optional (defaults to loading all points).
+    :param size: Width and height of the rectangle of each point. Defaults to 1e-7 (as in tests/test_jh.py, where the
+        coordinates are in degrees).
+    """
+    rects = []
+    with open(path, 'r', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for _, _, x, y in reader:
+            if count is not None and len(rects) >= count:
+                break
+            x, y = float(x), float(y)
+            rects.append(Rect(x, y, x + size, y + size))
+    return rects
+
+
+DATASETS: Dict[str, Callable[[int], List[Rect]]] = {
+    'uniform': uniform,
+    'clustered': clustered,
+    'normal': normal,
+}
+
+
+def _rect(x: float, y: float) -> Rect:
+    return Rect(x, y, x + ENTRY_SIZE, y + ENTRY_SIZE)
+
+
+def _clamp(value: float) -> float:
+    return min(max(value, 0.0), EXTENT - ENTRY_SIZE)
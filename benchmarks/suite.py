@@ -0,0 +1,295 @@
+"""
+Benchmarks measured by the suite. Each benchmark is a function that accepts a Case (the strategy, dataset, and
+max_entries being measured) and returns a Run: a function to time, and the number of operations it performs. Any setup
+(such as building the tree being queried) is done before returning, or in the optional setup function of the Run (which
+is called before each timed run), so that it is not included in the timings.
+"""
+
+import random
+import sqlite3
+import statistics
+import time
+from typing import Callable, Dict, List, NamedTuple, Type, Optional, Any
+from rtreelib import RTreeBase, RTreeGuttman, RStarTree, RTreeNode, RTreeEntry, Rect
+from rtreelib.binary import dumps_tree, loads_tree
+from rtreelib.models import union_all
+from rtreelib.sqlite import create_rtree_tables, drop_rtree_tables, export_to_sqlite
+from rtreelib.strategies.guttman import quadratic_split
+from rtreelib.strategies.rstar import rstar_split
+
+STRATEGIES: Dict[str, Type[RTreeBase]] = {
+    'guttman': RTreeGuttman,
+    'rstar': RStarTree,
+}
+
+SPLITS: Dict[Type[RTreeBase], Callable[[RTreeBase, RTreeNode], RTreeNode]] = {
+    RTreeGuttman: quadratic_split,
+    RStarTree: rstar_split,
+}
+
+QUERY_COUNT = 200
+SPLIT_COUNT = 200
+# Number of rounds of the random walk measured by the update benchmark (each moving every entry once), and the maximum
+# distance of each move along each axis, as a fraction of the side of the dataset's bounding rectangle
+UPDATE_ROUNDS = 2
+WALK_FRACTION = 0.002
+# Side of each query window, as a fraction of the side of the dataset's bounding rectangle (so that each window covers
+# about 0.25% of the dataset's area)
+WINDOW_FRACTION = 0.05
+
+
+class Case(NamedTuple):
+    strategy: str
+    dataset: str
+    max_entries: int
+    rects: List[Rect]
+
+
+class Run(NamedTuple):
+    fn: Callable[[], Any]
+    ops: int
+    setup: Optional[Callable[[], None]] = None
+
+
+class _TreeCache:
+    """
+    Caches the tree built for each case, so that it is only built once for all of the query benchmarks (reusing the
+    tree built by the insert benchmark, if it was run).
+    """
+
+    def __init__(self):
+        self._key = None
+        self._tree = None
+
+    def get(self, case: Case) -> RTreeBase:
+        if (case.strategy, case.dataset, case.max_entries, len(case.rects)) != self._key:
+            self.put(case, _build_tree(case))
+        return self._tree
+
+    def put(self, case: Case, tree: RTreeBase) -> None:
+        self._key = (case.strategy, case.dataset, case.max_entries, len(case.rects))
+        self._tree = tree
+
+
+_trees = _TreeCache()
+
+
+def bench_insert(case: Case) -> Run:
+    """Inserts every rectangle of the dataset into an empty tree (one entry at a time)."""
+    tree_cls = STRATEGIES[case.strategy]
+    rects = case.rects
+
+    def run():
+        tree = tree_cls(max_entries=case.max_entries)
+        for i, rect in enumerate(rects):
+            tree.insert(i, rect)
+        _trees.put(case, tree)
+
+    return Run(run, len(rects))
+
+
+def bench_insert_many(case: Case) -> Run:
+    """Inserts every rectangle of the dataset into an empty tree as a single batch (see RTreeBase.insert_many)."""
+    tree_cls = STRATEGIES[case.strategy]
+    items = list(enumerate(case.rects))
+
+    def run():
+        tree_cls(max_entries=case.max_entries).insert_many(items)
+
+    return Run(run, len(items))
+
+
+def bench_query_window(case: Case) -> Run:
+    """Queries the leaf entries intersecting a number of small random windows."""
+    tree = _trees.get(case)
+    bounds = union_all(case.rects)
+    rnd = random.Random(1)
+    width, height = bounds.width * WINDOW_FRACTION, bounds.height * WINDOW_FRACTION
+    windows = []
+    for _ in range(QUERY_COUNT):
+        x = rnd.uniform(bounds.min_x, bounds.max_x - width)
+        y = rnd.uniform(bounds.min_y, bounds.max_y - height)
+        windows.append(Rect(x, y, x + width, y + height))
+
+    def run():
+        for window in windows:
+            for _ in tree.query(window):
+                pass
+
+    return Run(run, len(windows))
+
+
+def bench_query_point(case: Case) -> Run:
+    """Queries the leaf entries containing a number of points (the centers of randomly-chosen entries)."""
+    tree = _trees.get(case)
+    rnd = random.Random(2)
+    points = [rnd.choice(case.rects).centroid() for _ in range(QUERY_COUNT)]
+
+    def run():
+        for point in points:
+            for _ in tree.query(point):
+                pass
+
+    return Run(run, len(points))
+
+
+def bench_update(case: Case) -> Run:
+    """
+    Moves the entries of the tree in a random walk (see RTreeBase.update), as when tracking moving objects. The moves
+    are applied to a copy of the tree, so that the tree used by the other benchmarks (and its quality metrics) is not
+    affected.
+    """
+    tree = loads_tree(dumps_tree(_trees.get(case)))
+    entries = list(tree.get_leaf_entries())
+    bounds = union_all(case.rects)
+    rnd = random.Random(4)
+    step_x, step_y = bounds.width * WALK_FRACTION, bounds.height * WALK_FRACTION
+    positions = [case.rects[entry.data] for entry in entries]
+    moves = []
+    for _ in range(UPDATE_ROUNDS):
+        for i in rnd.sample(range(len(entries)), len(entries)):
+            r = positions[i]
+            dx, dy = rnd.uniform(-step_x, step_x), rnd.uniform(-step_y, step_y)
+            positions[i] = Rect(r.min_x + dx, r.min_y + dy, r.max_x + dx, r.max_y + dy)
+            moves.append((entries[i], positions[i]))
+
+    # The moves start from the original rectangles, so these are restored before every run
+    def setup():
+        for entry in entries:
+            rect = case.rects[entry.data]
+            if entry.rect != rect:
+                tree.update(entry, rect)
+
+    def run():
+        for entry, rect in moves:
+            tree.update(entry, rect)
+
+    return Run(run, len(moves), setup)
+
+
+def bench_split(case: Case) -> Run:
+    """Splits a number of overflowing leaf nodes (each containing max_entries + 1 entries) using the tree's strategy."""
+    tree_cls = STRATEGIES[case.strategy]
+    split = SPLITS[tree_cls]
+    tree = tree_cls(max_entries=case.max_entries)
+    rnd = random.Random(3)
+    groups = [rnd.sample(case.rects, case.max_entries + 1) for _ in range(SPLIT_COUNT)]
+    nodes = [RTreeNode(tree, True) for _ in groups]
+
+    # Each node is split in place, so the original entries are restored before every run
+    def setup():
+        for node, group in zip(nodes, groups):
+            node.entries = [RTreeEntry(rect, data=i) for i, rect in enumerate(group)]
+
+    def run():
+        for node in nodes:
+            split(tree, node)
+
+    return Run(run, len(nodes), setup)
+
+
+def bench_full_scan(case: Case) -> Run:
+    """Iterates every leaf entry of the tree."""
+    tree = _trees.get(case)
+
+    def run():
+        for _ in tree.get_leaf_entries():
+            pass
+
+    return Run(run, len(case.rects))
+
+
+def bench_get_levels(case: Case) -> Run:
+    """Gets the nodes at each level of the tree."""
+    tree = _trees.get(case)
+    return Run(tree.get_levels, 1)
+
+
+def bench_export_sqlite(case: Case) -> Run:
+    """Exports the tree to an in-memory SQLite database (see sqlite.export_to_sqlite)."""
+    tree = _trees.get(case)
+    conn = sqlite3.connect(':memory:')
+
+    # The tables are recreated before every run, so that each export starts from an empty database
+    def setup():
+        drop_rtree_tables(conn)
+        create_rtree_tables(conn, wal=False)
+
+    def run():
+        export_to_sqlite(tree, conn)
+
+    return Run(run, len(case.rects), setup)
+
+
+def bench_export_binary(case: Case) -> Run:
+    """Serializes the tree using the binary format (see binary.dumps_tree)."""
+    tree = _trees.get(case)
+    return Run(lambda: dumps_tree(tree), len(case.rects))
+
+
+BENCHMARKS: Dict[str, Callable[[Case], Run]] = {
+    'insert': bench_insert,
+    'insert_many': bench_insert_many,
+    'query_window': bench_query_window,
+    'query_point': bench_query_point,
+    'update': bench_update,
+    'split': bench_split,
+    'full_scan': bench_full_scan,
+    'get_levels': bench_get_levels,
+    'export_sqlite': bench_export_sqlite,
+    'export_binary': bench_export_binary,
+}
+
+
+def measure_quality(case: Case) -> dict:
+    """
+    Returns the quality metrics (see RTreeBase.stats) of the tree built for a case, as a dictionary (which is serialized
+    as is to JSON).
+    """
+    return {
+        'strategy': case.strategy,
+        'dataset': case.dataset,
+        'max_entries': case.max_entries,
+        'size': len(case.rects),
+        'stats': _trees.get(case).stats().as_dict(),
+    }
+
+
+def measure(name: str, case: Case, repeat: int) -> dict:
+    """
+    Measures a benchmark for a case, returning the result as a dictionary (which is serialized as is to JSON).
+    :param name: Name of the benchmark (a key of BENCHMARKS)
+    :param case: Strategy, dataset, and max_entries to measure
+    :param repeat: Number of times to run the benchmark. The statistics are computed over all runs.
+    """
+    fn, ops, setup = BENCHMARKS[name](case)
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    median = statistics.median(times)
+    return {
+        'benchmark': name,
+        'strategy': case.strategy,
+        'dataset': case.dataset,
+        'max_entries': case.max_entries,
+        'size': len(case.rects),
+        'ops': ops,
+        'repeat': repeat,
+        'times': times,
+        'min': min(times),
+        'median': median,
+        'mean': statistics.mean(times),
+        'ops_per_sec': ops / median if median > 0 else None,
+        'us_per_op': 1e6 * median / ops,
+    }
+
+
+def _build_tree(case: Case) -> RTreeBase:
+    tree = STRATEGIES[case.strategy](max_entries=case.max_entries)
+    for i, rect in enumerate(case.rects):
+        tree.insert(i, rect)
+    return tree
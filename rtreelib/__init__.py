@@ -1,4 +1,7 @@
-from rtreelib.models import Rect, Point, Location
+from rtreelib.models import Rect, Point, Location, QueryStats, TreeStats
 from .rtree import RTreeBase, RTreeNode, RTreeEntry, DEFAULT_MAX_ENTRIES, EPSILON
 from .strategies import (
-    RTreeGuttman, RTreeGuttman as RTree, RStarTree, insert, adjust_tree_strategy, least_area_enlargement)
+    RTreeGuttman, RTreeGuttman as RTree, RStarTree, insert, adjust_tree_strategy, least_area_enlargement, str_pack)
+from .observer import RTreeObserver, CountingObserver
+from .sharded import ShardedRTree
+from .concurrency import ConcurrentRTree
@@ -0,0 +1,246 @@
+"""
+Module containing functions for saving R-trees to (and loading R-trees from) a compact binary format. This allows
+persisting a tree and loading it back with the same structure, without having to rebuild it from the original data.
+
+The format consists of a versioned header followed by a number of sections, each of which is a contiguous array of
+little-endian values aligned to 8 bytes. Nodes are stored in level order (breadth-first, so the root is always node 0),
+and the entries of each node are stored contiguously, so that the entries of node i are the entries in the range
+[node_entry_offsets[i], node_entry_offsets[i+1]).
+
+Header:
+    magic (4 bytes, b'RTRB'), version (uint16), reserved (uint16), max_entries (uint32), min_entries (uint32),
+    node count (uint64), entry count (uint64), leaf entry count (uint64), length of the tree class name (uint32),
+    followed by the fully-qualified name of the tree class (UTF-8).
+
+Sections:
+    node_leaf: uint8[node count] - 1 if the node is a leaf node, 0 otherwise
+    node_entry_offsets: int64[node count + 1] - offset of the first entry of each node
+    entry_rects: float64[entry count * 4] - min_x, min_y, max_x, max_y of each entry
+    entry_refs: int64[entry count] - index of the child node (for non-leaf entries), or index of the payload (for leaf
+        entries)
+    payload_offsets: int64[leaf entry count + 1] - offset of each payload within the payload section
+    payloads: serialized data of each leaf entry (by default using pickle)
+"""
+
+import sys
+import pickle
+import struct
+import importlib
+from array import array
+from typing import TypeVar, Type, Callable, List
+from .rtree import RTreeBase, RTreeNode, RTreeEntry
+from rtreelib.models import Rect
+
+T = TypeVar('T')
+
+MAGIC = b'RTRB'
+VERSION = 1
+_HEADER = struct.Struct('<4sHHIIQQQI')
+
+
+class TreeArrays:
+    """
+    Flat representation of an R-tree, as stored in the binary format. This is used as an intermediate representation
+    when saving and loading trees, and can also be used directly to query a tree without materializing its nodes.
+    """
+
+    def __init__(self, tree_cls: str, max_entries: int, min_entries: int, node_leaf, node_entry_offsets, entry_rects,
+                 entry_refs, payload_offsets, payloads):
+        self.tree_cls = tree_cls
+        self.max_entries = max_entries
+        self.min_entries = min_entries
+        self.node_leaf = node_leaf
+        self.node_entry_offsets = node_entry_offsets
+        self.entry_rects = entry_rects
+        self.entry_refs = entry_refs
+        self.payload_offsets = payload_offsets
+        self.payloads = payloads
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_leaf)
+
+    @property
+    def entry_count(self) -> int:
+        return len(self.entry_refs)
+
+    @property
+    def leaf_entry_count(self) -> int:
+        return len(self.payload_offsets) - 1
+
+
+def save_tree(tree: RTreeBase[T], path: str, dumps: Callable[[T], bytes] = pickle.dumps) -> None:
+    """
+    Saves an R-tree to a file using the binary format described in this module.
+    :param tree: R-tree to save
+    :param path: Path of the file to write
+    :param dumps: Function used to serialize the data of each leaf entry. Optional (defaults to pickle.dumps).
+    """
+    with open(path, 'wb') as f:
+        f.write(dumps_tree(tree, dumps))
+
+
+def load_tree(path: str, tree_cls: Type[RTreeBase] = None, loads: Callable[[bytes], T] = pickle.loads) -> RTreeBase[T]:
+    """
+    Loads an R-tree from a file previously written by save_tree.
+    :param path: Path of the file to read
+    :param tree_cls: R-tree class to instantiate. Optional (by default, the class of the tree that was saved is used).
+    :param loads: Function used to deserialize the data of each leaf entry. Optional (defaults to pickle.loads).
+    :return: R-tree having the same structure as the tree that was saved
+    """
+    with open(path, 'rb') as f:
+        return loads_tree(f.read(), tree_cls, loads)
+
+
+def dumps_tree(tree: RTreeBase[T], dumps: Callable[[T], bytes] = pickle.dumps) -> bytes:
+    """
+    Serializes an R-tree to bytes using the binary format described in this module.
+    :param tree: R-tree to serialize
+    :param dumps: Function used to serialize the data of each leaf entry. Optional (defaults to pickle.dumps).
+    :return: Serialized tree
+    """
+    return encode_arrays(tree_to_arrays(tree, dumps))
+
+
+def loads_tree(buffer, tree_cls: Type[RTreeBase] = None, loads: Callable[[bytes], T] = pickle.loads) -> RTreeBase[T]:
+    """
+    Deserializes an R-tree from a buffer containing data in the binary format described in this module.
+    :param buffer: Serialized tree (bytes or any other object supporting the buffer protocol)
+    :param tree_cls: R-tree class to instantiate. Optional (by default, the class of the tree that was saved is used).
+    :param loads: Function used to deserialize the data of each leaf entry. Optional (defaults to pickle.loads).
+    :return: Deserialized R-tree
+    """
+    return arrays_to_tree(decode_arrays(buffer), tree_cls, loads)
+
+
+def tree_to_arrays(tree: RTreeBase[T], dumps: Callable[[T], bytes] = pickle.dumps) -> TreeArrays:
+    """Converts an R-tree to its flat (array-based) representation."""
+    node_leaf = array('B')
+    node_entry_offsets = array('q', [0])
+    entry_rects = array('d')
+    entry_refs = array('q')
+    payload_offsets = array('q', [0])
+    payloads = bytearray()
+    nodes = [tree.root]
+    i = 0
+    while i < len(nodes):
+        node = nodes[i]
+        node_leaf.append(node.is_leaf)
+        for entry in node.entries:
+            rect = entry.rect
+            entry_rects.extend((rect.min_x, rect.min_y, rect.max_x, rect.max_y))
+            if node.is_leaf:
+                entry_refs.append(len(payload_offsets) - 1)
+                payloads += dumps(entry.data)
+                payload_offsets.append(len(payloads))
+            else:
+                entry_refs.append(len(nodes))
+                nodes.append(entry.child)
+        node_entry_offsets.append(len(entry_refs))
+        i += 1
+    tree_cls = f'{type(tree).__module__}.{type(tree).__qualname__}'
+    return TreeArrays(tree_cls, tree.max_entries, tree.min_entries, node_leaf, node_entry_offsets, entry_rects,
+                      entry_refs, payload_offsets, bytes(payloads))
+
+
+def arrays_to_tree(arrays: TreeArrays, tree_cls: Type[RTreeBase] = None,
+                   loads: Callable[[bytes], T] = pickle.loads) -> RTreeBase[T]:
+    """
+    Reconstructs an R-tree from its flat (array-based) representation. The tree is rebuilt node by node, without
+    invoking the insert strategy, so it has exactly the same structure as the original tree.
+    """
+    tree_cls = tree_cls or _resolve_tree_cls(arrays.tree_cls)
+    tree = tree_cls(max_entries=arrays.max_entries, min_entries=arrays.min_entries)
+    nodes = [RTreeNode(tree, bool(is_leaf)) for is_leaf in arrays.node_leaf]
+    rects, refs, offsets = arrays.entry_rects, arrays.entry_refs, arrays.node_entry_offsets
+    payloads, payload_offsets = arrays.payloads, arrays.payload_offsets
+    for i, node in enumerate(nodes):
+        entries = node.entries
+        for j in range(offsets[i], offsets[i + 1]):
+            rect = Rect(rects[4 * j], rects[4 * j + 1], rects[4 * j + 2], rects[4 * j + 3])
+            ref = refs[j]
+            if node.is_leaf:
+                data = loads(bytes(payloads[payload_offsets[ref]:payload_offsets[ref + 1]]))
+                entries.append(RTreeEntry(rect, data=data))
+            else:
+                child = nodes[ref]
+                child.parent = node
+                entries.append(RTreeEntry(rect, child=child))
+    tree.root = nodes[0]
+    return tree
+
+
+def encode_arrays(arrays: TreeArrays) -> bytes:
+    """Encodes the flat representation of an R-tree using the binary format described in this module."""
+    name = arrays.tree_cls.encode('utf-8')
+    header = _HEADER.pack(MAGIC, VERSION, 0, arrays.max_entries, arrays.min_entries, arrays.node_count,
+                          arrays.entry_count, arrays.leaf_entry_count, len(name)) + name
+    parts = [header]
+    for section in (arrays.node_leaf, arrays.node_entry_offsets, arrays.entry_rects, arrays.entry_refs,
+                    arrays.payload_offsets):
+        parts.append(_pad(parts))
+        parts.append(_to_little_endian(section).tobytes())
+    parts.append(_pad(parts))
+    parts.append(arrays.payloads)
+    return b''.join(parts)
+
+
+def decode_arrays(buffer) -> TreeArrays:
+    """
+    Decodes the flat representation of an R-tree from a buffer containing data in the binary format described in this
+    module. On little-endian platforms, the sections are zero-copy views into the buffer.
+    """
+    view = memoryview(buffer).cast('B')
+    magic, version, _, max_entries, min_entries, node_count, entry_count, leaf_count, name_len = \
+        _HEADER.unpack_from(view, 0)
+    if magic != MAGIC:
+        raise ValueError("Invalid R-tree file (unrecognized header)")
+    if version > VERSION:
+        raise ValueError(f"Unsupported R-tree file version: {version} (the maximum supported version is {VERSION})")
+    offset = _HEADER.size
+    tree_cls = bytes(view[offset:offset + name_len]).decode('utf-8')
+    offset += name_len
+    sections = []
+    for typecode, count in (('B', node_count), ('q', node_count + 1), ('d', entry_count * 4), ('q', entry_count),
+                            ('q', leaf_count + 1)):
+        offset = _align(offset)
+        size = count * array(typecode).itemsize
+        sections.append(_from_little_endian(view[offset:offset + size], typecode))
+        offset += size
+    offset = _align(offset)
+    payloads = view[offset:offset + sections[-1][-1]]
+    return TreeArrays(tree_cls, max_entries, min_entries, *sections, payloads)
+
+
+def _resolve_tree_cls(name: str) -> Type[RTreeBase]:
+    module_name, _, cls_name = name.rpartition('.')
+    tree_cls = getattr(importlib.import_module(module_name), cls_name, None)
+    if not (isinstance(tree_cls, type) and issubclass(tree_cls, RTreeBase)):
+        raise ValueError(f"Invalid R-tree class: {name}")
+    return tree_cls
+
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _pad(parts: List[bytes]) -> bytes:
+    size = sum(len(p) for p in parts)
+    return bytes(_align(size) - size)
+
+
+def _to_little_endian(a: array) -> array:
+    if sys.byteorder == 'little':
+        return a
+    a = array(a.typecode, a)
+    a.byteswap()
+    return a
+
+
+def _from_little_endian(view: memoryview, typecode: str):
+    if sys.byteorder == 'little':
+        return view.cast(typecode)
+    a = array(typecode)
+    a.frombytes(view)
+    a.byteswap()
+    return a
@@ -0,0 +1,178 @@
+"""
+Module containing a thread-safe wrapper for R-trees. RTreeBase is not safe to use from multiple threads while it is
+being modified, since inserts (and updates and deletes) modify the entry lists of its nodes in place (and an R*-tree
+also keeps the state of the current insert in its cache), so a concurrent query may see a partially-split node.
+
+ConcurrentRTree protects a tree using a reader-writer lock: queries hold a shared (read) lock, so any number of them
+run concurrently, while modifications hold an exclusive (write) lock, so each query sees the tree either before or
+after a modification, but never in between:
+
+    t = ConcurrentRTree(RStarTree())
+    # Writer thread
+    t.insert('a', Rect(0, 0, 1, 1))
+    # Reader threads
+    entries = t.query((0.5, 0.5))
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import TypeVar, Generic, Iterable, Iterator, List, Tuple, Callable, Optional
+from .rtree import RTreeBase, RTreeNode, RTreeEntry
+from rtreelib.models import Rect, Location, QueryStats, TreeStats
+
+T = TypeVar('T')
+
+
+class ReadWriteLock:
+    """
+    Lock that can be held by any number of readers, or by a single writer. Writers take precedence: once a writer is
+    waiting, new readers wait until it is done, so that a steady stream of queries cannot starve inserts. The lock is
+    not reentrant (a thread holding the lock must not try to acquire it again).
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def acquire_read(self) -> None:
+        with self._condition:
+            while self._writer or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+
+    def release_read(self) -> None:
+        with self._condition:
+            self._readers -= 1
+            if self._readers == 0:
+                self._condition.notify_all()
+
+    def acquire_write(self) -> None:
+        with self._condition:
+            self._waiting_writers += 1
+            try:
+                while self._writer or self._readers:
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = True
+
+    def release_write(self) -> None:
+        with self._condition:
+            self._writer = False
+            self._condition.notify_all()
+
+    @contextmanager
+    def read_lock(self) -> Iterator[None]:
+        """Context manager that holds the lock for reading."""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_lock(self) -> Iterator[None]:
+        """Context manager that holds the lock for writing."""
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class ConcurrentRTree(Generic[T]):
+    """
+    Thread-safe wrapper for an R-tree, which can be queried from multiple threads while other threads modify it (see
+    the module documentation). Since a query must hold the read lock for as long as its results are being produced, the
+    query methods return lists rather than lazy iterables. To run several operations against a consistent view of the
+    tree (or to call methods that are not wrapped), use the read and write context managers.
+    """
+
+    def __init__(self, tree: RTreeBase[T]):
+        """
+        Wraps an R-tree. The tree must not be accessed directly (other than through the read and write context
+        managers) while it is being used through the wrapper.
+        :param tree: R-tree to wrap
+        """
+        self.tree = tree
+        self.lock = ReadWriteLock()
+
+    @contextmanager
+    def read(self) -> Iterator[RTreeBase[T]]:
+        """
+        Context manager that holds the read lock, returning the underlying tree. The tree must not be modified inside
+        the block (but may be queried lazily).
+        """
+        with self.lock.read_lock():
+            yield self.tree
+
+    @contextmanager
+    def write(self) -> Iterator[RTreeBase[T]]:
+        """Context manager that holds the write lock, returning the underlying tree (which may be modified)."""
+        with self.lock.write_lock():
+            yield self.tree
+
+    def insert(self, data: T, rect: Rect) -> RTreeEntry[T]:
+        """Inserts a new entry into the tree (see RTreeBase.insert)."""
+        with self.lock.write_lock():
+            return self.tree.insert(data, rect)
+
+    def insert_many(self, items: Iterable[Tuple[T, Rect]]) -> List[RTreeEntry[T]]:
+        """Inserts a batch of entries into the tree (see RTreeBase.insert_many), holding the write lock once."""
+        with self.lock.write_lock():
+            return self.tree.insert_many(items)
+
+    def update(self, entry: RTreeEntry[T], rect: Rect, max_enlargement: float = 0.1) -> RTreeEntry[T]:
+        """Changes the bounding rectangle of an entry (see RTreeBase.update)."""
+        with self.lock.write_lock():
+            return self.tree.update(entry, rect, max_enlargement)
+
+    def delete(self, entry: RTreeEntry[T]) -> None:
+        """Deletes an entry from the tree (see RTreeBase.delete)."""
+        with self.lock.write_lock():
+            self.tree.delete(entry)
+
+    def query(self, loc: Location, stats: QueryStats = None) -> List[RTreeEntry[T]]:
+        """Queries leaf entries for a location (see RTreeBase.query)."""
+        with self.lock.read_lock():
+            return list(self.tree.query(loc, stats))
+
+    def count(self, loc: Location) -> int:
+        """Returns the number of leaf entries that intersect a location (see RTreeBase.count)."""
+        with self.lock.read_lock():
+            return self.tree.count(loc)
+
+    def nearest(self, loc: Location, k: int = 1) -> List[RTreeEntry[T]]:
+        """Finds the k leaf entries nearest to a location (see RTreeBase.nearest)."""
+        with self.lock.read_lock():
+            return list(self.tree.nearest(loc, k))
+
+    def search(self,
+               node_condition: Optional[Callable[[RTreeNode[T]], bool]],
+               entry_condition: Optional[Callable[[RTreeEntry[T]], bool]] = None,
+               stats: QueryStats = None) -> List[RTreeEntry[T]]:
+        """Returns the leaf entries that match a condition (see RTreeBase.search)."""
+        with self.lock.read_lock():
+            return list(self.tree.search(node_condition, entry_condition, stats))
+
+    def explain(self, loc: Location) -> QueryStats:
+        """Executes a query, returning its execution statistics (see RTreeBase.explain)."""
+        with self.lock.read_lock():
+            return self.tree.explain(loc)
+
+    def get_leaf_entries(self) -> List[RTreeEntry[T]]:
+        """Returns all leaf entries of the tree (see RTreeBase.get_leaf_entries)."""
+        with self.lock.read_lock():
+            return list(self.tree.get_leaf_entries())
+
+    def get_height(self) -> int:
+        """Returns the height of the tree (see RTreeBase.get_height)."""
+        with self.lock.read_lock():
+            return self.tree.get_height()
+
+    def stats(self) -> TreeStats:
+        """Computes quality metrics of the tree (see RTreeBase.stats)."""
+        with self.lock.read_lock():
+            return self.tree.stats()
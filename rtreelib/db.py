@@ -0,0 +1,175 @@
+"""
+Module containing database-independent helpers shared by the modules that export R-trees to (and import R-trees from)
+a database (pg, pg_async, and sqlite). This includes loading the SQL templates, assigning IDs to nodes and entries,
+generating the rows that are copied to the database, and rebuilding a tree from the rows that are read back.
+"""
+
+import string
+import pkg_resources
+from functools import lru_cache
+from typing import TypeVar, Generic, Union, Type, Dict, Iterable, List, Tuple, Optional, Callable, Any
+from .rtree import RTreeBase, RTreeNode, RTreeEntry
+from rtreelib.models import Rect
+
+T = TypeVar('T')
+
+
+def get_sql_from_template(name: str, **kwargs) -> str:
+    """Returns the SQL in the given template (in the sql directory), substituting the given values."""
+    return get_template(name).substitute(**kwargs)
+
+
+@lru_cache(maxsize=None)
+def get_template(name: str) -> string.Template:
+    """Reads an SQL template. Templates are only read once."""
+    s = pkg_resources.resource_string('rtreelib', f'sql/{name}.sql.template').decode('utf-8')
+    return string.Template(s)
+
+
+def get_datatype(datatype: Union[Type, str] = None) -> str:
+    """Returns the PostgreSQL column type to use for the data of leaf entries."""
+    if isinstance(datatype, str):
+        return datatype
+    if datatype == str:
+        return 'TEXT'
+    if datatype == int:
+        return 'INT'
+    if datatype == float:
+        return 'NUMERIC'
+    return 'TEXT'
+
+
+def count_rows(levels: List[List[RTreeNode[T]]]) -> Tuple[int, int]:
+    """Returns the number of nodes and entries in the given levels of a tree."""
+    return sum(len(nodes) for nodes in levels), sum(len(node.entries) for nodes in levels for node in nodes)
+
+
+def assign_ids(levels: List[List[RTreeNode[T]]], node_ids: Iterable[int],
+               entry_ids: Iterable[int]) -> Tuple[Dict[RTreeNode[T], int], Dict[RTreeEntry[T], int]]:
+    """
+    Assigns IDs to all nodes and entries in the given levels of a tree (in level order), returning dictionaries mapping
+    each node/entry to its ID.
+    """
+    nodes = [node for level in levels for node in level]
+    entries = [entry for node in nodes for entry in node.entries]
+    return dict(zip(nodes, node_ids)), dict(zip(entries, entry_ids))
+
+
+def get_copy_rows(levels: List[List[RTreeNode[T]]], level_offset: int, rtree_id: int, srid: int,
+                  node_ids: Dict[RTreeNode[T], int],
+                  entry_ids: Dict[RTreeEntry[T], int]) -> Iterable[Tuple[Iterable[str], Iterable[str]]]:
+    """
+    Returns the rows of the rtree_node and rtree_entry tables for the given levels of a tree, in CSV format. The rows
+    are returned one level at a time, as a tuple containing the node rows and entry rows of the level. Copying the rows
+    in this order (nodes first) ensures that the parent of each row already exists by the time the row is loaded. The
+    nodes in the first level are returned without their parent entries (unless they are at the root level), since the
+    parent entries may be written separately.
+    """
+    for i, nodes in enumerate(levels):
+        level = level_offset + i
+        node_rows = (csv_row(node_ids[node], id(node), hex(id(node)), rtree_id, level,
+                             ewkt(node.get_bounding_rect(), srid),
+                             entry_ids[node.parent_entry] if i > 0 else None, node.is_leaf)
+                     for node in nodes)
+        entry_rows = (csv_row(entry_ids[entry], id(entry), hex(id(entry)), node_ids[node], ewkt(entry.rect, srid),
+                              entry.is_leaf, entry.data)
+                      for node in nodes for entry in node.entries)
+        yield node_rows, entry_rows
+
+
+def get_subtree_levels(roots: List[RTreeNode[T]]) -> List[List[RTreeNode[T]]]:
+    """Returns the nodes at each level of the subtrees rooted at the given nodes."""
+    levels = [roots]
+    while not levels[-1][0].is_leaf:
+        levels.append([entry.child for node in levels[-1] for entry in node.entries])
+    return levels
+
+
+def get_depth(node: RTreeNode[T]) -> int:
+    """Returns the level of a node in the tree (with the root being level 0)."""
+    depth = 0
+    while node.parent is not None:
+        node = node.parent
+        depth += 1
+    return depth
+
+
+def coords(rect: Optional[Rect]) -> Tuple[Optional[float], ...]:
+    """Returns the coordinates of a rectangle as a tuple (min_x, min_y, max_x, max_y), or a tuple of Nones."""
+    if rect is None:
+        return None, None, None, None
+    return rect.min_x, rect.min_y, rect.max_x, rect.max_y
+
+
+def ewkt(rect: Optional[Rect], srid: int) -> Optional[str]:
+    """Returns a rectangle as an EWKT polygon (the same polygon as the one generated by ST_MakeEnvelope)."""
+    if rect is None:
+        return None
+    min_x, min_y, max_x, max_y = repr(rect.min_x), repr(rect.min_y), repr(rect.max_x), repr(rect.max_y)
+    return f'SRID={srid};POLYGON(({min_x} {min_y},{min_x} {max_y},{max_x} {max_y},{max_x} {min_y},{min_x} {min_y}))'
+
+
+def csv_row(*values) -> str:
+    """Returns a line in the CSV format used by COPY."""
+    return ','.join(csv_value(v) for v in values) + '\n'
+
+
+def csv_value(value) -> str:
+    """Returns a value in the CSV format used by COPY."""
+    # Unquoted empty values are NULL in CSV format, so all other values are quoted (including empty strings)
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, int):
+        return str(value)
+    value = str(value)
+    return '"' + value.replace('"', '""') + '"'
+
+
+class TreeBuilder(Generic[T]):
+    """
+    Rebuilds an R-tree node by node from the rows of the rtree_node and rtree_entry tables (without invoking the insert
+    strategy), so that it has exactly the same structure as the tree that was exported. All nodes must be added (in
+    level order) before any entries are added. Rows can be any mapping having the columns selected by the
+    select_rtree_nodes and select_rtree_entries templates.
+    """
+
+    def __init__(self, tree: RTreeBase[T], adapter: Callable[[Any], T] = None):
+        """
+        Initializes the builder.
+        :param tree: Empty R-tree that will be populated with the nodes and entries
+        :param adapter: Function used to convert the value of the data column of each leaf entry to the data stored in
+            the tree (Optional, by default the value is used as is).
+        """
+        self.tree = tree
+        self.adapter = adapter
+        self.root: Optional[RTreeNode[T]] = None
+        self._nodes: Dict[int, RTreeNode[T]] = {}
+        self._children: Dict[int, RTreeNode[T]] = {}
+
+    def add_node(self, row) -> None:
+        """Adds a node (given a row of the rtree_node table)."""
+        node = RTreeNode(self.tree, bool(row['leaf']))
+        self._nodes[row['id']] = node
+        if row['parent_entry_id'] is None:
+            self.root = node
+        else:
+            self._children[row['parent_entry_id']] = node
+
+    def add_entry(self, row) -> None:
+        """Adds an entry to its parent node (given a row of the rtree_entry table)."""
+        node = self._nodes[row['parent_node_id']]
+        rect = Rect(row['min_x'], row['min_y'], row['max_x'], row['max_y'])
+        if row['leaf']:
+            data = row['data'] if self.adapter is None else self.adapter(row['data'])
+            node.entries.append(RTreeEntry(rect, data=data))
+        else:
+            child = self._children[row['id']]
+            child.parent = node
+            node.entries.append(RTreeEntry(rect, child=child))
+
+    def finish(self) -> RTreeBase[T]:
+        """Sets the root of the tree once all nodes and entries have been added, returning the tree."""
+        self.tree.root = self.root
+        return self.tree
@@ -4,14 +4,25 @@ following dependencies are installed: matplotlib, pydot, tqdm
 """
 
 import os
+import itertools
 import platform
 import subprocess
 import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Tuple, Iterable
 from .rtree import RTreeBase, RTreeNode, RTreeEntry
+from rtreelib.models import Rect, Location, parse_loc
+from .strategies import RTreeGuttman
+from .binary import dumps_tree, loads_tree
 
 try:
     import matplotlib.pyplot as plt
     import matplotlib.patches as patches
+    import matplotlib.image as mpimg
+    from matplotlib.figure import Figure
+    from matplotlib.collections import PatchCollection
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    import numpy as np
     import pydot
     from tqdm import tqdm
 except ImportError:
@@ -19,7 +30,7 @@ except ImportError:
 
 
 def create_rtree_diagram(tree: RTreeBase, label=None, fmt="png", filename=None, filename_dot=None,
-                         include_images=True, open_diagram=True, **kwargs):
+                         include_images=True, open_diagram=True, workers=1, **kwargs):
     """
     Creates an R-Tree diagram for visualizing the tree structure using graphviz. Note that the diagram may be large and
     take a while to generate, especially if include_images is set to True.
@@ -35,12 +46,16 @@ def create_rtree_diagram(tree: RTreeBase, label=None, fmt="png", filename=None,
         visualize where the node/entry is located in relation to the other nodes/entries. Note this may slow down
         diagram generation significantly.
     :param open_diagram: If True, the default viewer will be launched after the diagram is generated. Defaults to True.
+    :param workers: Number of processes used to render the embedded images (if include_images is True). When using more
+        than one process, each process receives a compact snapshot of the tree (in the binary format of the binary
+        module, with the data of each leaf entry converted to a string), rather than a pickled copy of the tree.
+        Defaults to 1 (render the images in the current process).
     """
     kwargs.setdefault('label', label)
     kwargs.setdefault('labelloc', 't')
     graph = pydot.Dot(graph_type='digraph', **kwargs)
     graph.set_node_defaults(shape='plaintext')
-    _draw_rtree_nodes(graph, tree, include_images)
+    _draw_rtree_nodes(graph, tree, include_images, workers)
     _draw_rtree_edges(graph, tree.root)
     filename = filename or tempfile.mkstemp('.' + fmt)[1]
     graph.write(filename, format=fmt)
@@ -50,25 +65,35 @@ def create_rtree_diagram(tree: RTreeBase, label=None, fmt="png", filename=None,
         _invoke_file(filename)
 
 
-def plot_rtree(tree: RTreeBase, filename=None, show=True, highlight_node=None, highlight_entry=None):
+def plot_rtree(tree: RTreeBase, filename=None, show=True, highlight_node=None, highlight_entry=None, max_level=None,
+               max_entries=None, viewport=None):
     """
     Create a cartesian plot (using matplotlib) of the R-Tree nodes/entries. Each node's bounding rectangle
     is plotted as a tan rectangle with dashed edges, and each leaf entry's bounding rectangle is plotted in
     blue. A particular node or entry may be highlighted in the plot by passing in highlight_node and/or
     highlight_entry.
+
+    For large trees, pass max_entries (and optionally max_level and/or viewport) to bound the amount of work done to
+    render the plot. Only the nodes and entries intersecting the viewport are plotted (found using a window query). If
+    there are more than max_entries leaf entries in view, the individual leaf entries are not plotted (or labeled);
+    instead, the deepest level of nodes that is plotted is shaded according to the density of the leaf entries within
+    each node.
+
     :param tree: R-Tree instance to plot
     :param filename: If passed in, the plot will be saved to a file
     :param show: If True, show the plot
     :param highlight_node: R-Tree node to highlight
     :param highlight_entry: R-Tree leaf entry to highlight
+    :param max_level: Deepest level of nodes to plot, where the root is level 0 (Optional, by default all levels are
+        plotted).
+    :param max_entries: Maximum number of leaf entries (as well as nodes per level) to plot (Optional, by default all
+        leaf entries and nodes are plotted).
+    :param viewport: Rectangle to plot (Optional, by default the bounding rectangle of the whole tree is plotted, with
+        some padding).
     """
     fig, ax = plt.subplots(1)
-    bbox = tree.root.get_bounding_rect()
-    padx, pady = (0.1 * bbox.width, 0.1 * bbox.height)
-    ax.set_xlim(left=bbox.min_x - padx, right=bbox.max_x + padx)
-    ax.set_ylim(bottom=bbox.min_y - pady, top=bbox.max_y + pady)
-    _plot_rtree_leaves(ax, tree, highlight_entry)
-    _plot_rtree_nodes(ax, tree, highlight_node)
+    _plot_rtree(ax, tree, max_level, max_entries, viewport)
+    _plot_highlights(ax, highlight_node, highlight_entry)
     if filename:
         plt.savefig(filename, bbox_inches='tight')
     if show:
@@ -76,29 +101,136 @@ def plot_rtree(tree: RTreeBase, filename=None, show=True, highlight_node=None, h
     plt.close(fig)
 
 
-def _draw_rtree_nodes(graph, tree: RTreeBase, include_images):
-    num_plots = len(list(tree.get_nodes())) + len(list(tree.get_leaf_entries()))
+class _RTreePlot:
+    """
+    Plot of an R-tree used for rendering many images of the same tree, each highlighting a different node or entry. The
+    static layer (all nodes and leaf entries) is only rendered once; each image is then produced by restoring the
+    rendered static layer and drawing the highlighted node or entry on top of it (blitting), so the cost of each image
+    does not depend on the size of the tree.
+    """
+
+    def __init__(self, tree: RTreeBase):
+        # Use a standalone figure with the Agg canvas (rather than pyplot), since the figure is never shown
+        self.fig = Figure()
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.subplots(1)
+        _plot_rtree(self.ax, tree)
+        self._background = None
+        self._crop = None
+
+    def save(self, filename, highlight_node: RTreeNode = None, highlight_entry: RTreeEntry = None):
+        """Saves a PNG image of the plot, highlighting the given node and/or entry."""
+        if self._background is None:
+            self._render_background()
+        self.canvas.restore_region(self._background)
+        artists = _plot_highlights(self.ax, highlight_node, highlight_entry)
+        for artist in artists:
+            self.ax.draw_artist(artist)
+            artist.remove()
+        top, bottom, left, right = self._crop
+        mpimg.imsave(filename, np.asarray(self.canvas.buffer_rgba())[top:bottom, left:right], format='png')
+
+    def _render_background(self):
+        self.canvas.draw()
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        # Crop the images the same way as savefig(bbox_inches='tight') would
+        bbox = self.fig.get_tightbbox(self.canvas.get_renderer()).padded(0.1)
+        width, height = self.canvas.get_width_height()
+        x0, y0, x1, y1 = (v * self.fig.dpi for v in bbox.extents)
+        self._crop = (max(0, int(height - y1)), min(height, int(height - y0)), max(0, int(x0)), min(width, int(x1)))
+
+
+def _draw_rtree_nodes(graph, tree: RTreeBase, include_images, workers=1):
+    levels = tree.get_levels()
+    entries = list(tree.get_leaf_entries())
+    num_plots = sum(len(nodes) for nodes in levels) + len(entries)
+    node_imgs, entry_imgs = {}, {}
     with tqdm(total=num_plots, desc="Drawing R-Tree", unit="node") as pbar:
-        for level, nodes in enumerate(tree.get_levels()):
+        if include_images:
+            # Images are identified by the index of the node (in level order) or leaf entry, so that they can be
+            # rendered from a snapshot of the tree
+            tasks = [('node', i, tempfile.mkstemp(prefix='node_', suffix='.png')[1])
+                     for i in range(num_plots - len(entries))]
+            tasks += [('entry', i, tempfile.mkstemp(prefix='entry_', suffix='.png')[1]) for i in range(len(entries))]
+            _render_images(tree, tasks, workers, pbar)
+            node_imgs = {i: img for kind, i, img in tasks if kind == 'node'}
+            entry_imgs = {i: img for kind, i, img in tasks if kind == 'entry'}
+        i = 0
+        for nodes in levels:
             subgraph = pydot.Subgraph(rank='same')
             graph.add_subgraph(subgraph)
             for node in nodes:
-                img = None
-                if include_images:
-                    img = tempfile.mkstemp(prefix='node_', suffix='.png')[1]
-                    highlight_node = node if not node.is_root else None
-                    plot_rtree(tree, filename=img, show=False, highlight_node=highlight_node)
-                subgraph.add_node(_rtree_node_to_pydot(node, img))
-                pbar.update()
+                subgraph.add_node(_rtree_node_to_pydot(node, node_imgs.get(i)))
+                i += 1
+                if not include_images:
+                    pbar.update()
         leaf_subgraph = pydot.Subgraph(rank='same')
         graph.add_subgraph(leaf_subgraph)
-        for entry in tree.get_leaf_entries():
-            img = None
-            if include_images:
-                img = tempfile.mkstemp(prefix='entry_', suffix='.png')[1]
-                plot_rtree(tree, filename=img, show=False, highlight_entry=entry)
-            leaf_subgraph.add_node(_rtree_leaf_entry_to_pydot(entry, img))
+        for i, entry in enumerate(entries):
+            leaf_subgraph.add_node(_rtree_leaf_entry_to_pydot(entry, entry_imgs.get(i)))
+            if not include_images:
+                pbar.update()
+
+
+_RenderTask = Tuple[str, int, str]
+
+
+def _render_images(tree: RTreeBase, tasks: List[_RenderTask], workers: int, pbar):
+    """Renders the image of each task (kind, index, filename), either in the current process or in a process pool."""
+    if workers <= 1:
+        renderer = _ImageRenderer(tree)
+        for task in tasks:
+            renderer.render(task)
             pbar.update()
+        return
+    snapshot = dumps_tree(tree, dumps=_dumps_label)
+    # Submit the tasks in small chunks, so that the progress bar is updated regularly
+    chunk_size = max(1, min(64, len(tasks) // (4 * workers)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(snapshot,)) as executor:
+        futures = [executor.submit(_render_chunk, tasks[i:i + chunk_size]) for i in range(0, len(tasks), chunk_size)]
+        for future in as_completed(futures):
+            pbar.update(future.result())
+
+
+class _ImageRenderer:
+    """Renders the images of the nodes and leaf entries of a tree, identified by their index."""
+
+    def __init__(self, tree: RTreeBase):
+        self.plot = _RTreePlot(tree)
+        self.nodes = [node for nodes in tree.get_levels() for node in nodes]
+        self.entries = list(tree.get_leaf_entries())
+
+    def render(self, task: _RenderTask):
+        kind, i, filename = task
+        if kind == 'node':
+            node = self.nodes[i]
+            self.plot.save(filename, highlight_node=node if not node.is_root else None)
+        else:
+            self.plot.save(filename, highlight_entry=self.entries[i])
+
+
+# Renderer of each worker process (created once per process from the snapshot of the tree)
+_worker_renderer = None
+
+
+def _init_worker(snapshot: bytes):
+    global _worker_renderer
+    # The tree class does not matter for rendering (and may not be importable in the worker process)
+    _worker_renderer = _ImageRenderer(loads_tree(snapshot, tree_cls=RTreeGuttman, loads=_loads_label))
+
+
+def _render_chunk(tasks: List[_RenderTask]) -> int:
+    for task in tasks:
+        _worker_renderer.render(task)
+    return len(tasks)
+
+
+def _dumps_label(data) -> bytes:
+    return str(data).encode('utf-8')
+
+
+def _loads_label(b: bytes) -> str:
+    return b.decode('utf-8')
 
 
 def _rtree_node_to_pydot(node: RTreeNode, img=None):
@@ -155,38 +287,124 @@ def _invoke_file(filepath):
         subprocess.call(('xdg-open', filepath))
 
 
-def _plot_rtree_leaves(ax, tree, highlight_entry=None):
-    for entry in tree.get_leaf_entries():
-        xy = (entry.rect.min_x, entry.rect.min_y)
-        w, h = (entry.rect.width, entry.rect.height)
-        highlight = entry is highlight_entry
-        edgecolor = (0.78, 0.24, 0.52) if highlight else (0.24, 0.52, 0.78)
-        facecolor = (0.78, 0.24, 0.52, 0.64) if highlight else (0.24, 0.52, 0.78, 0.5)
-        text_color = (0.25, 0.08, 0.17) if highlight else (0.09, 0.19, 0.29)
-        text_facecolor = (0.78, 0.24, 0.52, 0.25) if highlight else (0.24, 0.52, 0.78, 0.25)
-        patch = patches.Rectangle(xy, w, h, linewidth=1, edgecolor=edgecolor, facecolor=facecolor)
-        ax.add_patch(patch)
-        plt.annotate(
-            s=entry.data,
-            color=text_color,
-            fontsize=6,
-            fontweight='bold',
-            xy=xy,
-            xytext=(5, 4),
-            textcoords='offset pixels',
-            bbox=dict(fc=text_facecolor, ec='none', pad=3),
-            va='bottom',
-            ha='left')
-
-
-def _plot_rtree_nodes(ax, tree, highlight_node=None):
-    for node in tree.get_nodes():
-        rect = node.get_bounding_rect()
-        xy = (rect.min_x, rect.min_y)
-        w, h = (rect.width, rect.height)
-        highlight = node is highlight_node
-        edgecolor = (0.82, 0.57, 0.55) if highlight else (0.82, 0.71, 0.55, 0.5)
-        facecolor = (0.82, 0.57, 0.55, 0.6) if highlight else (0.82, 0.71, 0.55, 0.25)
-        patch = patches.Rectangle(xy, w, h, linewidth=2, linestyle='--',
-                                  edgecolor=edgecolor, facecolor=facecolor)
-        ax.add_patch(patch)
+def _plot_rtree(ax, tree: RTreeBase, max_level: int = None, max_entries: int = None, viewport: Location = None):
+    """Plots the leaf entries and nodes of the tree (without any highlights)."""
+    if viewport is None:
+        bbox = tree.root.get_bounding_rect()
+        padx, pady = (0.1 * bbox.width, 0.1 * bbox.height)
+        ax.set_xlim(left=bbox.min_x - padx, right=bbox.max_x + padx)
+        ax.set_ylim(bottom=bbox.min_y - pady, top=bbox.max_y + pady)
+    else:
+        viewport = parse_loc(viewport)
+        if not isinstance(viewport, Rect):
+            raise TypeError("The viewport must be a rectangle")
+        ax.set_xlim(left=viewport.min_x, right=viewport.max_x)
+        ax.set_ylim(bottom=viewport.min_y, top=viewport.max_y)
+    levels = _get_visible_levels(tree, max_level, max_entries, viewport)
+    # Both the window query and search (unlike get_leaf_entries, which lists the nodes level by level) traverse the tree
+    # depth-first, yielding leaf entries as they go
+    entries = tree.query(viewport) if viewport is not None else tree.search(None)
+    if max_entries is not None:
+        # Stop the traversal as soon as there are too many entries to plot
+        entries = list(itertools.islice(entries, max_entries + 1))
+    if max_entries is None or len(entries) <= max_entries:
+        _plot_rtree_leaves(ax, entries)
+    else:
+        _plot_density(ax, levels[-1], viewport or tree.root.get_bounding_rect())
+    _plot_rtree_nodes(ax, [node for nodes in levels for node in nodes])
+
+
+def _get_visible_levels(tree: RTreeBase, max_level: int = None, max_entries: int = None,
+                        viewport: Rect = None) -> List[List[RTreeNode]]:
+    """
+    Returns the nodes to plot at each level, from the root down to max_level (or the leaf level), stopping early at the
+    first level having more than max_entries nodes in view.
+    """
+    levels = []
+    nodes = [tree.root]
+    while True:
+        levels.append(nodes)
+        if nodes[0].is_leaf or (max_level is not None and len(levels) > max_level):
+            break
+        # Count the entries in view before resolving their child nodes, so that the nodes of a level having too many
+        # nodes to plot are never visited
+        entries = [entry for node in nodes for entry in node.entries
+                   if viewport is None or viewport.intersects(entry.rect)]
+        if not entries or (max_entries is not None and len(entries) > max_entries):
+            break
+        nodes = [entry.child for entry in entries]
+    return levels
+
+
+def _plot_rtree_leaves(ax, entries: Iterable[RTreeEntry]):
+    # Patches that share the same style are added as a single collection, which is much faster to draw than adding each
+    # patch separately
+    entries = list(entries)
+    ax.add_collection(PatchCollection([_rect_patch(entry.rect) for entry in entries], linewidth=1,
+                                      edgecolor=_LEAF_STYLE['edgecolor'], facecolor=_LEAF_STYLE['facecolor']))
+    for entry in entries:
+        _annotate_entry(ax, entry, _LEAF_STYLE)
+
+
+def _plot_rtree_nodes(ax, nodes: Iterable[RTreeNode]):
+    ax.add_collection(PatchCollection([_rect_patch(node.get_bounding_rect()) for node in nodes],
+                                      linewidth=2, linestyle='--', edgecolor=_NODE_STYLE['edgecolor'],
+                                      facecolor=_NODE_STYLE['facecolor']))
+
+
+def _plot_density(ax, nodes: List[RTreeNode], viewport: Rect):
+    """
+    Shades each node according to the density of the leaf entries it contains (in place of the entries). Rather than
+    counting the leaf entries in each subtree (which would mean visiting the whole tree), the number of leaf entries
+    in a node is estimated as len(node.entries) * avg_fill ** depth_below. Since all of the nodes are at the same level,
+    the avg_fill ** depth_below factor is the same for every node, so the densities relative to the densest node only
+    depend on the number of entries of each node.
+    """
+    # Avoid dividing by zero for degenerate nodes (for example, nodes containing a single point)
+    min_area = viewport.area() * 1e-6 or 1e-12
+    densities = [len(node.entries) / max(node.get_bounding_rect().area(), min_area) for node in nodes]
+    max_density = max(densities, default=0) or 1
+    r, g, b = _LEAF_STYLE['edgecolor']
+    ax.add_collection(PatchCollection([_rect_patch(node.get_bounding_rect()) for node in nodes], linewidth=0,
+                                      facecolor=[(r, g, b, 0.1 + 0.7 * d / max_density) for d in densities]))
+
+
+def _plot_highlights(ax, highlight_node: RTreeNode = None, highlight_entry: RTreeEntry = None) -> List:
+    """Draws the highlighted node and/or entry on top of the plot, returning the artists that were added."""
+    artists = []
+    if highlight_entry is not None:
+        style = _HIGHLIGHT_LEAF_STYLE
+        artists.append(ax.add_patch(_rect_patch(highlight_entry.rect, linewidth=1, edgecolor=style['edgecolor'],
+                                                facecolor=style['facecolor'])))
+        artists.append(_annotate_entry(ax, highlight_entry, style))
+    if highlight_node is not None:
+        style = _HIGHLIGHT_NODE_STYLE
+        artists.append(ax.add_patch(_rect_patch(highlight_node.get_bounding_rect(), linewidth=2, linestyle='--',
+                                                edgecolor=style['edgecolor'], facecolor=style['facecolor'])))
+    return artists
+
+
+def _rect_patch(rect, **kwargs):
+    return patches.Rectangle((rect.min_x, rect.min_y), rect.width, rect.height, **kwargs)
+
+
+def _annotate_entry(ax, entry: RTreeEntry, style):
+    return ax.annotate(
+        str(entry.data),
+        color=style['text_color'],
+        fontsize=6,
+        fontweight='bold',
+        xy=(entry.rect.min_x, entry.rect.min_y),
+        xytext=(5, 4),
+        textcoords='offset pixels',
+        bbox=dict(fc=style['text_facecolor'], ec='none', pad=3),
+        va='bottom',
+        ha='left')
+
+
+_LEAF_STYLE = dict(edgecolor=(0.24, 0.52, 0.78), facecolor=(0.24, 0.52, 0.78, 0.5), text_color=(0.09, 0.19, 0.29),
+                   text_facecolor=(0.24, 0.52, 0.78, 0.25))
+_HIGHLIGHT_LEAF_STYLE = dict(edgecolor=(0.78, 0.24, 0.52), facecolor=(0.78, 0.24, 0.52, 0.64),
+                             text_color=(0.25, 0.08, 0.17), text_facecolor=(0.78, 0.24, 0.52, 0.25))
+_NODE_STYLE = dict(edgecolor=(0.82, 0.71, 0.55, 0.5), facecolor=(0.82, 0.71, 0.55, 0.25))
+_HIGHLIGHT_NODE_STYLE = dict(edgecolor=(0.82, 0.57, 0.55), facecolor=(0.82, 0.57, 0.55, 0.6))
@@ -0,0 +1,371 @@
+"""
+Module containing a disk-resident, read-only R-tree. The tree is stored in a file made up of fixed-size pages (one node
+per page), which is accessed using mmap. Nodes are only read (and decoded) when they are visited, so queries only touch
+the pages along the search path, and the file can be larger than the available memory. Since the file is mapped
+read-only, multiple processes opening the same file share its pages through the OS page cache.
+
+Use write_disk_tree to write an existing R-tree to a file, and DiskRTree to open it. DiskRTree supports the same query
+methods as RTreeBase (query, count, nearest, search, etc.), with the same Location semantics:
+
+    write_disk_tree(tree, 'my_tree.rtd')
+    with DiskRTree('my_tree.rtd') as t:
+        entries = list(t.query((2, 4)))
+
+By default, decoded nodes are only kept in memory for as long as they are referenced. To keep a bounded number of
+recently-used nodes in memory (so that frequently-visited pages do not need to be decoded again), pass in a BufferPool:
+
+    with DiskRTree('my_tree.rtd', buffer_pool=BufferPool(capacity=1000)) as t:
+        ...
+
+File layout (all values are little-endian):
+
+Page 0 (header): magic (4 bytes, b'RTDK'), version (uint16), reserved (uint16), page size (uint32), max_entries
+    (uint32), min_entries (uint32), node count (uint64), offset of the payload section (uint64), size of the payload
+    section (uint64).
+Pages 1 to (node count): one node per page, in level order (so the root is always page 1). Each page starts with a
+    header containing the leaf flag (uint8), a reserved byte, the number of entries (uint16), and the level of the node
+    (uint32, with the root being level 0), followed by the entries. Each entry contains min_x, min_y, max_x, max_y
+    (float64), followed by a reference (uint64) and length (uint64). For non-leaf entries, the reference is the page
+    number of the child node (and the length is 0). For leaf entries, the reference and length are the offset and size
+    of the serialized data within the payload section.
+Payload section: serialized data of the leaf entries (by default using pickle), starting at the first page boundary
+    after the node pages.
+"""
+
+import mmap
+import pickle
+import struct
+import weakref
+from collections import OrderedDict
+from typing import TypeVar, Generic, Callable, Dict, List
+from .rtree import RTreeBase, RTreeNode, RTreeEntry
+from rtreelib.models import Rect
+
+T = TypeVar('T')
+
+MAGIC = b'RTDK'
+VERSION = 1
+DEFAULT_PAGE_SIZE = 4096
+ROOT_PAGE = 1
+_FILE_HEADER = struct.Struct('<4sHHIIIQQQ')
+_PAGE_HEADER = struct.Struct('<BBHI')
+_ENTRY = struct.Struct('<ddddQQ')
+EVICTION_POLICIES = ('lru', 'clock')
+
+
+def max_entries_per_page(page_size: int = DEFAULT_PAGE_SIZE) -> int:
+    """Returns the maximum number of entries that fit in a page of the given size."""
+    return (page_size - _PAGE_HEADER.size) // _ENTRY.size
+
+
+def write_disk_tree(tree: RTreeBase[T], path: str, page_size: int = DEFAULT_PAGE_SIZE,
+                    dumps: Callable[[T], bytes] = pickle.dumps) -> None:
+    """
+    Writes an R-tree to a file using the page layout described in this module, so that it can be opened using
+    DiskRTree.
+    :param tree: R-tree to write
+    :param path: Path of the file to write
+    :param page_size: Size of each page in bytes. Each page must be able to hold a node with max_entries entries.
+        Optional (defaults to 4096).
+    :param dumps: Function used to serialize the data of each leaf entry. Optional (defaults to pickle.dumps).
+    """
+    if tree.max_entries > max_entries_per_page(page_size):
+        raise ValueError(f"A page size of {page_size} bytes can hold at most {max_entries_per_page(page_size)} "
+                         f"entries, but the tree has max_entries={tree.max_entries}. Please use a larger page size.")
+    # Assign a page number to every node in level order
+    nodes = [(tree.root, 0)]
+    page_numbers: Dict[RTreeNode[T], int] = {tree.root: ROOT_PAGE}
+    i = 0
+    while i < len(nodes):
+        node, level = nodes[i]
+        if not node.is_leaf:
+            for entry in node.entries:
+                page_numbers[entry.child] = len(nodes) + ROOT_PAGE
+                nodes.append((entry.child, level + 1))
+        i += 1
+    payload_offset = (len(nodes) + 1) * page_size
+    payloads = bytearray()
+    with open(path, 'wb') as f:
+        f.write(bytes(page_size))
+        for node, level in nodes:
+            page = bytearray(page_size)
+            _PAGE_HEADER.pack_into(page, 0, node.is_leaf, 0, len(node.entries), level)
+            for j, entry in enumerate(node.entries):
+                rect = entry.rect
+                if node.is_leaf:
+                    data = dumps(entry.data)
+                    ref, length = len(payloads), len(data)
+                    payloads += data
+                else:
+                    ref, length = page_numbers[entry.child], 0
+                _ENTRY.pack_into(page, _PAGE_HEADER.size + j * _ENTRY.size,
+                                 rect.min_x, rect.min_y, rect.max_x, rect.max_y, ref, length)
+            f.write(page)
+        f.write(payloads)
+        f.seek(0)
+        f.write(_FILE_HEADER.pack(MAGIC, VERSION, 0, page_size, tree.max_entries, tree.min_entries, len(nodes),
+                                  payload_offset, len(payloads)))
+
+
+class BufferPool(Generic[T]):
+    """
+    Cache of decoded nodes of a DiskRTree, holding at most a fixed number of nodes. When the pool is full, a node is
+    evicted to make room for the new one, using either LRU (least recently used) or CLOCK (an approximation of LRU
+    which avoids reordering on every hit) eviction. Nodes in the upper levels of the tree (which are visited by almost
+    every query) are pinned: they are kept in memory permanently, and do not count towards the capacity of the pool.
+    Since nodes are cached by page number, a buffer pool should only be used by a single DiskRTree.
+    """
+
+    def __init__(self, capacity: int, policy: str = 'lru', pinned_levels: int = 2):
+        """
+        Creates a buffer pool.
+        :param capacity: Maximum number of (unpinned) nodes to keep in memory
+        :param policy: Eviction policy, either 'lru' or 'clock'. Optional (defaults to 'lru').
+        :param pinned_levels: Number of levels, starting from the root, whose nodes are pinned. Optional (defaults to
+            2, meaning the root node and its children are pinned).
+        """
+        if capacity < 1:
+            raise ValueError(f"Invalid buffer pool capacity: {capacity}. Capacity must be at least 1.")
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Invalid eviction policy: {policy}. Policy must be one of: "
+                             f"{', '.join(EVICTION_POLICIES)}")
+        self.capacity = capacity
+        self.policy = policy
+        self.pinned_levels = pinned_levels
+        self.clear()
+
+    def clear(self) -> None:
+        """Removes all nodes (including pinned nodes) from the pool, and resets the counters."""
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pinned: Dict[int, RTreeNode[T]] = {}
+        # LRU: nodes ordered from least to most recently used
+        self._lru: Dict[int, RTreeNode[T]] = OrderedDict()
+        # CLOCK: circular list of slots (page numbers), each having a reference bit
+        self._clock: Dict[int, RTreeNode[T]] = {}
+        self._slots: List[int] = []
+        self._slot_index: Dict[int, int] = {}
+        self._referenced: List[bool] = []
+        self._hand = 0
+
+    def __len__(self):
+        """Returns the number of unpinned nodes currently in the pool."""
+        return len(self._lru) + len(self._clock)
+
+    def __contains__(self, page: int):
+        return page in self._pinned or page in self._lru or page in self._clock
+
+    @property
+    def pinned_count(self) -> int:
+        """Returns the number of pinned nodes currently in the pool."""
+        return len(self._pinned)
+
+    @property
+    def hit_ratio(self) -> float:
+        """Returns the fraction of lookups that were served from the pool (0 if there have not been any lookups)."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, page: int, load: Callable[[int], RTreeNode[T]]) -> RTreeNode[T]:
+        """
+        Returns the node stored in the given page, loading it (and possibly evicting another node) if it is not in the
+        pool.
+        :param page: Page number
+        :param load: Function used to load the node if it is not in the pool
+        :return: Node stored in the page
+        """
+        node = self._pinned.get(page)
+        if node is not None:
+            self.hits += 1
+            return node
+        if self.policy == 'lru':
+            node = self._lru.get(page)
+            if node is not None:
+                self._lru.move_to_end(page)
+        else:
+            node = self._clock.get(page)
+            if node is not None:
+                self._referenced[self._slot_index[page]] = True
+        if node is not None:
+            self.hits += 1
+            return node
+        self.misses += 1
+        node = load(page)
+        if getattr(node, 'level', self.pinned_levels) < self.pinned_levels:
+            self._pinned[page] = node
+        elif self.policy == 'lru':
+            self._add_lru(page, node)
+        else:
+            self._add_clock(page, node)
+        return node
+
+    def _add_lru(self, page: int, node: RTreeNode[T]):
+        if len(self._lru) >= self.capacity:
+            self._lru.popitem(last=False)
+            self.evictions += 1
+        self._lru[page] = node
+
+    def _add_clock(self, page: int, node: RTreeNode[T]):
+        if len(self._slots) < self.capacity:
+            self._slot_index[page] = len(self._slots)
+            self._slots.append(page)
+            self._referenced.append(True)
+        else:
+            # Advance the hand, giving referenced nodes a second chance, until an unreferenced node is found
+            while self._referenced[self._hand]:
+                self._referenced[self._hand] = False
+                self._hand = (self._hand + 1) % self.capacity
+            evicted = self._slots[self._hand]
+            del self._clock[evicted]
+            del self._slot_index[evicted]
+            self.evictions += 1
+            self._slots[self._hand] = page
+            self._slot_index[page] = self._hand
+            self._referenced[self._hand] = True
+            self._hand = (self._hand + 1) % self.capacity
+        self._clock[page] = node
+
+
+class DiskRTree(RTreeBase[T]):
+    """
+    Read-only R-tree backed by a file written by write_disk_tree. Nodes are decoded from their pages on demand (when
+    they are visited), so queries only touch the pages along the search path. Unless a buffer pool is used, decoded
+    nodes are kept only for as long as they are referenced (other than the root node, which is always kept).
+    """
+
+    def __init__(self, path: str, loads: Callable[[bytes], T] = pickle.loads, buffer_pool: BufferPool[T] = None):
+        """
+        Opens a disk-resident R-tree.
+        :param path: Path of a file written by write_disk_tree
+        :param loads: Function used to deserialize the data of each leaf entry. Optional (defaults to pickle.loads).
+        :param buffer_pool: Buffer pool used to cache decoded nodes. Optional (by default, decoded nodes are only kept
+            for as long as they are referenced).
+        """
+        self._file = open(path, 'rb')
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, _, page_size, max_entries, min_entries, node_count, payload_offset, payload_size = \
+                _FILE_HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC:
+                raise ValueError("Invalid R-tree file (unrecognized header)")
+            if version > VERSION:
+                raise ValueError(f"Unsupported R-tree file version: {version} (the maximum supported version is "
+                                 f"{VERSION})")
+        except Exception:
+            self.close()
+            raise
+        super().__init__(
+            max_entries=max_entries,
+            min_entries=min_entries,
+            insert=_read_only,
+            choose_leaf=_read_only,
+            adjust_tree=_read_only,
+            overflow_strategy=_read_only
+        )
+        self.page_size = page_size
+        self.node_count = node_count
+        self.loads = loads
+        self.pages_read = 0
+        self.buffer_pool = buffer_pool
+        self._payload_offset = payload_offset
+        self._nodes = weakref.WeakValueDictionary()
+        self.root = self.get_node(ROOT_PAGE)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        """Closes the underlying file."""
+        if getattr(self, '_mmap', None) is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def get_node(self, page: int) -> RTreeNode[T]:
+        """
+        Returns the node stored in the given page, reading and decoding the page if the node is not already in memory.
+        :param page: Page number (the root node is stored in page 1)
+        :return: Decoded node
+        """
+        if self.buffer_pool is not None:
+            return self.buffer_pool.get(page, self.read_node)
+        node = self._nodes.get(page)
+        if node is None:
+            node = self.read_node(page)
+            self._nodes[page] = node
+        return node
+
+    def read_node(self, page: int) -> RTreeNode[T]:
+        """
+        Reads and decodes the node stored in the given page (always reading the page, even if the node is already in
+        memory). Non-leaf entries of the node resolve their child nodes lazily, and leaf entries deserialize their data
+        lazily, so that decoding a node does not touch any other pages.
+        :param page: Page number (the root node is stored in page 1)
+        :return: Decoded node
+        """
+        if not ROOT_PAGE <= page <= self.node_count:
+            raise IndexError(f"Invalid page number: {page}")
+        self.pages_read += 1
+        offset = page * self.page_size
+        is_leaf, _, count, level = _PAGE_HEADER.unpack_from(self._mmap, offset)
+        node = RTreeNode(self, bool(is_leaf))
+        node.level = level
+        offset += _PAGE_HEADER.size
+        view = memoryview(self._mmap)[offset:offset + count * _ENTRY.size]
+        node.entries = [_DiskEntry(self, node, Rect(min_x, min_y, max_x, max_y), ref, length)
+                        for min_x, min_y, max_x, max_y, ref, length in _ENTRY.iter_unpack(view)]
+        view.release()
+        return node
+
+    def read_payload(self, offset: int, length: int) -> T:
+        """Deserializes the data of a leaf entry, given its offset and length within the payload section."""
+        start = self._payload_offset + offset
+        return self.loads(self._mmap[start:start + length])
+
+    def update(self, entry: RTreeEntry[T], rect: Rect, max_enlargement: float = 0.1) -> RTreeEntry[T]:
+        _read_only()
+
+    def delete(self, entry: RTreeEntry[T]) -> None:
+        _read_only()
+
+
+class _DiskEntry(RTreeEntry[T]):
+    """
+    Entry of a node decoded from a DiskRTree page. The child node (for non-leaf entries) and data (for leaf entries) are
+    resolved lazily when accessed.
+    """
+
+    # noinspection PyMissingConstructor
+    def __init__(self, tree: DiskRTree[T], node: RTreeNode[T], rect: Rect, ref: int, length: int):
+        self.rect = rect
+        self._tree = tree
+        self._node = node
+        self._ref = ref
+        self._length = length
+
+    @property
+    def is_leaf(self):
+        return self._node.is_leaf
+
+    @property
+    def child(self) -> RTreeNode[T]:
+        if self._node.is_leaf:
+            return None
+        child = self._tree.get_node(self._ref)
+        child.parent = self._node
+        return child
+
+    @property
+    def data(self) -> T:
+        if not self._node.is_leaf:
+            return None
+        return self._tree.read_payload(self._ref, self._length)
+
+
+def _read_only(*args, **kwargs):
+    raise RuntimeError("DiskRTree is read-only. To modify the tree, modify the original R-tree and write it to disk "
+                       "again using write_disk_tree.")
@@ -0,0 +1,179 @@
+"""
+Module for measuring the memory footprint of an R-tree, broken down into the bounding rectangles (including their
+coordinates), entries, nodes, entry lists, and payload (the data of the leaf entries). This helps estimate how much
+memory a larger index will need before building it.
+
+Sizes are measured using sys.getsizeof, counting each object once (by id), so shared objects (such as a payload object
+referenced by several entries, or interned coordinates) are not double counted. Payloads are measured shallowly: objects
+referenced by a payload (such as the items of a list) are not included. Since sys.getsizeof does not include the storage
+of instance attributes, the size of the rectangle, entry, and node objects is measured once per call using tracemalloc.
+"""
+
+import random
+import sys
+import tracemalloc
+from typing import Optional, Set, List, Callable
+from .rtree import RTreeBase, RTreeNode, RTreeEntry
+from rtreelib.models import Rect
+
+
+class Footprint:
+    """
+    Memory footprint of an R-tree (see footprint), in bytes per component. If the footprint was estimated by sampling
+    leaf nodes, the leaf-level sizes are extrapolated from the sampled nodes (and estimated is True).
+    """
+
+    def __init__(self):
+        # Bounding rectangles of all entries (including their coordinates)
+        self.rects = 0
+        # Entry objects (leaf and non-leaf)
+        self.entries = 0
+        # Node objects
+        self.nodes = 0
+        # Lists holding the entries of each node
+        self.lists = 0
+        # Data of the leaf entries
+        self.payload = 0
+        self.node_count = 0
+        self.leaf_entry_count = 0
+        self.estimated = False
+
+    def __repr__(self):
+        return (f'Footprint(total={self.total}, rects={self.rects}, entries={self.entries}, nodes={self.nodes}, '
+                f'lists={self.lists}, payload={self.payload}, bytes_per_leaf_entry={self.bytes_per_leaf_entry:.1f}, '
+                f'estimated={self.estimated})')
+
+    @property
+    def total(self) -> int:
+        return self.rects + self.entries + self.nodes + self.lists + self.payload
+
+    @property
+    def bytes_per_leaf_entry(self) -> float:
+        """Total size divided by the number of leaf entries (that is, the amortized cost of each indexed item)."""
+        return self.total / self.leaf_entry_count if self.leaf_entry_count else 0.0
+
+    def as_dict(self) -> dict:
+        """Returns the footprint as a dictionary (for example, for serializing to JSON)."""
+        return {
+            'total': self.total,
+            'rects': self.rects,
+            'entries': self.entries,
+            'nodes': self.nodes,
+            'lists': self.lists,
+            'payload': self.payload,
+            'node_count': self.node_count,
+            'leaf_entry_count': self.leaf_entry_count,
+            'bytes_per_leaf_entry': self.bytes_per_leaf_entry,
+            'estimated': self.estimated,
+        }
+
+
+def footprint(tree: RTreeBase, sample: Optional[int] = None, seed: Optional[int] = None) -> Footprint:
+    """
+    Measures the memory footprint of an R-tree in a single traversal. For very large trees, pass sample to estimate the
+    footprint instead: the non-leaf levels are still measured exactly (they are a small fraction of the tree), but only
+    a random sample of the leaf nodes is measured, and the sizes of the leaf nodes, their entries, rectangles, and
+    payload are extrapolated from the sample (based on the number of leaf nodes and leaf entries, which are counted
+    exactly).
+    :param tree: R-tree to measure
+    :param sample: Optional number of leaf nodes to sample. If not provided (or if the tree has no more leaf nodes than
+        this), all nodes are measured.
+    :param seed: Optional seed for choosing the sampled leaf nodes
+    :return: Memory footprint of the tree
+    """
+    if sample is not None and sample <= 0:
+        raise ValueError(f"Sample size must be positive (got {sample})")
+    result = Footprint()
+    measure = _Measure()
+    leaves: List[RTreeNode] = []
+    stack = [tree.root]
+    while stack:
+        node = stack.pop()
+        result.node_count += 1
+        if node.is_leaf:
+            result.leaf_entry_count += len(node.entries)
+            leaves.append(node)
+            continue
+        measure.add_node(result, node)
+        stack.extend(entry.child for entry in node.entries)
+
+    if sample is None or len(leaves) <= sample:
+        for leaf in leaves:
+            measure.add_node(result, leaf)
+        return result
+
+    sampled = Footprint()
+    for leaf in random.Random(seed).sample(leaves, sample):
+        measure.add_node(sampled, leaf)
+    sampled_entry_count = measure.leaf_entries
+    node_ratio = len(leaves) / sample
+    entry_ratio = result.leaf_entry_count / sampled_entry_count if sampled_entry_count else 0.0
+    result.nodes += round(sampled.nodes * node_ratio)
+    result.lists += round(sampled.lists * node_ratio)
+    result.entries += round(sampled.entries * entry_ratio)
+    result.rects += round(sampled.rects * entry_ratio)
+    result.payload += round(sampled.payload * entry_ratio)
+    result.estimated = True
+    return result
+
+
+class _Measure:
+    """
+    Accumulates the sizes of the nodes of a tree, keeping track of the ids of the objects that may be shared
+    (rectangles, coordinates, and payloads), so that they are only counted once.
+    """
+
+    def __init__(self):
+        self.seen: Set[int] = set()
+        self.leaf_entries = 0
+        # sys.getsizeof does not include the storage of instance attributes, which is a dictionary (or, since Python
+        # 3.11, an inline array of values that is only turned into a dictionary when __dict__ is accessed, so measuring
+        # the dictionary would grow the tree). Instead, the size of each class of object is measured once using probe
+        # instances (sharing the same attribute values, so that only the instances themselves are counted).
+        rect = Rect(0.0, 0.0, 0.0, 0.0)
+        entry = RTreeEntry(rect)
+        entries = [entry]
+        self.rect_size = _get_instance_size(lambda: Rect(0.0, 0.0, 0.0, 0.0))
+        self.entry_size = _get_instance_size(lambda: RTreeEntry(rect))
+        self.node_size = _get_instance_size(lambda: RTreeNode(None, True, entries=entries))
+
+    def add_node(self, result: Footprint, node: RTreeNode) -> None:
+        getsizeof = sys.getsizeof
+        seen = self.seen
+        result.nodes += self.node_size
+        result.lists += getsizeof(node.entries)
+        result.entries += len(node.entries) * self.entry_size
+        for entry in node.entries:
+            rect = entry.rect
+            if id(rect) not in seen:
+                seen.add(id(rect))
+                result.rects += self.rect_size
+                for coordinate in (rect.min_x, rect.min_y, rect.max_x, rect.max_y):
+                    if id(coordinate) not in seen:
+                        seen.add(id(coordinate))
+                        result.rects += getsizeof(coordinate)
+            if entry.is_leaf and entry.data is not None and id(entry.data) not in seen:
+                seen.add(id(entry.data))
+                result.payload += getsizeof(entry.data)
+        if node.is_leaf:
+            self.leaf_entries += len(node.entries)
+
+
+def _get_instance_size(factory: Callable[[], object], count: int = 1000) -> int:
+    """
+    Returns the size of an instance (including its attribute storage, but not the attribute values), measured using
+    tracemalloc as the average memory allocated by creating a number of instances using the given factory.
+    """
+    probes: List[object] = [None] * count
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(count):
+            probes[i] = factory()
+        size = (tracemalloc.get_traced_memory()[0] - before) / count
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    return max(round(size), sys.getsizeof(probes[0]))
@@ -2,7 +2,10 @@ from .axis import Axis
 from .dimension import Dimension
 from .point import Point
 from .rect import Rect, union, union_all
-from .location import Location, get_loc_intersection_fn
+from .location import Location, get_loc_intersection_fn, get_loc_distance_fn, parse_loc
+from .query_stats import QueryStats
+from .tree_stats import TreeStats, LevelStats
 from .entry_distribution import EntryDistribution
 from .rstar_stat import RStarStat
 from .rstar_cache import RStarCache
+from .change_set import ChangeSet
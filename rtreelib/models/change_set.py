@@ -0,0 +1,69 @@
+from typing import TypeVar, Generic, Dict, Iterable
+from ..rtree import RTreeNode, RTreeEntry
+
+T = TypeVar('T')
+
+
+class ChangeSet(Generic[T]):
+    """
+    Keeps track of the nodes and entries of an R-tree that have changed since the change set was last cleared (see
+    RTreeBase.track_changes). This allows mirroring the tree elsewhere (such as in a database) at a cost proportional to
+    the size of the change rather than the size of the tree.
+
+    A node is dirty if its entries (or the rectangles of its entries) may have changed, or if it was newly created. The
+    entries of dirty nodes should be considered dirty as well. Removed nodes and entries are kept until the change set
+    is cleared (so that their identity cannot be reused by new objects in the meantime). Note that an entry that was
+    removed and then reinserted elsewhere (for example, when condensing the tree) appears in a dirty node, so it is not
+    listed in removed_entries.
+    """
+
+    def __init__(self, height: int):
+        # Dictionaries are used as ordered sets
+        self._dirty_nodes: Dict[RTreeNode[T], None] = {}
+        self._removed_nodes: Dict[RTreeNode[T], None] = {}
+        self._removed_entries: Dict[RTreeEntry[T], None] = {}
+        # Height of the tree when the change set was last cleared. If the height changes (because the root was split or
+        # the tree was shortened), the level of every node changes.
+        self.height = height
+
+    def __bool__(self):
+        return bool(self._dirty_nodes or self._removed_nodes or self._removed_entries)
+
+    @property
+    def dirty_nodes(self) -> Iterable[RTreeNode[T]]:
+        """Nodes that were created or modified (excluding nodes that were subsequently removed)."""
+        return [n for n in self._dirty_nodes if n not in self._removed_nodes]
+
+    @property
+    def removed_nodes(self) -> Iterable[RTreeNode[T]]:
+        """Nodes that were removed from the tree."""
+        return list(self._removed_nodes)
+
+    @property
+    def removed_entries(self) -> Iterable[RTreeEntry[T]]:
+        """
+        Entries that were removed from the tree, excluding entries that were subsequently reinserted into a dirty node.
+        """
+        live = {e for n in self.dirty_nodes for e in n.entries}
+        return [e for e in self._removed_entries if e not in live]
+
+    def mark(self, node: RTreeNode[T]) -> None:
+        """Marks a node as dirty, along with all of its ancestors (whose covering rectangles may have changed)."""
+        while node is not None:
+            self._dirty_nodes[node] = None
+            node = node.parent
+
+    def remove_node(self, node: RTreeNode[T]) -> None:
+        """Records the removal of a node."""
+        self._removed_nodes[node] = None
+
+    def remove_entry(self, entry: RTreeEntry[T]) -> None:
+        """Records the removal of an entry."""
+        self._removed_entries[entry] = None
+
+    def clear(self, height: int) -> None:
+        """Clears all changes (for example, once they have been written)."""
+        self._dirty_nodes.clear()
+        self._removed_nodes.clear()
+        self._removed_entries.clear()
+        self.height = height
@@ -1,4 +1,5 @@
-from typing import Union, Tuple, List
+import math
+from typing import Union, Tuple, List, Callable
 from functools import partial
 from .rect import Rect
 from .point import Point
@@ -14,17 +15,32 @@ Location = Union[
 
 
 def get_loc_intersection_fn(loc: Location):
+    loc = parse_loc(loc)
     if isinstance(loc, Point):
         return partial(point_intersects_rect, loc)
-    if isinstance(loc, Rect):
-        return partial(rect_intersects_rect, loc)
+    return partial(rect_intersects_rect, loc)
+
+
+def get_loc_distance_fn(loc: Location) -> Callable[[Rect], float]:
+    """
+    Returns a function that calculates the minimum (Euclidean) distance between the given location and a rectangle. The
+    distance is 0 if the location intersects the rectangle.
+    """
+    loc = parse_loc(loc)
+    if isinstance(loc, Point):
+        loc = Rect(loc.x, loc.y, loc.x, loc.y)
+    return partial(rect_distance, loc)
+
+
+def parse_loc(loc: Location) -> Union[Point, Rect]:
+    """Converts a location (which may be given as a tuple or list of coordinates) to either a Point or a Rect."""
+    if isinstance(loc, (Point, Rect)):
+        return loc
     if isinstance(loc, (list, tuple)):
         if len(loc) == 2:
-            point = Point(loc[0], loc[1])
-            return partial(point_intersects_rect, point)
+            return Point(loc[0], loc[1])
         if len(loc) == 4:
-            rect = Rect(loc[0], loc[1], loc[2], loc[3])
-            return partial(rect_intersects_rect, rect)
+            return Rect(loc[0], loc[1], loc[2], loc[3])
         raise TypeError(f"Invalid number of coordinates in location: {len(loc)}. Location must have either 2 "
                         f"coordinates for a Point, or 4 coordinates for a Rect.")
     raise TypeError(f"Invalid location type: {type(loc)}. Location must either be a Point, Rect, list or tuple.")
@@ -36,3 +52,9 @@ def point_intersects_rect(point: Point, rect: Rect):
 
 def rect_intersects_rect(rect1: Rect, rect2: Rect):
     return rect1.intersects(rect2)
+
+
+def rect_distance(rect1: Rect, rect2: Rect) -> float:
+    dx = max(rect1.min_x - rect2.max_x, rect2.min_x - rect1.max_x, 0)
+    dy = max(rect1.min_y - rect2.max_y, rect2.min_y - rect1.max_y, 0)
+    return math.hypot(dx, dy)
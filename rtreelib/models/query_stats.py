@@ -0,0 +1,43 @@
+from typing import List
+
+
+class QueryStats:
+    """
+    Execution statistics of a query, which can be passed to RTreeBase.query, search, or search_nodes (or obtained using
+    RTreeBase.explain). These help diagnose slow queries, by showing how much of the tree had to be visited to answer
+    the query relative to the number of results (a badly-shaped tree visits many nodes and tests many entries for few
+    hits, while a large query window simply has many hits).
+
+    Note that the statistics are updated as the query results are iterated, so they are only complete once the results
+    have been fully consumed. The same instance may be passed to multiple queries to accumulate their statistics.
+    """
+
+    def __init__(self):
+        # Number of nodes visited at each level of the tree (with index 0 corresponding to the root level)
+        self.nodes_visited: List[int] = []
+        # Number of bounding rectangle tests (or node condition evaluations) done to decide which nodes to visit
+        self.mbr_tests = 0
+        # Number of leaf entries tested against the query
+        self.entries_tested = 0
+        # Number of results returned
+        self.hits = 0
+        # Time spent executing the query (in seconds), excluding the time spent by the caller between results
+        self.elapsed = 0.0
+
+    def __repr__(self):
+        return (f'QueryStats(nodes_visited={self.nodes_visited}, mbr_tests={self.mbr_tests}, '
+                f'entries_tested={self.entries_tested}, hits={self.hits}, elapsed={self.elapsed:.6f})')
+
+    @property
+    def total_nodes_visited(self) -> int:
+        """Total number of nodes visited (at all levels)."""
+        return sum(self.nodes_visited)
+
+    def visit(self, level: int) -> None:
+        """
+        Records a visit to a node.
+        :param level: Level of the node (with 0 corresponding to the root level)
+        """
+        while len(self.nodes_visited) <= level:
+            self.nodes_visited.append(0)
+        self.nodes_visited[level] += 1
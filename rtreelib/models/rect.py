@@ -45,6 +45,10 @@ class Rect:
         y2 = min(max(a.min_y, a.max_y), max(b.min_y, b.max_y))
         return x1 < x2 and y1 < y2
 
+    def contains(self, rect: 'Rect') -> bool:
+        return self.min_x <= rect.min_x and self.min_y <= rect.min_y \
+               and rect.max_x <= self.max_x and rect.max_y <= self.max_y
+
     def get_intersection_area(self, rect: 'Rect') -> float:
         x_overlap = max(0.0, min(self.max_x, rect.max_x) - max(self.min_x, rect.min_x))
         y_overlap = max(0.0, min(self.max_y, rect.max_y) - max(self.min_y, rect.min_y))
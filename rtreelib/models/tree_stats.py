@@ -0,0 +1,186 @@
+from operator import attrgetter
+from typing import List, Optional
+from .rect import Rect
+
+
+class LevelStats:
+    """Quality metrics of the nodes at one level of an R-tree (see TreeStats)."""
+
+    def __init__(self, level: int, max_entries: int):
+        # Level of the nodes (with 0 corresponding to the root level)
+        self.level = level
+        self.max_entries = max_entries
+        self.node_count = 0
+        # Number of entries in the nodes at this level (that is, the number of nodes at the next level, or the number of
+        # leaf entries at the leaf level)
+        self.entry_count = 0
+        # Sum of the areas and perimeters of the bounding rectangles of the nodes at this level
+        self.mbr_area = 0.0
+        self.mbr_perimeter = 0.0
+        # Sum of the pairwise intersection areas of the entries of each node (that is, the overlap between sibling child
+        # nodes, or between sibling leaf entries at the leaf level)
+        self.overlap_area = 0.0
+        # Sum of the area of each node's bounding rectangle that is not covered by any of its entries
+        self.dead_space = 0.0
+
+    def __repr__(self):
+        return (f'LevelStats(level={self.level}, node_count={self.node_count}, entry_count={self.entry_count}, '
+                f'fill_factor={self.fill_factor:.3f}, mbr_area={self.mbr_area}, mbr_perimeter={self.mbr_perimeter}, '
+                f'overlap_area={self.overlap_area}, dead_space={self.dead_space})')
+
+    @property
+    def fill_factor(self) -> float:
+        """Average fraction of max_entries used by the nodes at this level."""
+        return self.entry_count / (self.node_count * self.max_entries) if self.node_count else 0.0
+
+    def add_node(self, rect: Optional[Rect], entry_rects: List[Rect]) -> None:
+        """
+        Adds the metrics of a node to this level.
+        :param rect: Bounding rectangle of the node (None if the node is empty)
+        :param entry_rects: Rectangles of the node's entries
+        """
+        self.node_count += 1
+        self.entry_count += len(entry_rects)
+        if rect is None:
+            return
+        area = rect.area()
+        self.mbr_area += area
+        self.mbr_perimeter += rect.perimeter()
+        overlap = _get_pairwise_overlap(entry_rects)
+        self.overlap_area += overlap
+        self.dead_space += max(0.0, area - _get_union_area(entry_rects))
+
+    def as_dict(self) -> dict:
+        return {
+            'level': self.level,
+            'node_count': self.node_count,
+            'entry_count': self.entry_count,
+            'fill_factor': self.fill_factor,
+            'mbr_area': self.mbr_area,
+            'mbr_perimeter': self.mbr_perimeter,
+            'overlap_area': self.overlap_area,
+            'dead_space': self.dead_space,
+        }
+
+
+class TreeStats:
+    """
+    Quality metrics of an R-tree (see RTreeBase.stats), which help compare trees built from the same data using
+    different strategies. Lower overlap, dead space, and total area and perimeter generally mean cheaper queries, since
+    fewer nodes need to be visited. Metrics are reported per level (see LevelStats), and totaled over all levels.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.levels: List[LevelStats] = []
+
+    def __repr__(self):
+        return (f'TreeStats(height={self.height}, node_count={self.node_count}, '
+                f'leaf_entry_count={self.leaf_entry_count}, overlap_area={self.overlap_area}, '
+                f'dead_space={self.dead_space}, mbr_area={self.mbr_area}, mbr_perimeter={self.mbr_perimeter})')
+
+    @property
+    def height(self) -> int:
+        return len(self.levels)
+
+    @property
+    def node_count(self) -> int:
+        return sum(level.node_count for level in self.levels)
+
+    @property
+    def leaf_entry_count(self) -> int:
+        return self.levels[-1].entry_count if self.levels else 0
+
+    @property
+    def fill_factor(self) -> float:
+        """Average fraction of max_entries used by the nodes of the tree (at all levels)."""
+        node_count = self.node_count
+        return sum(level.entry_count for level in self.levels) / (node_count * self.max_entries) if node_count else 0.0
+
+    @property
+    def overlap_area(self) -> float:
+        """
+        Total overlap between sibling nodes (excluding the overlap between leaf entries, which is due to the data).
+        """
+        return sum(level.overlap_area for level in self.levels[:-1])
+
+    @property
+    def dead_space(self) -> float:
+        return sum(level.dead_space for level in self.levels)
+
+    @property
+    def mbr_area(self) -> float:
+        return sum(level.mbr_area for level in self.levels)
+
+    @property
+    def mbr_perimeter(self) -> float:
+        return sum(level.mbr_perimeter for level in self.levels)
+
+    def add_node(self, level: int, rect: Optional[Rect], entry_rects: List[Rect]) -> None:
+        """
+        Adds the metrics of a node.
+        :param level: Level of the node (with 0 corresponding to the root level)
+        :param rect: Bounding rectangle of the node (None if the node is empty)
+        :param entry_rects: Rectangles of the node's entries
+        """
+        while len(self.levels) <= level:
+            self.levels.append(LevelStats(len(self.levels), self.max_entries))
+        self.levels[level].add_node(rect, entry_rects)
+
+    def as_dict(self) -> dict:
+        """Returns the metrics as a dictionary (for example, for serializing to JSON)."""
+        return {
+            'height': self.height,
+            'node_count': self.node_count,
+            'leaf_entry_count': self.leaf_entry_count,
+            'fill_factor': self.fill_factor,
+            'overlap_area': self.overlap_area,
+            'dead_space': self.dead_space,
+            'mbr_area': self.mbr_area,
+            'mbr_perimeter': self.mbr_perimeter,
+            'levels': [level.as_dict() for level in self.levels],
+        }
+
+
+def _get_pairwise_overlap(rects: List[Rect]) -> float:
+    """
+    Returns the sum of the pairwise intersection areas of the given rectangles. The rectangles are sorted by min_x, so
+    that each rectangle only needs to be compared with the following rectangles that start before it ends along the x
+    axis (rather than with every other rectangle).
+    """
+    rects = sorted(rects, key=attrgetter('min_x'))
+    count = len(rects)
+    overlap = 0.0
+    for i in range(count):
+        r1 = rects[i]
+        for j in range(i + 1, count):
+            r2 = rects[j]
+            if r2.min_x >= r1.max_x:
+                break
+            height = min(r1.max_y, r2.max_y) - max(r1.min_y, r2.min_y)
+            if height > 0:
+                overlap += (min(r1.max_x, r2.max_x) - r2.min_x) * height
+    return overlap
+
+
+def _get_union_area(rects: List[Rect]) -> float:
+    """
+    Returns the area covered by the union of the given rectangles (counting the area where several rectangles overlap
+    only once). The x axis is split into slabs at the rectangles' min_x and max_x, and within each slab the lengths of
+    the y intervals of the rectangles that span it are merged.
+    """
+    xs = sorted({x for r in rects for x in (r.min_x, r.max_x)})
+    area = 0.0
+    for x1, x2 in zip(xs, xs[1:]):
+        intervals = sorted((r.min_y, r.max_y) for r in rects if r.min_x <= x1 and r.max_x >= x2)
+        length = 0.0
+        end = None
+        for min_y, max_y in intervals:
+            if end is None or min_y > end:
+                length += max_y - min_y
+                end = max_y
+            elif max_y > end:
+                length += max_y - end
+                end = max_y
+        area += length * (x2 - x1)
+    return area
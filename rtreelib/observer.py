@@ -0,0 +1,159 @@
+"""
+Module containing observers, which receive events from the strategies of an R-tree as entries are inserted (see
+RTreeBase.observe). This is useful for profiling where insert time goes, for example how many forced reinserts an
+R*-tree performs, or how many node splits cascade all the way up to the root.
+"""
+
+from collections import Counter
+from typing import TypeVar, Generic, List, Dict
+from .rtree import RTreeBase, RTreeNode, RTreeEntry
+
+T = TypeVar('T')
+
+
+class RTreeObserver(Generic[T]):
+    """
+    Base class for observers of R-tree strategy events. Each method is called when the corresponding event occurs, and
+    does nothing by default, so that subclasses only need to override the events they are interested in.
+    """
+
+    def on_insert(self, tree: RTreeBase[T], entry: RTreeEntry[T]) -> None:
+        """
+        Called after an entry has been inserted (using RTreeBase.insert), including any overflow treatment.
+        :param tree: R-tree instance
+        :param entry: Newly-inserted entry
+        """
+
+    def on_choose_leaf(self, tree: RTreeBase[T], entry: RTreeEntry[T], leaf: RTreeNode[T]) -> None:
+        """
+        Called after the choose_leaf strategy has chosen the leaf node for an entry.
+        :param tree: R-tree instance
+        :param entry: Entry being inserted
+        :param leaf: Chosen leaf node
+        """
+
+    def on_overflow(self, tree: RTreeBase[T], node: RTreeNode[T]) -> None:
+        """
+        Called when a node overflows (before the overflow strategy is invoked).
+        :param tree: R-tree instance
+        :param node: Overflowing node
+        """
+
+    def on_split(self, tree: RTreeBase[T], node: RTreeNode[T], split_node: RTreeNode[T]) -> None:
+        """
+        Called after a node has been split (by any split strategy, such as quadratic_split or rstar_split).
+        :param tree: R-tree instance
+        :param node: Original node, containing the first group of entries
+        :param split_node: Newly-created node, containing the second group of entries
+        """
+
+    def on_reinsert(self, tree: RTreeBase[T], node: RTreeNode[T], entries: List[RTreeEntry[T]]) -> None:
+        """
+        Called when an R*-tree performs a forced reinsert (before the entries are reinserted).
+        :param tree: R-tree instance
+        :param node: Overflowing node
+        :param entries: Entries that were removed from the node, and are about to be reinserted
+        """
+
+    def on_grow_tree(self, tree: RTreeBase[T], root: RTreeNode[T]) -> None:
+        """
+        Called after the tree has grown by one level (because the root node was split).
+        :param tree: R-tree instance
+        :param root: New root node
+        """
+
+
+class CountingObserver(RTreeObserver[T]):
+    """
+    Observer that counts strategy events. In addition to the total number of each event, this keeps histograms of the
+    level at which overflows, splits, and forced reinserts occur (as the number of levels above the leaf level, so that
+    the leaf level is always 0), and of the number of splits and forced reinserts done by each insert.
+
+    Note that splits and forced reinserts done outside of RTreeBase.insert (for example, by insert_many, update, or
+    delete) are counted towards the totals, and attributed to the next insert in the per-insert histograms. Entries
+    inserted using insert_many are routed one level at a time using the choose_subtree strategy, so they are not counted
+    as choose_leaf events.
+    """
+
+    def __init__(self):
+        self.inserts = 0
+        self.choose_leaf = 0
+        self.overflows = 0
+        self.splits = 0
+        self.root_splits = 0
+        self.reinserts = 0
+        self.reinserted_entries = 0
+        self.grow_tree = 0
+        self.overflows_by_level: Dict[int, int] = Counter()
+        self.splits_by_level: Dict[int, int] = Counter()
+        self.reinserts_by_level: Dict[int, int] = Counter()
+        self.splits_per_insert: Dict[int, int] = Counter()
+        self.reinserts_per_insert: Dict[int, int] = Counter()
+        self._insert_splits = 0
+        self._insert_reinserts = 0
+
+    def __repr__(self):
+        return (f'CountingObserver(inserts={self.inserts}, overflows={self.overflows}, splits={self.splits}, '
+                f'root_splits={self.root_splits}, reinserts={self.reinserts}, grow_tree={self.grow_tree})')
+
+    def on_insert(self, tree: RTreeBase[T], entry: RTreeEntry[T]) -> None:
+        self.inserts += 1
+        self.splits_per_insert[self._insert_splits] += 1
+        self.reinserts_per_insert[self._insert_reinserts] += 1
+        self._insert_splits = 0
+        self._insert_reinserts = 0
+
+    def on_choose_leaf(self, tree: RTreeBase[T], entry: RTreeEntry[T], leaf: RTreeNode[T]) -> None:
+        self.choose_leaf += 1
+
+    def on_overflow(self, tree: RTreeBase[T], node: RTreeNode[T]) -> None:
+        self.overflows += 1
+        self.overflows_by_level[_get_levels_from_leaf(node)] += 1
+
+    def on_split(self, tree: RTreeBase[T], node: RTreeNode[T], split_node: RTreeNode[T]) -> None:
+        self.splits += 1
+        self._insert_splits += 1
+        self.splits_by_level[_get_levels_from_leaf(node)] += 1
+        if node.is_root:
+            self.root_splits += 1
+
+    def on_reinsert(self, tree: RTreeBase[T], node: RTreeNode[T], entries: List[RTreeEntry[T]]) -> None:
+        self.reinserts += 1
+        self._insert_reinserts += 1
+        self.reinserted_entries += len(entries)
+        self.reinserts_by_level[_get_levels_from_leaf(node)] += 1
+
+    def on_grow_tree(self, tree: RTreeBase[T], root: RTreeNode[T]) -> None:
+        self.grow_tree += 1
+
+    def per_1k_inserts(self, count: int) -> float:
+        """
+        Returns the given count normalized per 1,000 inserts (for example, observer.per_1k_inserts(observer.reinserts)).
+        """
+        return 1000 * count / self.inserts if self.inserts else 0.0
+
+    def as_dict(self) -> dict:
+        """Returns the counters and histograms as a dictionary (for example, for serializing to JSON)."""
+        return {
+            'inserts': self.inserts,
+            'choose_leaf': self.choose_leaf,
+            'overflows': self.overflows,
+            'splits': self.splits,
+            'root_splits': self.root_splits,
+            'reinserts': self.reinserts,
+            'reinserted_entries': self.reinserted_entries,
+            'grow_tree': self.grow_tree,
+            'overflows_by_level': dict(sorted(self.overflows_by_level.items())),
+            'splits_by_level': dict(sorted(self.splits_by_level.items())),
+            'reinserts_by_level': dict(sorted(self.reinserts_by_level.items())),
+            'splits_per_insert': dict(sorted(self.splits_per_insert.items())),
+            'reinserts_per_insert': dict(sorted(self.reinserts_per_insert.items())),
+        }
+
+
+def _get_levels_from_leaf(node: RTreeNode[T]) -> int:
+    levels = 0
+    while not node.is_leaf and node.entries:
+        node = node.entries[0].child
+        levels += 1
+    return levels
@@ -0,0 +1,155 @@
+"""
+Module containing functions for recording the operations done on an R-tree (inserts, updates, deletes, and queries) to
+a compact, append-only binary log (see RTreeBase.record), and reading them back. This allows capturing a real workload
+and replaying it offline against any strategy and configuration (see the replay module).
+
+The log consists of a header (magic b'RTOL', version as uint16, reserved uint16), followed by a sequence of records.
+Each record starts with an operation code (uint8), followed by little-endian fields that depend on the operation:
+
+    insert (1): entry ID (uint64), min_x, min_y, max_x, max_y (float64)
+    delete (2): entry ID (uint64)
+    update (3): entry ID (uint64), min_x, min_y, max_x, max_y (float64)
+    query rectangle (4): min_x, min_y, max_x, max_y (float64)
+    query point (5): x, y (float64)
+
+Entry IDs are assigned sequentially (starting from 0) to the entries inserted while recording, so that deletes and
+updates can refer to them. The data of the entries is not recorded. Operations on entries that were inserted before
+recording started are not recorded (since they cannot be replayed).
+"""
+
+import os
+import struct
+from typing import Iterator, Tuple, Union, Dict, BinaryIO, Optional
+from .rtree import RTreeEntry
+from rtreelib.models import Rect, Point, Location, parse_loc
+
+MAGIC = b'RTOL'
+VERSION = 1
+INSERT = 1
+DELETE = 2
+UPDATE = 3
+QUERY_RECT = 4
+QUERY_POINT = 5
+
+_HEADER = struct.Struct('<4sHH')
+_RECORDS = {
+    INSERT: struct.Struct('<Qdddd'),
+    DELETE: struct.Struct('<Q'),
+    UPDATE: struct.Struct('<Qdddd'),
+    QUERY_RECT: struct.Struct('<dddd'),
+    QUERY_POINT: struct.Struct('<dd'),
+}
+_OP = struct.Struct('<B')
+
+# An operation read from the log: (op, entry ID or None, location)
+Operation = Tuple[int, Optional[int], Union[Rect, Point, None]]
+
+
+class OpLogWriter:
+    """
+    Appends the operations done on an R-tree to a log file (see RTreeBase.record). Records are buffered, so the writer
+    must be closed (or flushed) for all records to be written.
+    """
+
+    def __init__(self, path: str):
+        """
+        Opens a log file for appending, writing the header if the file is new (or empty).
+        :param path: Path of the log file
+        """
+        self.path = path
+        # When appending to an existing log, continue numbering entries after the ones inserted in the log so far
+        next_id = 0
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            next_id = sum(1 for op, _, _ in read_oplog(path) if op == INSERT)
+        self._file: BinaryIO = open(path, 'ab')
+        if self._file.tell() == 0:
+            self._file.write(_HEADER.pack(MAGIC, VERSION, 0))
+        self._entry_ids: Dict[RTreeEntry, int] = {}
+        self._next_id = next_id
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def insert(self, entry: RTreeEntry) -> None:
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entry_ids[entry] = entry_id
+        self._write(INSERT, entry_id, *_coords(entry.rect))
+
+    def delete(self, entry: RTreeEntry) -> None:
+        entry_id = self._entry_ids.pop(entry, None)
+        if entry_id is not None:
+            self._write(DELETE, entry_id)
+
+    def update(self, entry: RTreeEntry) -> None:
+        entry_id = self._entry_ids.get(entry)
+        if entry_id is not None:
+            self._write(UPDATE, entry_id, *_coords(entry.rect))
+
+    def query(self, loc: Location) -> None:
+        loc = parse_loc(loc)
+        if isinstance(loc, Rect):
+            self._write(QUERY_RECT, *_coords(loc))
+        else:
+            self._write(QUERY_POINT, loc.x, loc.y)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+    def _write(self, op: int, *fields) -> None:
+        self._file.write(_OP.pack(op) + _RECORDS[op].pack(*fields))
+
+
+def read_oplog(path: str) -> Iterator[Operation]:
+    """
+    Reads the operations recorded in a log file, in order. Each operation is returned as a tuple of the operation code
+    (INSERT, DELETE, UPDATE, QUERY_RECT, or QUERY_POINT), the entry ID (None for queries), and the rectangle of the
+    inserted or updated entry, or the location of the query (None for deletes).
+    :param path: Path of the log file
+    :return: Iterator of operations
+    """
+    with open(path, 'rb') as f:
+        _read_header(f)
+        while True:
+            b = f.read(1)
+            if not b:
+                return
+            op = b[0]
+            record = _RECORDS.get(op)
+            if record is None:
+                raise ValueError(f"Invalid operation log (unknown operation code {op} at offset {f.tell() - 1})")
+            buffer = f.read(record.size)
+            if len(buffer) < record.size:
+                # The log may have been truncated while the last record was being written
+                return
+            fields = record.unpack(buffer)
+            if op == INSERT or op == UPDATE:
+                yield op, fields[0], Rect(*fields[1:])
+            elif op == DELETE:
+                yield op, fields[0], None
+            elif op == QUERY_RECT:
+                yield op, None, Rect(*fields)
+            else:
+                yield op, None, Point(*fields)
+
+
+def _read_header(f: BinaryIO) -> None:
+    header = f.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise ValueError("Invalid operation log (unrecognized header)")
+    magic, version, _ = _HEADER.unpack(header)
+    if magic != MAGIC:
+        raise ValueError("Invalid operation log (unrecognized header)")
+    if version > VERSION:
+        raise ValueError(f"Unsupported operation log version: {version} (the maximum supported version is {VERSION})")
+
+
+def _coords(rect: Rect) -> Tuple[float, float, float, float]:
+    return rect.min_x, rect.min_y, rect.max_x, rect.max_y
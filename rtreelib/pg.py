@@ -16,15 +16,20 @@ There are three ways of connecting to the database using this module:
 Check the documentation for more detailed information and examples.
 """
 
-import string
-import pkg_resources
-from typing import Union, Type, Dict
-from .rtree import RTreeBase, RTreeNode, RTreeEntry
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Union, Type, Dict, Iterable, Iterator, List, Callable, Any, Tuple, Sequence
+from .rtree import RTreeBase, RTreeNode, RTreeEntry, DEFAULT_MAX_ENTRIES
+from .strategies.bulk import str_pack
+from .db import (
+    TreeBuilder, get_sql_from_template, get_datatype, count_rows, assign_ids, get_copy_rows, get_subtree_levels,
+    get_depth, coords
+)
 
 try:
     import psycopg2
     import psycopg2.pool
-    from psycopg2.extras import DictCursor
+    from psycopg2.extras import DictCursor, execute_values
 except ImportError:
     raise RuntimeError("The following libraries are required to export R-trees to PostGIS: psycopg2")
 
@@ -37,7 +42,7 @@ def init_db_pool(*args, **kwargs):
     having to pass in connection info. This function accepts the same arguments as the psycopg2.connect function.
     """
     global pool
-    pool = psycopg2.pool.SimpleConnectionPool(1, 20, *args, **kwargs)
+    pool = psycopg2.pool.ThreadedConnectionPool(1, 20, *args, **kwargs)
 
 
 def create_rtree_tables(conn=None, schema: str = 'public', srid: int = 0, datatype: Union[Type, str] = None, **kwargs):
@@ -61,7 +66,7 @@ def create_rtree_tables(conn=None, schema: str = 'public', srid: int = 0, dataty
     close = None
     try:
         conn, close = _get_conn(conn, **kwargs)
-        sql = _get_sql_from_template('create_rtree_tables', schema=schema, srid=srid, datatype=_get_datatype(datatype))
+        sql = get_sql_from_template('create_rtree_tables', schema=schema, srid=srid, datatype=get_datatype(datatype))
         with conn.cursor(cursor_factory=DictCursor) as cursor:
             cursor.execute(sql)
         conn.commit()
@@ -81,7 +86,7 @@ def clear_rtree_tables(conn=None, schema: str = 'public', **kwargs):
     close = None
     try:
         conn, close = _get_conn(conn, **kwargs)
-        sql = _get_sql_from_template('clear_rtree_tables', schema=schema)
+        sql = get_sql_from_template('clear_rtree_tables', schema=schema)
         with conn.cursor(cursor_factory=DictCursor) as cursor:
             cursor.execute(sql)
         conn.commit()
@@ -101,7 +106,7 @@ def drop_rtree_tables(conn=None, schema: str = 'public', **kwargs):
     close = None
     try:
         conn, close = _get_conn(conn, **kwargs)
-        sql = _get_sql_from_template('drop_rtree_tables', schema=schema)
+        sql = get_sql_from_template('drop_rtree_tables', schema=schema)
         with conn.cursor(cursor_factory=DictCursor) as cursor:
             cursor.execute(sql)
         conn.commit()
@@ -110,7 +115,8 @@ def drop_rtree_tables(conn=None, schema: str = 'public', **kwargs):
             close(conn)
 
 
-def export_to_postgis(rtree: RTreeBase, conn=None, schema: str = 'public', srid: int = 0, **kwargs) -> int:
+def export_to_postgis(rtree: RTreeBase, conn=None, schema: str = 'public', srid: int = 0, bulk: bool = False,
+                      rebuild_indexes: bool = False, workers: int = 1, **kwargs) -> int:
     """
     Exports the R-tree to PostGIS, populating the rtree, rtree_node, and rtree_entry tables created by the
     create_rtree_tables function (which must be called first). This function returns the ID of the newly-created
@@ -120,26 +126,50 @@ def export_to_postgis(rtree: RTreeBase, conn=None, schema: str = 'public', srid:
     connecting to the database. Alternatively, init_db_pool may be called instead to initialize a connection pool, in
     which case there is no need to pass in database connection information.
 
+    For large trees, pass bulk=True to use the bulk export path. Rather than inserting the nodes and entries one row at
+    a time (which requires a round-trip to the database for each row in order to get back its ID), IDs are reserved up
+    front and assigned on the client, and the rows are streamed to the database using COPY. The nodes and entries are
+    copied one level at a time, so that foreign keys can be checked as the rows are loaded. Note that reserving IDs
+    locks the rtree_node and rtree_entry tables for writing until the export is committed.
+
+    To speed up the export further, pass workers=N to export the tree in parallel using N threads, each with its own
+    connection (this implies bulk=True, and requires either a connection pool or connection keyword arguments rather
+    than a connection object). The tree is split into N groups of disjoint subtrees, which are exported concurrently.
+    The levels of the tree above the subtrees are written last (once all workers have committed), linking the subtrees
+    to their parent entries. If any worker fails, the work of all workers is rolled back, and any rows that were already
+    committed are deleted.
+
     :param rtree: R-tree to export
     :param conn: psycopg2 connection (Optional).
     :param schema: Database schema (Optional, defaults to "public").
     :param srid: SRID of the geometry data (Optional, defaults to 0, which is no SRID).
+    :param bulk: If True, uses the bulk (COPY-based) export path. Optional (defaults to False).
+    :param rebuild_indexes: If True (when using the bulk export path), the GiST indexes on the rtree_node and
+        rtree_entry tables are dropped before loading the data and rebuilt afterwards, which is considerably faster than
+        updating the indexes row by row when loading a large tree into empty tables. Note that the indexes are shared by
+        all R-trees in the tables, so rebuilding them means reindexing every row in the tables, while blocking other
+        readers. Optional (defaults to False). Ignored if bulk is False.
+    :param workers: Number of threads (and database connections) used to export the tree. Optional (defaults to 1).
+        Note that the connection pool created by init_db_pool holds at most 20 connections, which must accommodate
+        all workers plus one additional connection.
     :param kwargs: Keyword arguments for establishing a database connection. These arguments will be passed to the
         psycopg2.connect function. (Optional)
     :return: ID of the newly-created R-tree in the rtree table
     """
+    if workers > 1:
+        if conn is not None:
+            raise ValueError("Exporting an R-tree using multiple workers requires a separate connection for each "
+                             "worker. Please initialize a connection pool or provide keyword arguments that can be "
+                             "used to initialize connections, rather than passing in a connection object.")
+        return _export_parallel(rtree, schema, srid, rebuild_indexes, workers, **kwargs)
     close = None
     try:
         conn, close = _get_conn(conn, **kwargs)
-        node_ids = {}
-        entry_ids = {}
         with conn.cursor(cursor_factory=DictCursor) as cursor:
-            rtree_id = _insert_rtree(cursor, schema, rtree)
-            for level, nodes in enumerate(rtree.get_levels()):
-                for node in nodes:
-                    node_id = _insert_rtree_node(cursor, schema, node, rtree_id, level, srid, node_ids, entry_ids)
-                    for entry in node.entries:
-                        _insert_rtree_entry(cursor, schema, entry, node_id, srid, entry_ids)
+            if bulk:
+                rtree_id = _copy_rtree(cursor, schema, rtree, srid, rebuild_indexes)
+            else:
+                rtree_id = _insert_rtree_rows(cursor, schema, rtree, srid)
         conn.commit()
         return rtree_id
     finally:
@@ -147,6 +177,155 @@ def export_to_postgis(rtree: RTreeBase, conn=None, schema: str = 'public', srid:
             close(conn)
 
 
+def sync_to_postgis(rtree: RTreeBase, rtree_id: int, conn=None, schema: str = 'public', srid: int = 0, **kwargs):
+    """
+    Writes the changes made to an R-tree since it was exported (or last synced) to PostGIS, so that the rtree_node and
+    rtree_entry tables mirror the in-memory tree. Only the nodes and entries that were created, modified, or removed are
+    written (using batched statements), so the cost is proportional to the size of the change rather than the size of
+    the tree. Change tracking must be enabled on the tree (by calling track_changes) right after the tree is exported,
+    and the tree must be the same instance that was exported (since rows are matched to nodes and entries by obj_id).
+
+    As with the other methods in this module, this method accepts either a connection object or keyword arguments for
+    connecting to the database. Alternatively, init_db_pool may be called instead to initialize a connection pool, in
+    which case there is no need to pass in database connection information.
+
+    :param rtree: R-tree to sync (with change tracking enabled)
+    :param rtree_id: ID of the R-tree in the rtree table (as returned by export_to_postgis)
+    :param conn: psycopg2 connection (Optional).
+    :param schema: Database schema (Optional, defaults to "public").
+    :param srid: SRID of the geometry data (Optional, defaults to 0, which is no SRID).
+    :param kwargs: Keyword arguments for establishing a database connection. These arguments will be passed to the
+        psycopg2.connect function. (Optional)
+    """
+    changes = rtree.changes
+    if changes is None:
+        raise RuntimeError("Change tracking is not enabled for this R-tree. Please call track_changes on the R-tree "
+                           "after exporting it, before making any changes.")
+    close = None
+    try:
+        conn, close = _get_conn(conn, **kwargs)
+        height = rtree.get_height()
+        with conn.cursor(cursor_factory=DictCursor) as cursor:
+            _sync_rtree(cursor, schema, rtree, rtree_id, srid, height)
+        conn.commit()
+        changes.clear(height)
+    finally:
+        if close is not None:
+            close(conn)
+
+
+def import_from_postgis(rtree_id: int, conn=None, schema: str = 'public', tree_cls: Type[RTreeBase] = None,
+                        max_entries: int = DEFAULT_MAX_ENTRIES, min_entries: int = None,
+                        adapter: Callable[[Any], Any] = None, batch_size: int = 10000, **kwargs) -> RTreeBase:
+    """
+    Loads an R-tree that was previously exported using export_to_postgis. The tree is rebuilt node by node (without
+    invoking the insert strategy), so it has exactly the same structure as the tree that was exported. The rows are
+    read using server-side cursors, in batches of batch_size rows, so that the full result set is never held in memory
+    at once.
+
+    As with the other methods in this module, this method accepts either a connection object or keyword arguments for
+    connecting to the database. Alternatively, init_db_pool may be called instead to initialize a connection pool, in
+    which case there is no need to pass in database connection information.
+
+    :param rtree_id: ID of the R-tree in the rtree table (as returned by export_to_postgis)
+    :param conn: psycopg2 connection (Optional).
+    :param schema: Database schema (Optional, defaults to "public").
+    :param tree_cls: R-tree class to instantiate (Optional, defaults to RTree).
+    :param max_entries: Maximum number of entries per node of the tree (Optional, defaults to 8). Since this is not
+        stored in the database, this should be the same value that was used by the tree that was exported.
+    :param min_entries: Minimum number of entries per node of the tree (Optional, defaults to half of max_entries).
+    :param adapter: Function used to convert the value of the data column of each leaf entry to the data stored in the
+        tree (Optional, by default the value returned by psycopg2 is used as is).
+    :param batch_size: Number of rows fetched from the database at a time (Optional, defaults to 10000).
+    :param kwargs: Keyword arguments for establishing a database connection. These arguments will be passed to the
+        psycopg2.connect function. (Optional)
+    :return: R-tree having the same structure as the tree that was exported
+    """
+    if tree_cls is None:
+        from .strategies import RTreeGuttman
+        tree_cls = RTreeGuttman
+    close = None
+    try:
+        conn, close = _get_conn(conn, **kwargs)
+        builder = TreeBuilder(tree_cls(max_entries=max_entries, min_entries=min_entries), adapter)
+        sql = get_sql_from_template('select_rtree_nodes', schema=schema)
+        for row in _fetch(conn, f'rtree_node_{rtree_id}', sql, {"rtree_id": rtree_id}, batch_size):
+            builder.add_node(row)
+        if builder.root is None:
+            raise ValueError(f"R-tree with ID {rtree_id} was not found in {schema}.rtree_node")
+        sql = get_sql_from_template('select_rtree_entries', schema=schema)
+        for row in _fetch(conn, f'rtree_entry_{rtree_id}', sql, {"rtree_id": rtree_id}, batch_size):
+            builder.add_entry(row)
+        conn.commit()
+        return builder.finish()
+    finally:
+        if close is not None:
+            close(conn)
+
+
+def build_from_query(sql: str, rect_columns: Union[str, Sequence[str]], data_column: str,
+                     tree_cls: Type[RTreeBase] = None, conn=None, params: Union[Dict[str, Any], Sequence] = None,
+                     max_entries: int = DEFAULT_MAX_ENTRIES, min_entries: int = None, batch_size: int = 10000,
+                     **kwargs) -> RTreeBase:
+    """
+    Builds an R-tree from the rows returned by an arbitrary query (for example, over a table containing geometries).
+    The rows are streamed from the database using a server-side cursor, in batches of batch_size rows, and only the
+    envelope and data of each row are kept (the envelopes in a compact array), so that the full result set is never
+    held in memory. Once all rows have been read, the tree is bulk-loaded using the STR packing algorithm (see
+    strategies.bulk.str_pack), which is considerably faster than inserting the rows one at a time.
+
+    As with the other methods in this module, this method accepts either a connection object or keyword arguments for
+    connecting to the database. Alternatively, init_db_pool may be called instead to initialize a connection pool, in
+    which case there is no need to pass in database connection information.
+
+    :param sql: Query returning the rows to index
+    :param rect_columns: Either the names of the four columns of the query containing the envelope of each row (in the
+        order min_x, min_y, max_x, max_y), or the name of a single geometry column (in which case the envelope is
+        computed by the database).
+    :param data_column: Name of the column of the query containing the data of each entry
+    :param tree_cls: R-tree class to instantiate (Optional, defaults to RTree).
+    :param conn: psycopg2 connection (Optional).
+    :param params: Parameters of the query (Optional).
+    :param max_entries: Maximum number of entries per node of the tree (Optional, defaults to 8).
+    :param min_entries: Minimum number of entries per node of the tree (Optional, defaults to half of max_entries).
+    :param batch_size: Number of rows fetched from the database at a time (Optional, defaults to 10000).
+    :param kwargs: Keyword arguments for establishing a database connection. These arguments will be passed to the
+        psycopg2.connect function. (Optional)
+    :return: R-tree containing an entry for each row returned by the query
+    """
+    if tree_cls is None:
+        from .strategies import RTreeGuttman
+        tree_cls = RTreeGuttman
+    if isinstance(rect_columns, str):
+        sql = get_sql_from_template('select_query_envelopes', query=sql.strip().rstrip(';'), geom=rect_columns,
+                                    data=data_column)
+        rect_columns = ('min_x', 'min_y', 'max_x', 'max_y')
+    elif len(rect_columns) != 4:
+        raise ValueError("rect_columns must either be the name of a geometry column, or the names of the four columns "
+                         "containing the envelope (min_x, min_y, max_x, max_y)")
+    coords = array('d')
+    data = []
+    close = None
+    try:
+        conn, close = _get_conn(conn, **kwargs)
+        for row in _fetch(conn, 'rtree_build_from_query', sql, params, batch_size):
+            coords.extend([row[column] for column in rect_columns])
+            data.append(row[data_column])
+        conn.commit()
+    finally:
+        if close is not None:
+            close(conn)
+    return str_pack(tree_cls(max_entries=max_entries, min_entries=min_entries), coords, data)
+
+
+def _fetch(conn, name: str, sql: str, params: Union[Dict[str, Any], Sequence, None], batch_size: int) -> Iterable:
+    """Executes a query using a server-side (named) cursor, yielding the rows as they are fetched in batches."""
+    with conn.cursor(name, cursor_factory=DictCursor) as cursor:
+        cursor.itersize = batch_size
+        cursor.execute(sql, params)
+        yield from cursor
+
+
 def _get_conn(conn=None, **kwargs):
     if conn is not None:
         return conn, None
@@ -169,26 +348,20 @@ def _close_conn(conn):
         conn.close()
 
 
-def _get_sql_from_template(name, **kwargs):
-    s = pkg_resources.resource_string('rtreelib', f'sql/{name}.sql.template').decode('utf-8')
-    tpl = string.Template(s)
-    return tpl.substitute(**kwargs)
-
-
-def _get_datatype(datatype: Union[Type, str] = None) -> str:
-    if isinstance(datatype, str):
-        return datatype
-    if datatype == str:
-        return 'TEXT'
-    if datatype == int:
-        return 'INT'
-    if datatype == float:
-        return 'NUMERIC'
-    return 'TEXT'
+def _insert_rtree_rows(cursor, schema: str, rtree: RTreeBase, srid: int) -> int:
+    node_ids = {}
+    entry_ids = {}
+    rtree_id = _insert_rtree(cursor, schema, rtree)
+    for level, nodes in enumerate(rtree.get_levels()):
+        for node in nodes:
+            node_id = _insert_rtree_node(cursor, schema, node, rtree_id, level, srid, node_ids, entry_ids)
+            for entry in node.entries:
+                _insert_rtree_entry(cursor, schema, entry, node_id, srid, entry_ids)
+    return rtree_id
 
 
 def _insert_rtree(cursor, schema, tree: RTreeBase) -> int:
-    sql = _get_sql_from_template('insert_rtree', schema=schema)
+    sql = get_sql_from_template('insert_rtree', schema=schema)
     cursor.execute(sql, {
         "obj_id": id(tree),
         "hex_id": hex(id(tree))
@@ -199,7 +372,7 @@ def _insert_rtree(cursor, schema, tree: RTreeBase) -> int:
 def _insert_rtree_node(cursor, schema: str, node: RTreeNode, rtree_id: int, level: int, srid: int,
                        node_ids: Dict[RTreeNode, int], entry_ids: Dict[RTreeEntry, int]) -> int:
     rect = node.get_bounding_rect()
-    sql = _get_sql_from_template('insert_rtree_node', schema=schema)
+    sql = get_sql_from_template('insert_rtree_node', schema=schema)
     cursor.execute(sql, {
         "obj_id": id(node),
         "hex_id": hex(id(node)),
@@ -220,7 +393,7 @@ def _insert_rtree_node(cursor, schema: str, node: RTreeNode, rtree_id: int, leve
 
 def _insert_rtree_entry(cursor, schema: str, entry: RTreeEntry, node_id: int, srid: int,
                         entry_ids: Dict[RTreeEntry, int]) -> int:
-    sql = _get_sql_from_template('insert_rtree_entry', schema=schema)
+    sql = get_sql_from_template('insert_rtree_entry', schema=schema)
     cursor.execute(sql, {
         "obj_id": id(entry),
         "hex_id": hex(id(entry)),
@@ -236,3 +409,201 @@ def _insert_rtree_entry(cursor, schema: str, entry: RTreeEntry, node_id: int, sr
     entry_id = cursor.fetchone()['id']
     entry_ids[entry] = entry_id
     return entry_id
+
+
+def _copy_rtree(cursor, schema: str, rtree: RTreeBase, srid: int, rebuild_indexes: bool) -> int:
+    levels = rtree.get_levels()
+    rtree_id = _insert_rtree(cursor, schema, rtree)
+    node_ids, entry_ids = _assign_ids(cursor, schema, levels)
+    if rebuild_indexes:
+        cursor.execute(get_sql_from_template('drop_rtree_indexes', schema=schema))
+    _copy_levels(cursor, schema, levels, 0, rtree_id, srid, node_ids, entry_ids)
+    if rebuild_indexes:
+        cursor.execute(get_sql_from_template('create_rtree_indexes', schema=schema))
+    return rtree_id
+
+
+def _export_parallel(rtree: RTreeBase, schema: str, srid: int, rebuild_indexes: bool, workers: int, **kwargs) -> int:
+    # Split the tree into disjoint subtrees rooted at the first level having at least as many nodes as there are
+    # workers, and assign the subtrees to the workers in round-robin fashion.
+    levels = rtree.get_levels()
+    split_level = next((i for i, nodes in enumerate(levels) if len(nodes) >= workers), len(levels) - 1)
+    groups = [levels[split_level][i::workers] for i in range(workers)]
+    groups = [get_subtree_levels(group) for group in groups if group]
+    conn, close = _get_conn(None, **kwargs)
+    worker_conns = []
+    try:
+        # Create the rtree row and reserve the IDs up front (committing, so that the workers can see the new row)
+        with conn.cursor(cursor_factory=DictCursor) as cursor:
+            rtree_id = _insert_rtree(cursor, schema, rtree)
+            node_ids, entry_ids = _assign_ids(cursor, schema, levels)
+            if rebuild_indexes:
+                cursor.execute(get_sql_from_template('drop_rtree_indexes', schema=schema))
+        conn.commit()
+        try:
+            with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+                futures = [executor.submit(_export_subtrees, worker_conns, schema, group, split_level, rtree_id, srid,
+                                           node_ids, entry_ids, kwargs)
+                           for group in groups]
+                for future in futures:
+                    future.result()
+            for worker_conn, _ in worker_conns:
+                worker_conn.commit()
+            # Write the top levels last, linking the roots of the subtrees to their parent entries
+            with conn.cursor(cursor_factory=DictCursor) as cursor:
+                _copy_levels(cursor, schema, levels[:split_level], 0, rtree_id, srid, node_ids, entry_ids)
+                if split_level > 0:
+                    execute_values(cursor, get_sql_from_template('link_rtree_subtrees', schema=schema), [
+                        (node_ids[node], entry_ids[node.parent_entry]) for node in levels[split_level]
+                    ], template='(%s::int, %s::int)')
+                if rebuild_indexes:
+                    cursor.execute(get_sql_from_template('create_rtree_indexes', schema=schema))
+            conn.commit()
+        except Exception:
+            # Roll back any uncommitted work, and remove the rows that were already committed
+            for worker_conn, _ in worker_conns:
+                worker_conn.rollback()
+            conn.rollback()
+            with conn.cursor(cursor_factory=DictCursor) as cursor:
+                cursor.execute(get_sql_from_template('delete_rtree', schema=schema), {"rtree_id": rtree_id})
+                if rebuild_indexes:
+                    cursor.execute(get_sql_from_template('create_rtree_indexes', schema=schema))
+            conn.commit()
+            raise
+        return rtree_id
+    finally:
+        for worker_conn, close_worker in worker_conns:
+            if close_worker is not None:
+                close_worker(worker_conn)
+        if close is not None:
+            close(conn)
+
+
+def _export_subtrees(conns: List, schema: str, levels: List[List[RTreeNode]], level_offset: int, rtree_id: int,
+                     srid: int, node_ids: Dict[RTreeNode, int], entry_ids: Dict[RTreeEntry, int], kwargs):
+    """Exports a group of subtrees on a separate connection (without committing), for use by _export_parallel."""
+    conn, close = _get_conn(None, **kwargs)
+    conns.append((conn, close))
+    with conn.cursor(cursor_factory=DictCursor) as cursor:
+        _copy_levels(cursor, schema, levels, level_offset, rtree_id, srid, node_ids, entry_ids)
+
+
+def _sync_rtree(cursor, schema: str, rtree: RTreeBase, rtree_id: int, srid: int, height: int):
+    changes = rtree.changes
+    # If the height of the tree changed, the level of every node changed by the same amount
+    if height != changes.height:
+        sql = get_sql_from_template('shift_rtree_levels', schema=schema)
+        cursor.execute(sql, {"rtree_id": rtree_id, "delta": height - changes.height})
+    dirty_nodes = changes.dirty_nodes
+    dirty_entries = [e for node in dirty_nodes for e in node.entries]
+    removed_nodes = changes.removed_nodes
+    removed_entries = changes.removed_entries
+    node_ids = _get_ids(cursor, 'select_rtree_node_ids', schema, rtree_id, dirty_nodes + removed_nodes)
+    entry_ids = _get_ids(cursor, 'select_rtree_entry_ids', schema, rtree_id, dirty_entries + removed_entries)
+    new_nodes = [node for node in dirty_nodes if id(node) not in node_ids]
+    new_entries = [entry for entry in dirty_entries if id(entry) not in entry_ids]
+    existing_entries = [entry for entry in dirty_entries if id(entry) in entry_ids]
+    node_ids.update(zip(map(id, new_nodes), _reserve_ids(cursor, schema, 'rtree_node', len(new_nodes))))
+    entry_ids.update(zip(map(id, new_entries), _reserve_ids(cursor, schema, 'rtree_entry', len(new_entries))))
+    entry_parents = {id(entry): node_ids[id(node)] for node in dirty_nodes for entry in node.entries}
+
+    # Insert the new nodes first (without their parent entries, which may not exist yet), followed by the new entries
+    # (whose parent nodes now exist). Then update all modified nodes (setting their parent entries) and entries.
+    if new_nodes:
+        execute_values(cursor, get_sql_from_template('insert_rtree_nodes', schema=schema), [
+            (node_ids[id(node)], id(node), hex(id(node)), rtree_id, *coords(node.get_bounding_rect()), srid,
+             node.is_leaf)
+            for node in new_nodes
+        ], template=_INSERT_NODE_VALUES)
+    if new_entries:
+        execute_values(cursor, get_sql_from_template('insert_rtree_entries', schema=schema), [
+            (entry_ids[id(entry)], id(entry), hex(id(entry)), entry_parents[id(entry)], *coords(entry.rect), srid,
+             entry.is_leaf, entry.data)
+            for entry in new_entries
+        ], template=_INSERT_ENTRY_VALUES)
+    if dirty_nodes:
+        execute_values(cursor, get_sql_from_template('update_rtree_nodes', schema=schema, srid=srid), [
+            (node_ids[id(node)], get_depth(node), *coords(node.get_bounding_rect()),
+             entry_ids[id(node.parent_entry)] if node.parent is not None else None, node.is_leaf)
+            for node in dirty_nodes
+        ], template=_UPDATE_NODE_VALUES)
+    if existing_entries:
+        execute_values(cursor, get_sql_from_template('update_rtree_entries', schema=schema, srid=srid), [
+            (entry_ids[id(entry)], entry_parents[id(entry)], *coords(entry.rect), entry.is_leaf)
+            for entry in existing_entries
+        ], template=_UPDATE_ENTRY_VALUES)
+
+    # Delete removed rows (only those that were actually written, since a node or entry may have been created and
+    # removed again between syncs)
+    removed_node_ids = [node_ids[id(node)] for node in removed_nodes if id(node) in node_ids]
+    removed_entry_ids = [entry_ids[id(entry)] for entry in removed_entries if id(entry) in entry_ids]
+    if removed_node_ids or removed_entry_ids:
+        cursor.execute(get_sql_from_template('delete_rtree_rows', schema=schema), {
+            "node_ids": removed_node_ids,
+            "entry_ids": removed_entry_ids
+        })
+
+
+_INSERT_NODE_VALUES = '(%s, %s, %s, %s, 0, ST_MakeEnvelope(%s, %s, %s, %s, %s), NULL, %s)'
+_INSERT_ENTRY_VALUES = '(%s, %s, %s, %s, ST_MakeEnvelope(%s, %s, %s, %s, %s), %s, %s)'
+_UPDATE_NODE_VALUES = '(%s::int, %s::int, %s::float8, %s::float8, %s::float8, %s::float8, %s::int, %s::boolean)'
+_UPDATE_ENTRY_VALUES = '(%s::int, %s::int, %s::float8, %s::float8, %s::float8, %s::float8, %s::boolean)'
+
+
+def _get_ids(cursor, template: str, schema: str, rtree_id: int, objects: List[Any]) -> Dict[int, int]:
+    """Returns a dictionary mapping the obj_id of each of the given nodes/entries to its ID in the database."""
+    if not objects:
+        return {}
+    cursor.execute(get_sql_from_template(template, schema=schema), {
+        "rtree_id": rtree_id,
+        "obj_ids": [id(obj) for obj in objects]
+    })
+    return {row['obj_id']: row['id'] for row in cursor.fetchall()}
+
+
+def _reserve_ids(cursor, schema: str, table: str, count: int) -> Iterator[int]:
+    """Reserves a contiguous range of IDs from the sequence of the given table, returning an iterator over the IDs."""
+    if count == 0:
+        return iter(())
+    cursor.execute(get_sql_from_template('lock_rtree_table', schema=schema, table=table))
+    cursor.execute(get_sql_from_template('reserve_rtree_ids', schema=schema, table=table), {"count": count})
+    last_id = cursor.fetchone()['last_id']
+    return iter(range(last_id - count + 1, last_id + 1))
+
+
+def _assign_ids(cursor, schema: str, levels: List[List[RTreeNode]]) -> Tuple[Dict[RTreeNode, int],
+                                                                               Dict[RTreeEntry, int]]:
+    """Reserves IDs for all nodes and entries of a tree, returning dictionaries mapping each node/entry to its ID."""
+    node_count, entry_count = count_rows(levels)
+    return assign_ids(levels, _reserve_ids(cursor, schema, 'rtree_node', node_count),
+                      _reserve_ids(cursor, schema, 'rtree_entry', entry_count))
+
+
+def _copy_levels(cursor, schema: str, levels: List[List[RTreeNode]], level_offset: int, rtree_id: int, srid: int,
+                 node_ids: Dict[RTreeNode, int], entry_ids: Dict[RTreeEntry, int]):
+    """Copies the nodes and entries of the given levels one level at a time (see db.get_copy_rows)."""
+    for node_rows, entry_rows in get_copy_rows(levels, level_offset, rtree_id, srid, node_ids, entry_ids):
+        cursor.copy_expert(get_sql_from_template('copy_rtree_node', schema=schema), _RowStream(node_rows))
+        cursor.copy_expert(get_sql_from_template('copy_rtree_entry', schema=schema), _RowStream(entry_rows))
+
+
+class _RowStream:
+    """File-like object that streams an iterable of lines to COPY, without building the whole input in memory."""
+
+    def __init__(self, lines: Iterable[str]):
+        self._lines = iter(lines)
+        self._buffer = ''
+
+    def read(self, size: int = -1) -> str:
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        for line in self._lines:
+            chunks.append(line)
+            length += len(line)
+            if 0 <= size <= length:
+                break
+        data = ''.join(chunks)
+        if size is None or size < 0:
+            size = len(data)
+        self._buffer = data[size:]
+        return data[:size]
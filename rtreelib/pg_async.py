@@ -0,0 +1,188 @@
+"""
+Module containing coroutines for exporting R-trees to (and importing R-trees from) a PostGIS database using asyncio.
+The coroutines in this module mirror the corresponding functions in the pg module, and use the same tables (so trees
+exported using one module can be imported using the other).
+
+Note that psycopg (version 3) must be installed in order to use this module:
+
+pip install psycopg
+
+The coroutines in this module accept either an open psycopg.AsyncConnection, or keyword arguments that can be used to
+establish a connection (which are passed to psycopg.AsyncConnection.connect). Check the documentation for more
+detailed information and examples.
+"""
+
+from typing import Union, Type, Dict, Iterable, List, Callable, Any, Tuple
+from .rtree import RTreeBase, RTreeNode, RTreeEntry, DEFAULT_MAX_ENTRIES
+from .db import TreeBuilder, get_sql_from_template, get_datatype, count_rows, assign_ids, get_copy_rows
+
+try:
+    import psycopg
+    from psycopg.rows import dict_row
+except ImportError:
+    raise RuntimeError("The following libraries are required to export R-trees to PostGIS asynchronously: psycopg")
+
+# Number of characters buffered before each write to COPY
+COPY_CHUNK_SIZE = 65536
+
+
+async def create_rtree_tables(conn=None, schema: str = 'public', srid: int = 0, datatype: Union[Type, str] = None,
+                              **kwargs):
+    """
+    Creates the necessary tables/indexes for storing R-tree data. This must be called prior to exporting an R-tree.
+    :param conn: psycopg AsyncConnection (Optional).
+    :param schema: Database schema (Optional, defaults to "public").
+    :param srid: SRID of the geometry data (Optional, defaults to 0, which is no SRID).
+    :param datatype: Data type of the R-tree leaf entries (see pg.create_rtree_tables).
+    :param kwargs: Keyword arguments for establishing a database connection. These arguments will be passed to the
+        psycopg.AsyncConnection.connect function. (Optional)
+    """
+    conn, close = await _get_conn(conn, **kwargs)
+    try:
+        sql = get_sql_from_template('create_rtree_tables', schema=schema, srid=srid, datatype=get_datatype(datatype))
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql)
+        await conn.commit()
+    finally:
+        if close:
+            await conn.close()
+
+
+async def export_to_postgis(rtree: RTreeBase, conn=None, schema: str = 'public', srid: int = 0,
+                            rebuild_indexes: bool = False, **kwargs) -> int:
+    """
+    Exports the R-tree to PostGIS, populating the rtree, rtree_node, and rtree_entry tables created by the
+    create_rtree_tables coroutine (which must be called first). This coroutine returns the ID of the newly-created
+    R-tree in the rtree table.
+
+    This always uses the bulk export path (see pg.export_to_postgis): IDs are reserved up front and assigned on the
+    client, and the nodes and entries are streamed to the database one level at a time using COPY. Note that reserving
+    IDs locks the rtree_node and rtree_entry tables for writing until the export is committed.
+
+    :param rtree: R-tree to export
+    :param conn: psycopg AsyncConnection (Optional).
+    :param schema: Database schema (Optional, defaults to "public").
+    :param srid: SRID of the geometry data (Optional, defaults to 0, which is no SRID).
+    :param rebuild_indexes: If True, the GiST indexes on the rtree_node and rtree_entry tables are dropped before
+        loading the data and rebuilt afterwards. Since the indexes are shared by all R-trees in the tables, this is only
+        worthwhile when loading a large tree into empty tables (see pg.export_to_postgis). Optional (defaults to
+        False).
+    :param kwargs: Keyword arguments for establishing a database connection. These arguments will be passed to the
+        psycopg.AsyncConnection.connect function. (Optional)
+    :return: ID of the newly-created R-tree in the rtree table
+    """
+    conn, close = await _get_conn(conn, **kwargs)
+    try:
+        levels = rtree.get_levels()
+        async with conn.cursor(row_factory=dict_row) as cursor:
+            await cursor.execute(get_sql_from_template('insert_rtree', schema=schema), {
+                "obj_id": id(rtree),
+                "hex_id": hex(id(rtree))
+            })
+            rtree_id = (await cursor.fetchone())['id']
+            node_ids, entry_ids = await _assign_ids(cursor, schema, levels)
+            if rebuild_indexes:
+                await cursor.execute(get_sql_from_template('drop_rtree_indexes', schema=schema))
+            for node_rows, entry_rows in get_copy_rows(levels, 0, rtree_id, srid, node_ids, entry_ids):
+                await _copy(cursor, get_sql_from_template('copy_rtree_node', schema=schema), node_rows)
+                await _copy(cursor, get_sql_from_template('copy_rtree_entry', schema=schema), entry_rows)
+            if rebuild_indexes:
+                await cursor.execute(get_sql_from_template('create_rtree_indexes', schema=schema))
+        await conn.commit()
+        return rtree_id
+    finally:
+        if close:
+            await conn.close()
+
+
+async def import_from_postgis(rtree_id: int, conn=None, schema: str = 'public', tree_cls: Type[RTreeBase] = None,
+                              max_entries: int = DEFAULT_MAX_ENTRIES, min_entries: int = None,
+                              adapter: Callable[[Any], Any] = None, batch_size: int = 10000, **kwargs) -> RTreeBase:
+    """
+    Loads an R-tree that was previously exported (using either this module or the pg module). The tree is rebuilt node
+    by node, so it has exactly the same structure as the tree that was exported. The rows are read using server-side
+    cursors, in batches of batch_size rows.
+    :param rtree_id: ID of the R-tree in the rtree table (as returned by export_to_postgis)
+    :param conn: psycopg AsyncConnection (Optional).
+    :param schema: Database schema (Optional, defaults to "public").
+    :param tree_cls: R-tree class to instantiate (Optional, defaults to RTree).
+    :param max_entries: Maximum number of entries per node of the tree (Optional, defaults to 8).
+    :param min_entries: Minimum number of entries per node of the tree (Optional, defaults to half of max_entries).
+    :param adapter: Function used to convert the value of the data column of each leaf entry to the data stored in the
+        tree (Optional, by default the value returned by psycopg is used as is).
+    :param batch_size: Number of rows fetched from the database at a time (Optional, defaults to 10000).
+    :param kwargs: Keyword arguments for establishing a database connection. These arguments will be passed to the
+        psycopg.AsyncConnection.connect function. (Optional)
+    :return: R-tree having the same structure as the tree that was exported
+    """
+    if tree_cls is None:
+        from .strategies import RTreeGuttman
+        tree_cls = RTreeGuttman
+    conn, close = await _get_conn(conn, **kwargs)
+    try:
+        builder = TreeBuilder(tree_cls(max_entries=max_entries, min_entries=min_entries), adapter)
+        params = {"rtree_id": rtree_id}
+        sql = get_sql_from_template('select_rtree_nodes', schema=schema)
+        async with conn.cursor(f'rtree_node_{rtree_id}', row_factory=dict_row) as cursor:
+            cursor.itersize = batch_size
+            await cursor.execute(sql, params)
+            async for row in cursor:
+                builder.add_node(row)
+        if builder.root is None:
+            raise ValueError(f"R-tree with ID {rtree_id} was not found in {schema}.rtree_node")
+        sql = get_sql_from_template('select_rtree_entries', schema=schema)
+        async with conn.cursor(f'rtree_entry_{rtree_id}', row_factory=dict_row) as cursor:
+            cursor.itersize = batch_size
+            await cursor.execute(sql, params)
+            async for row in cursor:
+                builder.add_entry(row)
+        await conn.commit()
+        return builder.finish()
+    finally:
+        if close:
+            await conn.close()
+
+
+async def _get_conn(conn=None, **kwargs) -> Tuple[Any, bool]:
+    """Returns the connection to use, along with whether it was opened here (and should therefore be closed)."""
+    if conn is not None:
+        return conn, False
+    if not kwargs:
+        raise RuntimeError("Exporting R-tree to PostGIS requires either passing a connection object or providing "
+                           "keyword arguments that can be used to initalize a connection. Please check the "
+                           "documentation for details.")
+    return await psycopg.AsyncConnection.connect(**kwargs), True
+
+
+async def _reserve_ids(cursor, schema: str, table: str, count: int) -> Iterable[int]:
+    """Reserves a contiguous range of IDs from the sequence of the given table."""
+    if count == 0:
+        return ()
+    # psycopg 3 does not allow multiple statements in a single query when passing parameters
+    await cursor.execute(get_sql_from_template('lock_rtree_table', schema=schema, table=table))
+    await cursor.execute(get_sql_from_template('reserve_rtree_ids', schema=schema, table=table), {"count": count})
+    last_id = (await cursor.fetchone())['last_id']
+    return range(last_id - count + 1, last_id + 1)
+
+
+async def _assign_ids(cursor, schema: str, levels: List[List[RTreeNode]]) -> Tuple[Dict[RTreeNode, int],
+                                                                                     Dict[RTreeEntry, int]]:
+    node_count, entry_count = count_rows(levels)
+    return assign_ids(levels, await _reserve_ids(cursor, schema, 'rtree_node', node_count),
+                      await _reserve_ids(cursor, schema, 'rtree_entry', entry_count))
+
+
+async def _copy(cursor, sql: str, rows: Iterable[str]):
+    """Streams rows to COPY, writing them in chunks of roughly COPY_CHUNK_SIZE characters."""
+    async with cursor.copy(sql) as copy:
+        chunk = []
+        length = 0
+        for row in rows:
+            chunk.append(row)
+            length += len(row)
+            if length >= COPY_CHUNK_SIZE:
+                await copy.write(''.join(chunk))
+                chunk = []
+                length = 0
+        if chunk:
+            await copy.write(''.join(chunk))
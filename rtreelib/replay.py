@@ -0,0 +1,143 @@
+"""
+Replays an operation log (recorded using RTreeBase.record) against a new R-tree, reporting the throughput and latency
+percentiles of each type of operation, and the quality metrics of the resulting tree. This allows comparing strategies
+and configurations using a real workload. For example:
+
+    python -m rtreelib.replay log.bin --tree rstar --max-entries 32
+
+Run "python -m rtreelib.replay --help" for the available options.
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+from typing import Dict, List, Type
+from .rtree import RTreeBase, RTreeEntry
+from .strategies import RTreeGuttman, RStarTree
+from .oplog import read_oplog, INSERT, DELETE, UPDATE, QUERY_RECT, QUERY_POINT
+
+TREES: Dict[str, Type[RTreeBase]] = {
+    'guttman': RTreeGuttman,
+    'rstar': RStarTree,
+}
+
+OPERATION_NAMES = {
+    INSERT: 'insert',
+    DELETE: 'delete',
+    UPDATE: 'update',
+    QUERY_RECT: 'query_rect',
+    QUERY_POINT: 'query_point',
+}
+
+
+def replay(path: str, tree: RTreeBase) -> Dict[str, List[float]]:
+    """
+    Replays the operations in a log file against the given tree, timing each operation. Queries are timed until all of
+    their results have been iterated. The data of the replayed entries is their entry ID in the log. Deletes and updates
+    of entries that are not in the tree are ignored.
+    :param path: Path of the log file
+    :param tree: R-tree instance to replay the operations against (usually empty)
+    :return: Dictionary of the latencies (in seconds) of each type of operation, keyed by operation name
+    """
+    entries: Dict[int, RTreeEntry] = {}
+    latencies: Dict[str, List[float]] = {name: [] for name in OPERATION_NAMES.values()}
+    timer = time.perf_counter
+    for op, entry_id, loc in read_oplog(path):
+        if op == INSERT:
+            start = timer()
+            entries[entry_id] = tree.insert(entry_id, loc)
+        elif op == DELETE:
+            entry = entries.pop(entry_id, None)
+            if entry is None:
+                continue
+            start = timer()
+            tree.delete(entry)
+        elif op == UPDATE:
+            entry = entries.get(entry_id)
+            if entry is None:
+                continue
+            start = timer()
+            tree.update(entry, loc)
+        else:
+            start = timer()
+            for _ in tree.query(loc):
+                pass
+        latencies[OPERATION_NAMES[op]].append(timer() - start)
+    return latencies
+
+
+def summarize(latencies: Dict[str, List[float]]) -> dict:
+    """
+    Summarizes the latencies returned by replay, returning the count, throughput, and latency percentiles (in
+    microseconds) of each type of operation that occurs in the log, and of all operations.
+    """
+    summary = {name: _summarize(values) for name, values in latencies.items() if values}
+    summary['total'] = _summarize([value for values in latencies.values() for value in values])
+    return summary
+
+
+def _summarize(values: List[float]) -> dict:
+    values = sorted(values)
+    total = sum(values)
+    return {
+        'count': len(values),
+        'elapsed': total,
+        'ops_per_sec': len(values) / total if total > 0 else 0.0,
+        'p50_us': _percentile(values, 50) * 1e6,
+        'p90_us': _percentile(values, 90) * 1e6,
+        'p99_us': _percentile(values, 99) * 1e6,
+        'max_us': values[-1] * 1e6 if values else 0.0,
+    }
+
+
+def _percentile(values: List[float], percentile: float) -> float:
+    """Returns the given percentile of a sorted list of values (using the nearest-rank method)."""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(percentile / 100 * len(values)) - 1)]
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m rtreelib.replay',
+                                     description='Replays an operation log recorded using RTreeBase.record.')
+    parser.add_argument('log', help='Path of the operation log')
+    parser.add_argument('--tree', choices=list(TREES), default='guttman', help='Strategy to use (default: guttman)')
+    parser.add_argument('--max-entries', type=int, default=None, help='Maximum number of entries per node')
+    parser.add_argument('--min-entries', type=int, default=None, help='Minimum number of entries per node')
+    parser.add_argument('--json', metavar='PATH', help='Path of a JSON file to write the results to')
+    args = parser.parse_args(argv)
+
+    kwargs = {'min_entries': args.min_entries}
+    if args.max_entries is not None:
+        kwargs['max_entries'] = args.max_entries
+    tree = TREES[args.tree](**kwargs)
+    summary = summarize(replay(args.log, tree))
+    stats = tree.stats()
+
+    print(f"Replayed {args.log} against {args.tree} (max_entries={tree.max_entries}, min_entries={tree.min_entries})")
+    print(f"{'operation':<12} {'count':>9} {'ops/sec':>12} {'p50 us':>10} {'p90 us':>10} {'p99 us':>10} "
+          f"{'max us':>10}")
+    for name, result in summary.items():
+        print(f"{name:<12} {result['count']:>9} {result['ops_per_sec']:>12.1f} {result['p50_us']:>10.1f} "
+              f"{result['p90_us']:>10.1f} {result['p99_us']:>10.1f} {result['max_us']:>10.1f}")
+    print()
+    print(stats)
+
+    if args.json:
+        output = {
+            'log': args.log,
+            'tree': args.tree,
+            'max_entries': tree.max_entries,
+            'min_entries': tree.min_entries,
+            'operations': summary,
+            'stats': stats.as_dict(),
+        }
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(output, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
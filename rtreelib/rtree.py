@@ -1,7 +1,16 @@
 import math
+import time
+import heapq
+import itertools
 from functools import partial
-from typing import TypeVar, Generic, List, Iterable, Callable, Optional, Tuple, Any
-from rtreelib.models import Rect, get_loc_intersection_fn, Location, union_all
+from typing import TypeVar, Generic, List, Iterable, Iterator, Callable, Optional, Tuple, Any, Dict, TYPE_CHECKING
+from rtreelib.models import Rect, get_loc_intersection_fn, get_loc_distance_fn, Location, union_all, QueryStats, \
+    TreeStats
+
+if TYPE_CHECKING:
+    from rtreelib.models import ChangeSet
+    from .observer import RTreeObserver
+    from .oplog import OpLogWriter
 
 DEFAULT_MAX_ENTRIES = 8
 EPSILON = 1e-5
@@ -88,7 +97,8 @@ class RTreeBase(Generic[T]):
             adjust_tree: Callable[['RTreeBase[T]', RTreeNode[T], RTreeNode[T]], None],
             overflow_strategy: Callable[['RTreeBase[T]', RTreeNode[T]], RTreeNode[T]],
             max_entries: int = DEFAULT_MAX_ENTRIES,
-            min_entries: int = None
+            min_entries: int = None,
+            choose_subtree: Callable[['RTreeBase[T]', RTreeNode[T], RTreeEntry[T]], RTreeNode[T]] = None
     ):
         """
         Initializes the R-Tree
@@ -100,18 +110,29 @@ class RTreeBase(Generic[T]):
             exceeds max_entries).
         :param max_entries: Maximum number of entries per node.
         :param min_entries: Minimum number of entries per node. Defaults to ceil(max_entries/2).
+        :param choose_subtree: Strategy used for choosing the child of a non-leaf node when inserting a new entry (a
+            single step of choose_leaf). This is used to route entries one level at a time when inserting a batch of
+            entries (see insert_many). Optional (if not passed in, batches are inserted one entry at a time).
         """
         self.max_entries = max_entries
         self.min_entries = min_entries or math.ceil(max_entries/2)
         assert self.max_entries >= self.min_entries
         self.insert_strategy = insert
         self.choose_leaf = choose_leaf
+        self.choose_subtree = choose_subtree
         self.adjust_tree = adjust_tree
         self.overflow_strategy = overflow_strategy
         self.root = RTreeNode(self, True)
         # Initialize an untyped "_cache" property that implementations can use for any purpose. R* uses this to keep
         # track of certain information when doing a forced reinsert.
         self._cache: Any = None
+        # Change set (only populated when change tracking is enabled using track_changes)
+        self.changes: Optional['ChangeSet[T]'] = None
+        # Observer of strategy events (only set when attached using observe)
+        self.observer: Optional['RTreeObserver[T]'] = None
+        self._observed_strategies: Optional[Tuple[Callable, ...]] = None
+        # Operation log (only set when recording operations using record)
+        self.oplog: Optional['OpLogWriter'] = None
 
     def insert(self, data: T, rect: Rect) -> RTreeEntry[T]:
         """
@@ -120,20 +141,484 @@ class RTreeBase(Generic[T]):
         :param rect: Bounding rectangle
         :return: RTreeEntry instance for the newly-inserted entry.
         """
-        return self.insert_strategy(self, data, rect)
+        entry = self.insert_strategy(self, data, rect)
+        if self.oplog is not None:
+            self.oplog.insert(entry)
+        return entry
+
+    def insert_many(self, items: Iterable[Tuple[T, Rect]]) -> List[RTreeEntry[T]]:
+        """
+        Inserts a batch of entries into the tree, using per-node buffers (as in a buffer tree). Rather than routing each
+        entry from the root down to a leaf and then adjusting the covering rectangles of all of its ancestors, entries
+        are collected in a buffer at each non-leaf node. When the buffer of a node fills up, its entries are distributed
+        among the buffers of its children (using the choose_subtree strategy), one level down. Entries that reach the
+        level above the leaves are inserted into their leaf node as a group, so that the covering rectangles of the
+        leaf's ancestors are adjusted once per group rather than once per entry. Once all items have been added, the
+        remaining buffers are flushed level by level, from the root down.
+
+        Overflowing nodes are handled using the regular overflow treatment, but the whole batch is treated as a single
+        insert operation: an R*-tree performs a forced reinsert at most once per level for the entire batch (rather
+        than once per level for every entry), and splits any other overflowing node. This avoids repeating the forced
+        reinsert (which is what makes inserting into an R*-tree slow) for every entry, at the cost of a tree that is
+        built mostly using splits. Also, since entries are routed using the covering rectangles of the nodes at the
+        time their buffer is flushed, the resulting tree is not necessarily the same as the tree built by inserting the
+        entries one at a time. If the tree has no choose_subtree strategy, the entries are inserted one at a time.
+        :param items: Iterable of (data, rect) tuples
+        :return: List of RTreeEntry instances for the newly-inserted entries (in the same order as the items).
+        """
+        entries = [RTreeEntry(rect, data=data) for data, rect in items]
+        if self.choose_subtree is None:
+            for entry in entries:
+                self._insert_entry(entry)
+        else:
+            buffers: Dict[RTreeNode[T], List[RTreeEntry[T]]] = {}
+            for entry in entries:
+                self._buffer_entries(buffers, self.root, [entry])
+            # Node splits can create nodes (which may then receive buffered entries from their parent) after the levels
+            # have been listed, so keep flushing until no buffered entries remain.
+            while buffers:
+                for level in self.get_levels():
+                    for node in level:
+                        if node in buffers:
+                            self._flush_buffer(buffers, node)
+        # The whole batch is treated as a single insert operation, so implementations that use the cache to track state
+        # during an insert (such as R*, which does a forced reinsert at most once per level) only reset it at the end.
+        self._cache = None
+        if self.oplog is not None:
+            for entry in entries:
+                self.oplog.insert(entry)
+        return entries
+
+    def _buffer_entries(self, buffers: Dict[RTreeNode[T], List[RTreeEntry[T]]], node: RTreeNode[T],
+                        entries: List[RTreeEntry[T]]) -> None:
+        """
+        Adds entries to the buffer of a non-leaf node (used by insert_many), flushing the buffer once it holds
+        max_entries^2 entries. If the node is a leaf (which is only the case when the root is a leaf), the entries are
+        inserted into it right away.
+        """
+        if node.is_leaf:
+            for entry in entries:
+                self._insert_entry(entry, node)
+            return
+        buffer = buffers.setdefault(node, [])
+        buffer.extend(entries)
+        if len(buffer) >= self.max_entries * self.max_entries:
+            self._flush_buffer(buffers, node)
+
+    def _flush_buffer(self, buffers: Dict[RTreeNode[T], List[RTreeEntry[T]]], node: RTreeNode[T]) -> None:
+        """Distributes the buffered entries of a non-leaf node among its children (used by insert_many)."""
+        entries = buffers.pop(node)
+        if node.entries[0].child.is_leaf:
+            self._insert_into_leaves(buffers, node, entries)
+            return
+        groups: Dict[RTreeNode[T], List[RTreeEntry[T]]] = {}
+        for entry in entries:
+            groups.setdefault(self.choose_subtree(self, node, entry), []).append(entry)
+        for child, group in groups.items():
+            self._buffer_entries(buffers, child, group)
+
+    def _insert_into_leaves(self, buffers: Dict[RTreeNode[T], List[RTreeEntry[T]]], node: RTreeNode[T],
+                            entries: List[RTreeEntry[T]]) -> None:
+        """
+        Inserts the buffered entries of a node at the level above the leaves into its leaf nodes (used by insert_many).
+        Each entry is routed against the up-to-date rectangles of the leaves, but the covering rectangles of the node's
+        ancestors are only adjusted once for each modified leaf. If handling an overflow moves any of the node's
+        children elsewhere (because the node was split, or because of a forced reinsert), the remaining entries are
+        buffered again at the node's parent.
+        """
+        modified: Dict[RTreeNode[T], None] = {}
+        children = {e.child for e in node.entries}
+        rest: List[RTreeEntry[T]] = []
+        for i, entry in enumerate(entries):
+            leaf = self.choose_subtree(self, node, entry)
+            leaf.entries.append(entry)
+            if len(leaf.entries) <= self.max_entries:
+                parent_entry = leaf.parent_entry
+                parent_entry.rect = parent_entry.rect.union(entry.rect)
+                modified[leaf] = None
+                continue
+            split_node = self.overflow_strategy(self, leaf)
+            self.adjust_tree(self, leaf, split_node)
+            current = {e.child for e in node.entries}
+            if not children <= current:
+                rest = entries[i + 1:]
+                break
+            children = current
+        for leaf in modified:
+            self.adjust_tree(self, leaf, None)
+        if rest:
+            self._buffer_entries(buffers, node.parent, rest)
+
+    def update(self, entry: RTreeEntry[T], rect: Rect, max_enlargement: float = 0.1) -> RTreeEntry[T]:
+        """
+        Changes the bounding rectangle of an existing leaf entry (for example, when tracking moving objects). The update
+        is done bottom-up (as in the LUR-tree): if the new rectangle still fits within the bounding rectangle of the
+        leaf node containing the entry (optionally enlarged by a small margin), the entry is updated in place and only
+        the covering rectangles of its ancestors are adjusted. Only when the entry has moved further than that is it
+        deleted and reinserted from the root.
+        :param entry: Existing leaf entry to update
+        :param rect: New bounding rectangle
+        :param max_enlargement: Margin by which the bounding rectangle of the leaf node may be enlarged in order to
+            update the entry in place, expressed as a fraction of the width and height of the leaf node. Optional
+            (defaults to 0.1). Pass 0 to only update in place if the new rectangle fits within the leaf node as-is.
+        :return: The updated entry (this is the same instance that was passed in).
+        """
+        leaf = self._find_leaf(entry)
+        if leaf.is_root or _enlarge(leaf.get_bounding_rect(), max_enlargement).contains(rect):
+            entry.rect = rect
+            self.adjust_tree(self, leaf, None)
+        else:
+            self._remove_entry(leaf, entry)
+            entry.rect = rect
+            self._insert_entry(entry)
+            self._cache = None
+        if self.oplog is not None:
+            self.oplog.update(entry)
+        return entry
+
+    def delete(self, entry: RTreeEntry[T]) -> None:
+        """
+        Deletes a leaf entry from the tree. If this leaves the node containing the entry with fewer than min_entries
+        entries, the tree is condensed as described in Guttman's paper: the underfull node is removed and its remaining
+        entries are reinserted.
+        :param entry: Leaf entry to delete
+        """
+        leaf = self._find_leaf(entry)
+        self._remove_entry(leaf, entry)
+        if self.oplog is not None:
+            self.oplog.delete(entry)
+
+    def track_changes(self) -> 'ChangeSet[T]':
+        """
+        Enables change tracking. Once enabled, the tree keeps track of the nodes and entries that were created,
+        modified, or removed (by inserts, node splits, forced reinserts, updates, and deletes) in a ChangeSet, which is
+        available as the changes property. This is used to mirror the tree elsewhere at a cost proportional to the size
+        of the change (see pg.sync_to_postgis). Calling this method when change tracking is already enabled clears the
+        current change set. Change tracking is disabled by default, and has no overhead when disabled.
+        :return: Change set
+        """
+        from rtreelib.models import ChangeSet
+        if self.changes is not None:
+            self.changes.clear(self.get_height())
+            return self.changes
+        self.changes = ChangeSet(self.get_height())
+        # Every insert (including splits and reinserts) ends by adjusting the tree from the node that was modified up to
+        # the root, and node splits go through the overflow strategy, so wrapping these two strategies is sufficient to
+        # capture all modified nodes, regardless of the implementation.
+        adjust_tree, overflow_strategy = self.adjust_tree, self.overflow_strategy
+
+        def tracking_adjust_tree(tree: RTreeBase[T], node: RTreeNode[T], split_node: RTreeNode[T] = None) -> None:
+            tree.changes.mark(node)
+            if split_node is not None:
+                tree.changes.mark(split_node)
+            adjust_tree(tree, node, split_node)
+            tree.changes.mark(node)
+            tree.changes.mark(tree.root)
+
+        def tracking_overflow_strategy(tree: RTreeBase[T], node: RTreeNode[T]) -> RTreeNode[T]:
+            tree.changes.mark(node)
+            split_node = overflow_strategy(tree, node)
+            if split_node is not None:
+                tree.changes.mark(split_node)
+            return split_node
+
+        self.adjust_tree = tracking_adjust_tree
+        self.overflow_strategy = tracking_overflow_strategy
+        return self.changes
+
+    def observe(self, observer: Optional['RTreeObserver[T]']) -> Optional['RTreeObserver[T]']:
+        """
+        Attaches an observer, which receives strategy events (inserts, choose_leaf, overflows, node splits, forced
+        reinserts, and growing the tree) as entries are inserted. This is useful for profiling inserts (for example,
+        using a CountingObserver). Pass None to detach the current observer. Observing is disabled by default: the
+        insert, choose_leaf, and overflow strategies are only wrapped while an observer is attached, so there is no
+        overhead on the insert path when no observer is attached.
+        :param observer: Observer to attach (replacing the current observer, if any), or None to detach it
+        :return: The observer that was passed in
+        """
+        self.observer = observer
+        if observer is None:
+            if self._observed_strategies is not None:
+                originals, wrappers = self._observed_strategies[:3], self._observed_strategies[3:]
+                # Only restore the original strategies if they have not been wrapped again since (for example, by
+                # track_changes). Otherwise, the wrappers stay in place, but pass through since there is no observer.
+                if (self.insert_strategy, self.choose_leaf, self.overflow_strategy) == wrappers:
+                    self.insert_strategy, self.choose_leaf, self.overflow_strategy = originals
+                    self._observed_strategies = None
+            return None
+        if self._observed_strategies is not None:
+            return observer
+        insert_strategy, choose_leaf, overflow_strategy = self.insert_strategy, self.choose_leaf, self.overflow_strategy
+
+        def observed_insert(tree: RTreeBase[T], data: T, rect: Rect) -> RTreeEntry[T]:
+            entry = insert_strategy(tree, data, rect)
+            if tree.observer is not None:
+                tree.observer.on_insert(tree, entry)
+            return entry
+
+        def observed_choose_leaf(tree: RTreeBase[T], entry: RTreeEntry[T]) -> RTreeNode[T]:
+            leaf = choose_leaf(tree, entry)
+            if tree.observer is not None:
+                tree.observer.on_choose_leaf(tree, entry, leaf)
+            return leaf
+
+        def observed_overflow_strategy(tree: RTreeBase[T], node: RTreeNode[T]) -> RTreeNode[T]:
+            if tree.observer is not None:
+                tree.observer.on_overflow(tree, node)
+            return overflow_strategy(tree, node)
+
+        self.insert_strategy = observed_insert
+        self.choose_leaf = observed_choose_leaf
+        self.overflow_strategy = observed_overflow_strategy
+        self._observed_strategies = (insert_strategy, choose_leaf, overflow_strategy,
+                                     observed_insert, observed_choose_leaf, observed_overflow_strategy)
+        return observer
+
+    def record(self, path: Optional[str]) -> Optional['OpLogWriter']:
+        """
+        Starts recording the operations done on the tree (inserts, updates, deletes, and queries) to a compact,
+        append-only binary log (see the oplog module), so that the workload can be replayed offline (see the replay
+        module). Entries inserted using insert_many are recorded as individual inserts. Pass None to stop recording
+        (which closes the log). Recording is disabled by default.
+        :param path: Path of the log file. If the file already exists, the operations are appended to it.
+        :return: Log writer (or None if recording was stopped)
+        """
+        from .oplog import OpLogWriter
+        if self.oplog is not None:
+            self.oplog.close()
+            self.oplog = None
+        if path is not None:
+            self.oplog = OpLogWriter(path)
+        return self.oplog
+
+    def get_height(self) -> int:
+        """Returns the height of the tree (the number of levels, including the root level)."""
+        height = 1
+        node = self.root
+        while not node.is_leaf and node.entries:
+            node = node.entries[0].child
+            height += 1
+        return height
+
+    def stats(self) -> TreeStats:
+        """
+        Computes quality metrics of the tree (per-level node counts, fill factors, overlap between sibling nodes, dead
+        space, and the total area and perimeter of the nodes' bounding rectangles), which determine how expensive
+        queries are. The metrics are computed in a single traversal of the tree, using the stored rectangle of each
+        node's parent entry as the node's bounding rectangle (rather than recomputing it from the node's entries).
+        :return: Tree quality metrics
+        """
+        stats = TreeStats(self.max_entries)
+        stack = [(self.root, self.root.get_bounding_rect(), 0)]
+        while stack:
+            node, rect, level = stack.pop()
+            stats.add_node(level, rect, [e.rect for e in node.entries])
+            if not node.is_leaf:
+                stack.extend((e.child, e.rect, level + 1) for e in node.entries)
+        return stats
+
+    def _find_leaf(self, entry: RTreeEntry[T]) -> RTreeNode[T]:
+        """
+        Finds the leaf node containing the given entry, only descending into subtrees whose (stored) bounding rectangle
+        contains the rectangle of the entry.
+        """
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.is_leaf:
+                if any(e is entry for e in node.entries):
+                    return node
+            else:
+                stack.extend(e.child for e in node.entries if e.rect.contains(entry.rect))
+        raise ValueError(f"{entry} was not found in the R-tree")
+
+    def _remove_entry(self, leaf: RTreeNode[T], entry: RTreeEntry[T]) -> None:
+        leaf.entries = [e for e in leaf.entries if e is not entry]
+        if self.changes is not None:
+            self.changes.remove_entry(entry)
+            self.changes.mark(leaf)
+        for orphan in self._condense_tree(leaf):
+            self._insert_entry(orphan)
+        self._cache = None
+
+    def _condense_tree(self, node: RTreeNode[T]) -> List[RTreeEntry[T]]:
+        """
+        Ascends from a leaf node to the root after an entry has been removed, eliminating underfull nodes and adjusting
+        covering rectangles. Returns the leaf entries of the eliminated nodes, which need to be reinserted.
+        """
+        orphans = []
+        while not node.is_root:
+            parent = node.parent
+            parent_entry = node.parent_entry
+            if len(node.entries) < self.min_entries:
+                parent.entries = [e for e in parent.entries if e is not parent_entry]
+                for n in self._get_nodes(node):
+                    if n.is_leaf:
+                        orphans.extend(n.entries)
+                    elif self.changes is not None:
+                        for e in n.entries:
+                            self.changes.remove_entry(e)
+                    if self.changes is not None:
+                        self.changes.remove_node(n)
+                if self.changes is not None:
+                    self.changes.remove_entry(parent_entry)
+            else:
+                parent_entry.rect = node.get_bounding_rect()
+            node = parent
+        # Shorten the tree if the root is left with a single child (or no children at all)
+        while not self.root.is_leaf and len(self.root.entries) == 1:
+            if self.changes is not None:
+                self.changes.remove_node(self.root)
+                self.changes.remove_entry(self.root.entries[0])
+            self.root = self.root.entries[0].child
+            self.root.parent = None
+        if not self.root.is_leaf and not self.root.entries:
+            if self.changes is not None:
+                self.changes.remove_node(self.root)
+            self.root = RTreeNode(self, True)
+        if self.changes is not None:
+            self.changes.mark(self.root)
+        return orphans
+
+    def _insert_entry(self, entry: RTreeEntry[T], node: RTreeNode[T] = None) -> None:
+        """
+        Inserts an existing leaf entry (preserving its identity) using the choose_leaf, overflow and adjust_tree
+        strategies of the tree. This mirrors the base insert strategy, and is used when an entry needs to be moved to
+        a different location in the tree. The leaf node may optionally be passed in if it has already been chosen.
+        Note that the caller is responsible for resetting the _cache once the overall operation is complete.
+        """
+        node = node or self.choose_leaf(self, entry)
+        node.entries.append(entry)
+        split_node = None
+        if len(node.entries) > self.max_entries:
+            split_node = self.overflow_strategy(self, node)
+        self.adjust_tree(self, node, split_node)
+
+    def save(self, path: str, dumps: Callable[[T], bytes] = None) -> None:
+        """
+        Saves the R-tree to a file using a compact binary format (see the rtreelib.binary module for details). The tree
+        can later be loaded with the same structure using the load method.
+        :param path: Path of the file to write
+        :param dumps: Function used to serialize the data of each leaf entry. Optional (defaults to pickle.dumps).
+        """
+        from .binary import save_tree
+        save_tree(self, path, **({'dumps': dumps} if dumps else {}))
+
+    @classmethod
+    def load(cls, path: str, loads: Callable[[bytes], T] = None) -> 'RTreeBase[T]':
+        """
+        Loads an R-tree previously saved using the save method. The tree is reconstructed with exactly the same
+        structure, without reinserting the entries. When called on RTreeBase, an instance of the class of the tree that
+        was saved is returned; when called on a subclass (e.g., RStarTree.load), an instance of that subclass is
+        returned.
+        :param path: Path of the file to read
+        :param loads: Function used to deserialize the data of each leaf entry. Optional (defaults to pickle.loads).
+        :return: R-tree instance
+        """
+        from .binary import load_tree
+        tree_cls = None if cls is RTreeBase else cls
+        return load_tree(path, tree_cls, **({'loads': loads} if loads else {}))
 
-    def query(self, loc: Location) -> Iterable[RTreeEntry[T]]:
+    def query(self, loc: Location, stats: QueryStats = None) -> Iterable[RTreeEntry[T]]:
         """
         Queries leaf entries for a location (either a point or a rectangle), returning an iterable.
         :param loc: Location to query. This may either be a Point or a Rect, or a tuple/list of coordinates representing
             either a point or a rectangle.
+        :param stats: Optional QueryStats instance, which is updated with the execution statistics of the query as the
+            results are iterated. See also explain.
         :return: Iterable of leaf entries that matched the location query.
         """
+        if self.oplog is not None:
+            self.oplog.query(loc)
+        if stats is not None:
+            yield from _timed(self._query_with_stats(loc, stats), stats)
+            return
         intersects = get_loc_intersection_fn(loc)
-        for leaf in self.search_nodes(lambda node: intersects(node.get_bounding_rect())):
-            for e in leaf.entries:
-                if intersects(e.rect):
-                    yield e
+        root_rect = self.root.get_bounding_rect()
+        if root_rect is None or not intersects(root_rect):
+            return
+        # Descend using the (stored) rectangles of the non-leaf entries rather than recomputing the bounding rectangle
+        # of each child node, so that only the nodes along the search path are visited.
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.is_leaf:
+                for e in node.entries:
+                    if intersects(e.rect):
+                        yield e
+            else:
+                stack.extend(reversed([e.child for e in node.entries if intersects(e.rect)]))
+
+    def _query_with_stats(self, loc: Location, stats: QueryStats) -> Iterator[RTreeEntry[T]]:
+        """Same as query, but keeps track of the nodes visited and the rectangles and entries tested."""
+        intersects = get_loc_intersection_fn(loc)
+        root_rect = self.root.get_bounding_rect()
+        stats.mbr_tests += 1
+        if root_rect is None or not intersects(root_rect):
+            return
+        stack = [(self.root, 0)]
+        while stack:
+            node, level = stack.pop()
+            stats.visit(level)
+            if node.is_leaf:
+                stats.entries_tested += len(node.entries)
+                for e in node.entries:
+                    if intersects(e.rect):
+                        yield e
+            else:
+                stats.mbr_tests += len(node.entries)
+                stack.extend(reversed([(e.child, level + 1) for e in node.entries if intersects(e.rect)]))
+
+    def explain(self, loc: Location) -> QueryStats:
+        """
+        Runs a query for a location (either a point or a rectangle), returning its execution statistics rather than its
+        results. This shows how much of the tree had to be visited to answer the query (nodes visited per level,
+        bounding rectangles and leaf entries tested), relative to the number of results (hits).
+        :param loc: Location to query. This may either be a Point or a Rect, or a tuple/list of coordinates representing
+            either a point or a rectangle.
+        :return: Execution statistics of the query
+        """
+        stats = QueryStats()
+        for _ in self.query(loc, stats):
+            pass
+        return stats
+
+    def count(self, loc: Location) -> int:
+        """
+        Returns the number of leaf entries that intersect a location (either a point or a rectangle).
+        :param loc: Location to query. This may either be a Point or a Rect, or a tuple/list of coordinates representing
+            either a point or a rectangle.
+        :return: Number of leaf entries that matched the location query.
+        """
+        return sum(1 for _ in self.query(loc))
+
+    def nearest(self, loc: Location, k: int = 1) -> Iterable[RTreeEntry[T]]:
+        """
+        Finds the k leaf entries nearest to a location (either a point or a rectangle), using a best-first search. The
+        distance between the location and an entry is the minimum Euclidean distance between the location and the
+        bounding rectangle of the entry (which is 0 if they intersect).
+        :param loc: Location to query. This may either be a Point or a Rect, or a tuple/list of coordinates representing
+            either a point or a rectangle.
+        :param k: Number of entries to return. Optional (defaults to 1). If None, all entries are returned (lazily), in
+            order of increasing distance.
+        :return: Iterable of up to k leaf entries, in order of increasing distance from the location.
+        """
+        distance = get_loc_distance_fn(loc)
+        counter = itertools.count()
+        heap: List[Tuple[float, int, Any]] = [(0.0, next(counter), self.root)]
+        found = 0
+        while heap and (k is None or found < k):
+            _, _, item = heapq.heappop(heap)
+            if isinstance(item, RTreeEntry) and item.is_leaf:
+                found += 1
+                yield item
+                continue
+            # Non-leaf entries are pushed onto the heap as they are, and their child node is only resolved once the
+            # entry is popped, so that only the nodes that are actually expanded are visited (for a DiskRTree, resolving
+            # a child node reads its page).
+            node = item if isinstance(item, RTreeNode) else item.child
+            for e in node.entries:
+                heapq.heappush(heap, (distance(e.rect), next(counter), e))
 
     def query_nodes(self, loc: Location, leaves=True) -> Iterable[RTreeNode[T]]:
         """
@@ -149,7 +634,8 @@ class RTreeBase(Generic[T]):
 
     def search(self,
                node_condition: Optional[Callable[[RTreeNode[T]], bool]],
-               entry_condition: Optional[Callable[[RTreeEntry[T]], bool]] = None) -> Iterable[RTreeEntry[T]]:
+               entry_condition: Optional[Callable[[RTreeEntry[T]], bool]] = None,
+               stats: QueryStats = None) -> Iterable[RTreeEntry[T]]:
         """
         Traverses the tree, returning leaf entries that match a condition. This method optionally accepts both a node
         condition and an entry condition. The node condition is evaluated at each level and eliminates entire subtrees.
@@ -160,14 +646,30 @@ class RTreeBase(Generic[T]):
             subtree is eliminated and will not be traversed. Optional (if not passed in, all nodes are visited).
         :param entry_condition: Condition to evaluate for leaf entries. Optional (if not passed in, all leaf entries
             whose parent nodes passed the node_condition will be returned).
+        :param stats: Optional QueryStats instance, which is updated with the execution statistics of the search as the
+            results are iterated. Each evaluation of node_condition counts as a bounding rectangle test.
         :return: Iterable of matching leaf entries
         """
+        if stats is not None:
+            yield from _timed(self._search_with_stats(node_condition, entry_condition, stats), stats)
+            return
         for leaf in self.search_nodes(node_condition):
             for e in leaf.entries:
                 if entry_condition is None or entry_condition(e):
                     yield e
 
-    def search_nodes(self, condition: Callable[[RTreeNode[T]], bool], leaves=True) -> Iterable[RTreeNode[T]]:
+    def _search_with_stats(self, node_condition: Optional[Callable[[RTreeNode[T]], bool]],
+                           entry_condition: Optional[Callable[[RTreeEntry[T]], bool]],
+                           stats: QueryStats) -> Iterator[RTreeEntry[T]]:
+        """Same as search, but keeps track of the nodes visited and the conditions evaluated."""
+        for leaf in self._search_nodes_with_stats(node_condition, True, stats):
+            stats.entries_tested += len(leaf.entries)
+            for e in leaf.entries:
+                if entry_condition is None or entry_condition(e):
+                    yield e
+
+    def search_nodes(self, condition: Callable[[RTreeNode[T]], bool], leaves=True,
+                     stats: QueryStats = None) -> Iterable[RTreeNode[T]]:
         """
         Traverses the tree, returning nodes that match a condition. By default, this method returns only leaf nodes, but
         intermediate-level nodes can also be returned by passing leaves=False. The condition is evaluated for each node
@@ -176,11 +678,35 @@ class RTreeBase(Generic[T]):
             subtree is eliminated and will not be traversed.
         :param leaves: If True, only leaf-level nodes are returned. Otherwise, root and intermediate-level nodes are
             also returned. Optional (defaults to True).
+        :param stats: Optional QueryStats instance, which is updated with the execution statistics of the search as the
+            results are iterated. Each evaluation of the condition counts as a bounding rectangle test.
         :return: Iterable of matching nodes
         """
+        if stats is not None:
+            yield from _timed(self._search_nodes_with_stats(condition, leaves, stats), stats)
+            return
         fn = _yield_if_leaf if leaves else _yield_node
         yield from self.traverse(fn, condition)
 
+    def _search_nodes_with_stats(self, condition: Optional[Callable[[RTreeNode[T]], bool]], leaves: bool,
+                                 stats: QueryStats) -> Iterator[RTreeNode[T]]:
+        """
+        Same as search_nodes, but keeps track of the nodes visited (at each level) and the conditions evaluated. The
+        nodes are traversed in the same (depth-first) order as traverse.
+        """
+        stack = [(self.root, 0)]
+        while stack:
+            node, level = stack.pop()
+            if condition is not None:
+                stats.mbr_tests += 1
+                if not condition(node):
+                    continue
+            stats.visit(level)
+            if node.is_leaf or not leaves:
+                yield node
+            if not node.is_leaf:
+                stack.extend(reversed([(e.child, level + 1) for e in node.entries]))
+
     def perform_node_split(self, node: RTreeNode[T], group1: List[RTreeEntry[T]], group2: List[RTreeEntry[T]])\
             -> RTreeNode[T]:
         """
@@ -196,6 +722,8 @@ class RTreeBase(Generic[T]):
         split_node = RTreeNode(self, node.is_leaf, parent=node.parent, entries=group2)
         self._fix_children(node)
         self._fix_children(split_node)
+        if self.observer is not None:
+            self.observer.on_split(self, node, split_node)
         return split_node
 
     @staticmethod
@@ -214,6 +742,8 @@ class RTreeBase(Generic[T]):
         self.root = RTreeNode(self, False, entries=entries)
         for node in nodes:
             node.parent = self.root
+        if self.observer is not None:
+            self.observer.on_grow_tree(self, self.root)
         return self.root
 
     def traverse(self, fn: Callable[[RTreeNode[T]], Iterable[TResult]],
@@ -331,6 +861,28 @@ def _yield_if_leaf_with_lvl_param(node: RTreeNode[T], _) -> Iterable[RTreeNode[T
         yield node
 
 
+def _timed(results: Iterator[TResult], stats: QueryStats) -> Iterable[TResult]:
+    """
+    Yields the results of a query, adding the time spent producing each result to the query's elapsed time (so that
+    the time spent by the caller between results is excluded), and counting the results as hits.
+    """
+    while True:
+        start = time.perf_counter()
+        try:
+            result = next(results)
+        except StopIteration:
+            return
+        finally:
+            stats.elapsed += time.perf_counter() - start
+        stats.hits += 1
+        yield result
+
+
+def _enlarge(rect: Rect, fraction: float) -> Rect:
+    dx, dy = (fraction * rect.width, fraction * rect.height)
+    return Rect(rect.min_x - dx, rect.min_y - dy, rect.max_x + dx, rect.max_y + dy)
+
+
 def _node_intersects(loc: Location) -> Callable[[RTreeNode[T]], bool]:
     loc_intersects = get_loc_intersection_fn(loc)
     return lambda node: loc_intersects(node.get_bounding_rect())
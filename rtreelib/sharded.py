@@ -0,0 +1,308 @@
+"""
+Module containing ShardedRTree, which partitions space into a number of regions, each indexed by an independent R-tree
+(shard) owned by a worker process. Since each shard runs in its own process, queries that touch several shards are
+answered in parallel (rather than being limited to a single core by the GIL).
+"""
+
+import heapq
+import itertools
+import math
+import multiprocessing
+from typing import TypeVar, Generic, List, Sequence, Iterable, Tuple, Type, Optional, Any
+from .rtree import RTreeBase, RTreeEntry, DEFAULT_MAX_ENTRIES
+from .strategies import RTreeGuttman
+from .strategies.bulk import _tile
+from rtreelib.models import Rect, Location, TreeStats, get_loc_intersection_fn, get_loc_distance_fn, union_all
+
+T = TypeVar('T')
+
+# Commands that are sent to a shard without waiting for a reply (any error is reported on the next reply)
+_NO_REPLY = {'insert', 'insert_many'}
+
+
+class ShardedRTree(Generic[T]):
+    """
+    A forest of R-trees, where space is partitioned into regions (for example, using a grid, or STR partitioning of a
+    sample of the data), each indexed by an independent R-tree (shard). Entries are routed to the shard whose region
+    contains the center of their bounding rectangle (or the nearest region, if none contains it). Each shard is owned
+    by a worker process, and queries are only sent to the shards whose entries may match, in parallel, with their
+    results merged.
+
+    Since the shards live in other processes, the entries returned by queries are copies, and entry data must be
+    picklable. Call close (or use the tree as a context manager) to stop the worker processes.
+    """
+
+    def __init__(self, partitions: Sequence[Rect], tree_cls: Type[RTreeBase] = RTreeGuttman,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, min_entries: int = None, processes: bool = True):
+        """
+        Initializes the sharded R-tree, starting a worker process for each shard.
+        :param partitions: Region of each shard
+        :param tree_cls: R-tree class used for each shard (RTreeGuttman or RStarTree). Defaults to RTreeGuttman.
+        :param max_entries: Maximum number of entries per node (of each shard).
+        :param min_entries: Minimum number of entries per node (of each shard). Defaults to ceil(max_entries/2).
+        :param processes: Whether to run each shard in a worker process. If False, the shards are kept in the current
+            process and queried sequentially (which is mainly useful for debugging). Defaults to True.
+        """
+        if not partitions:
+            raise ValueError("At least one partition is required")
+        self.partitions = list(partitions)
+        # Bounding rectangle of the entries of each shard (None if the shard is empty). Since entries are routed by
+        # their center, this may extend beyond the shard's partition.
+        self.bounds: List[Optional[Rect]] = [None] * len(self.partitions)
+        self.sizes = [0] * len(self.partitions)
+        shard_cls = _ProcessShard if processes else _LocalShard
+        self._shards = [shard_cls(tree_cls, max_entries, min_entries) for _ in self.partitions]
+
+    @classmethod
+    def grid(cls, bounds: Rect, rows: int, columns: int, **kwargs) -> 'ShardedRTree[T]':
+        """
+        Creates a sharded R-tree with one shard per cell of a uniform grid.
+        :param bounds: Bounding rectangle of the grid
+        :param rows: Number of rows
+        :param columns: Number of columns
+        :param kwargs: Additional arguments passed to the constructor
+        """
+        if rows <= 0 or columns <= 0:
+            raise ValueError(f"The grid must have at least one row and column (got {rows}x{columns})")
+        width = (bounds.max_x - bounds.min_x) / columns
+        height = (bounds.max_y - bounds.min_y) / rows
+        partitions = [Rect(bounds.min_x + c * width, bounds.min_y + r * height,
+                           bounds.min_x + (c + 1) * width, bounds.min_y + (r + 1) * height)
+                      for r in range(rows) for c in range(columns)]
+        return cls(partitions, **kwargs)
+
+    @classmethod
+    def from_sample(cls, sample: Sequence[Rect], shards: int, **kwargs) -> 'ShardedRTree[T]':
+        """
+        Creates a sharded R-tree whose partitions are computed from a sample of the data, using Sort-Tile-Recursive
+        (STR) partitioning (as done by str_pack for the nodes of a level), so that each shard receives a similar number
+        of entries. Note that the sample is only used to compute the partitions (it is not inserted).
+        :param sample: Bounding rectangles of a sample of the entries
+        :param shards: Number of shards. Fewer shards may be created if the sample is small.
+        :param kwargs: Additional arguments passed to the constructor
+        """
+        if shards <= 0:
+            raise ValueError(f"Number of shards must be positive (got {shards})")
+        if not sample:
+            raise ValueError("Sample must not be empty")
+        sample = list(sample)
+        groups = _tile(sample, math.ceil(len(sample) / shards))
+        return cls([union_all([sample[i] for i in group]) for group in groups], **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        """Stops the worker processes. The tree cannot be used afterwards."""
+        for shard in self._shards:
+            shard.close()
+
+    def insert(self, data: T, rect: Rect) -> None:
+        """
+        Inserts a new entry into the shard whose partition contains the center of the rectangle. The insert is sent to
+        the shard without waiting for it to complete (subsequent queries on the shard will see the entry).
+        :param data: Entry data
+        :param rect: Bounding rectangle
+        """
+        i = self._route(rect)
+        self._shards[i].send('insert', data, rect)
+        self._add_to_shard(i, rect, 1)
+
+    def insert_many(self, entries: Iterable[Tuple[T, Rect]]) -> None:
+        """
+        Inserts a batch of entries, sending a single message to each shard (so the shards insert their entries in
+        parallel, using RTreeBase.insert_many).
+        :param entries: Iterable of (data, rect) tuples
+        """
+        batches: List[List[Tuple[T, Rect]]] = [[] for _ in self._shards]
+        for data, rect in entries:
+            batches[self._route(rect)].append((data, rect))
+        for i, batch in enumerate(batches):
+            if batch:
+                self._shards[i].send('insert_many', batch)
+                self._add_to_shard(i, union_all([rect for _, rect in batch]), len(batch))
+
+    def query(self, loc: Location) -> List[RTreeEntry[T]]:
+        """
+        Queries leaf entries for a location (either a point or a rectangle), in parallel over the shards whose entries
+        may intersect it.
+        :param loc: Location to query. This may either be a Point or a Rect, or a tuple/list of coordinates representing
+            either a point or a rectangle.
+        :return: List of (copies of) the leaf entries that matched the location query.
+        """
+        results = self._fan_out(self._get_intersecting_shards(loc), 'query', loc)
+        return [entry for result in results for entry in result]
+
+    def count(self, loc: Location) -> int:
+        """
+        Returns the number of leaf entries that intersect a location (either a point or a rectangle), counted in
+        parallel over the shards whose entries may intersect it.
+        :param loc: Location to query. This may either be a Point or a Rect, or a tuple/list of coordinates representing
+            either a point or a rectangle.
+        :return: Number of leaf entries that matched the location query.
+        """
+        return sum(self._fan_out(self._get_intersecting_shards(loc), 'count', loc))
+
+    def nearest(self, loc: Location, k: int = 1) -> List[RTreeEntry[T]]:
+        """
+        Finds the k leaf entries nearest to a location (either a point or a rectangle). The shard nearest to the
+        location is searched first, and the distance to its k-th nearest entry is then used to only search the other
+        shards that may contain a nearer entry (in parallel). The results of each shard are merged into the global k
+        nearest entries.
+        :param loc: Location to query. This may either be a Point or a Rect, or a tuple/list of coordinates representing
+            either a point or a rectangle.
+        :param k: Number of entries to return. Optional (defaults to 1). If None, all entries are returned.
+        :return: List of up to k (copies of) leaf entries, in order of increasing distance from the location.
+        """
+        if k is not None and k <= 0:
+            return []
+        distance = get_loc_distance_fn(loc)
+        candidates = sorted((distance(rect), i) for i, rect in enumerate(self.bounds) if rect is not None)
+        if not candidates:
+            return []
+        first = candidates[0][1]
+        results = {first: self._fan_out([first], 'nearest', loc, k)[0]}
+        if k is not None and len(results[first]) == k:
+            # Only shards that may contain an entry nearer than the k-th nearest entry found so far need to be searched
+            max_distance = results[first][-1][0]
+            others = [i for d, i in candidates[1:] if d <= max_distance]
+        else:
+            others = [i for _, i in candidates[1:]]
+        results.update(zip(others, self._fan_out(others, 'nearest', loc, k)))
+        merged = heapq.merge(*(
+            [(d, i, rank, entry) for rank, (d, entry) in enumerate(result)] for i, result in results.items()))
+        return [entry for _, _, _, entry in itertools.islice(merged, k)]
+
+    def stats(self) -> List[TreeStats]:
+        """Computes the quality metrics of each shard (see RTreeBase.stats)."""
+        return self._fan_out(range(len(self._shards)), 'stats')
+
+    def _route(self, rect: Rect) -> int:
+        """Returns the index of the shard whose partition contains the center of a rectangle (or the nearest one)."""
+        x = (rect.min_x + rect.max_x) / 2
+        y = (rect.min_y + rect.max_y) / 2
+        distance = get_loc_distance_fn((x, y))
+        best, best_distance = 0, math.inf
+        for i, partition in enumerate(self.partitions):
+            d = distance(partition)
+            if d < best_distance:
+                best, best_distance = i, d
+                if d == 0:
+                    break
+        return best
+
+    def _add_to_shard(self, i: int, rect: Rect, count: int) -> None:
+        bounds = self.bounds[i]
+        self.bounds[i] = rect if bounds is None else bounds.union(rect)
+        self.sizes[i] += count
+
+    def _get_intersecting_shards(self, loc: Location) -> List[int]:
+        intersects = get_loc_intersection_fn(loc)
+        return [i for i, rect in enumerate(self.bounds) if rect is not None and intersects(rect)]
+
+    def _fan_out(self, shards: Iterable[int], command: str, *args) -> List[Any]:
+        """Sends a command to each of the given shards, and then waits for all of their results (in order)."""
+        shards = list(shards)
+        for i in shards:
+            self._shards[i].send(command, *args)
+        return [self._shards[i].receive() for i in shards]
+
+
+def _handle(tree: RTreeBase, command: str, args: tuple) -> Any:
+    """Executes a command against the tree of a shard."""
+    if command == 'insert':
+        tree.insert(*args)
+    elif command == 'insert_many':
+        tree.insert_many(*args)
+    elif command == 'query':
+        return list(tree.query(*args))
+    elif command == 'count':
+        return tree.count(*args)
+    elif command == 'nearest':
+        loc, k = args
+        distance = get_loc_distance_fn(loc)
+        return [(distance(entry.rect), entry) for entry in tree.nearest(loc, k)]
+    elif command == 'stats':
+        return tree.stats()
+    else:
+        raise ValueError(f"Unknown command: {command}")
+    return None
+
+
+def _run_worker(conn, tree_cls: Type[RTreeBase], max_entries: int, min_entries: Optional[int]) -> None:
+    """Main loop of a worker process, which executes the commands received through a pipe against its tree."""
+    tree = tree_cls(max_entries=max_entries, min_entries=min_entries)
+    error: Optional[Exception] = None
+    while True:
+        command, args = conn.recv()
+        if command == 'close':
+            break
+        try:
+            result = _handle(tree, command, args)
+        except Exception as e:
+            result = None
+            error = error or e
+        if command in _NO_REPLY:
+            continue
+        conn.send(('error', error) if error is not None else ('ok', result))
+        error = None
+    conn.close()
+
+
+class _ProcessShard:
+    """Shard whose tree is owned by a worker process, which receives commands through a pipe."""
+
+    def __init__(self, tree_cls: Type[RTreeBase], max_entries: int, min_entries: Optional[int]):
+        self._conn, child_conn = multiprocessing.Pipe()
+        self._process = multiprocessing.Process(target=_run_worker, args=(child_conn, tree_cls, max_entries,
+                                                                          min_entries), daemon=True)
+        self._process.start()
+        child_conn.close()
+
+    def send(self, command: str, *args) -> None:
+        self._conn.send((command, args))
+
+    def receive(self) -> Any:
+        status, result = self._conn.recv()
+        if status == 'error':
+            raise result
+        return result
+
+    def close(self) -> None:
+        if self._conn.closed:
+            return
+        if self._process.is_alive():
+            self._conn.send(('close', ()))
+            self._process.join()
+        self._conn.close()
+
+
+class _LocalShard:
+    """Shard whose tree is kept in the current process (with the same interface as _ProcessShard)."""
+
+    def __init__(self, tree_cls: Type[RTreeBase], max_entries: int, min_entries: Optional[int]):
+        self.tree = tree_cls(max_entries=max_entries, min_entries=min_entries)
+        self._replies: List[Tuple[str, Any]] = []
+        self._error: Optional[Exception] = None
+
+    def send(self, command: str, *args) -> None:
+        try:
+            result = _handle(self.tree, command, args)
+        except Exception as e:
+            result = None
+            self._error = self._error or e
+        if command not in _NO_REPLY:
+            self._replies.append(('error', self._error) if self._error is not None else ('ok', result))
+            self._error = None
+
+    def receive(self) -> Any:
+        status, result = self._replies.pop(0)
+        if status == 'error':
+            raise result
+        return result
+
+    def close(self) -> None:
+        pass
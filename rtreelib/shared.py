@@ -0,0 +1,256 @@
+"""
+Module containing a read-only R-tree stored in shared memory (multiprocessing.shared_memory), so that multiple worker
+processes can query a single copy of the tree. Each process holding its own copy of a regular RTreeBase costs memory
+proportional to the size of the tree times the number of processes, and even a tree inherited from a forked parent
+ends up being copied page by page, since reference counting writes to every object that is touched by a query.
+
+The tree is published using the flat representation of the binary format (see the binary module): node leaf flags,
+node entry offsets, entry rectangles, entry references (child node indices or payload indices), and payload offsets,
+followed by the serialized payloads. Attaching to a published tree maps these sections as zero-copy views of the shared
+memory block, and queries run directly against them, only creating objects for the matching entries:
+
+    published = SharedRTree.publish(tree)
+    # In a worker process (the tree can also be passed to the worker directly, since it pickles as its name):
+    with SharedRTree(published.name) as t:
+        entries = list(t.query((2, 4)))
+    # Once the workers are done:
+    published.unlink()
+"""
+
+import heapq
+import itertools
+import math
+import pickle
+import sys
+import threading
+from multiprocessing import shared_memory, resource_tracker
+from typing import TypeVar, Generic, Callable, Iterator, List, Tuple, Optional
+from .rtree import RTreeBase, RTreeEntry
+from .binary import tree_to_arrays, encode_arrays, decode_arrays, TreeArrays
+from rtreelib.models import Rect, Point, Location, parse_loc
+
+T = TypeVar('T')
+
+# Held while resource_tracker.register is replaced (see _attach), so that blocks created by other threads meanwhile are
+# still registered
+_register_lock = threading.Lock()
+
+
+class SharedRTree(Generic[T]):
+    """
+    Read-only R-tree stored in a shared memory block (see SharedRTree.publish). Supports query, count, and nearest,
+    with the same Location semantics as RTreeBase. The entries returned by queries are created on demand (so modifying
+    them does not affect the shared tree).
+
+    Instances can be pickled (for example, to pass them to a multiprocessing pool), in which case they are attached
+    again by name when unpickled.
+    """
+
+    def __init__(self, name: str, loads: Callable[[bytes], T] = pickle.loads):
+        """
+        Attaches to a tree previously published using SharedRTree.publish (from this or another process).
+        :param name: Name of the shared memory block (see the name property of the published tree)
+        :param loads: Function used to deserialize the data of each leaf entry. Optional (defaults to pickle.loads).
+        """
+        self._init(_attach(name), loads, owner=False)
+
+    def _init(self, shm: shared_memory.SharedMemory, loads: Callable[[bytes], T], owner: bool) -> None:
+        self._shm = shm
+        self._owner = owner
+        self.loads = loads
+        try:
+            self._arrays: Optional[TreeArrays] = decode_arrays(shm.buf)
+        except Exception:
+            shm.close()
+            raise
+        self.max_entries = self._arrays.max_entries
+        self.min_entries = self._arrays.min_entries
+
+    @classmethod
+    def publish(cls, tree: RTreeBase[T], name: str = None, dumps: Callable[[T], bytes] = pickle.dumps,
+                loads: Callable[[bytes], T] = pickle.loads) -> 'SharedRTree[T]':
+        """
+        Publishes a snapshot of an R-tree into a new shared memory block. Later changes to the tree are not reflected in
+        the published snapshot. The returned instance owns the block: call unlink (or use it as a context manager) to
+        free the block once all processes are done with it.
+        :param tree: R-tree to publish
+        :param name: Name of the shared memory block. Optional (by default, a unique name is generated).
+        :param dumps: Function used to serialize the data of each leaf entry. Optional (defaults to pickle.dumps).
+        :param loads: Function used to deserialize the data of each leaf entry. Optional (defaults to pickle.loads).
+        :return: Published tree
+        """
+        data = encode_arrays(tree_to_arrays(tree, dumps))
+        with _register_lock:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=len(data))
+        shm.buf[:len(data)] = data
+        published = cls.__new__(cls)
+        published._init(shm, loads, owner=True)
+        return published
+
+    def __del__(self):
+        # Release the views of the shared memory block before the block itself is closed (which fails while views of it
+        # exist)
+        if getattr(self, '_arrays', None) is not None:
+            self.close()
+
+    def __reduce__(self):
+        return SharedRTree, (self.name, self.loads)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self._owner:
+            self.unlink()
+        else:
+            self.close()
+
+    @property
+    def name(self) -> str:
+        """Name of the shared memory block, which other processes use to attach to the tree."""
+        return self._shm.name
+
+    @property
+    def size(self) -> int:
+        """Size of the shared memory block (in bytes)."""
+        return self._shm.size
+
+    def close(self) -> None:
+        """Detaches from the shared memory block (without freeing it). The tree cannot be queried afterwards."""
+        arrays, self._arrays = self._arrays, None
+        if arrays is None:
+            return
+        for section in (arrays.node_leaf, arrays.node_entry_offsets, arrays.entry_rects, arrays.entry_refs,
+                        arrays.payload_offsets, arrays.payloads):
+            if isinstance(section, memoryview):
+                section.release()
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """
+        Detaches from the shared memory block and frees it. Processes that are already attached can keep using the tree
+        until they close it, but no new processes can attach to it.
+        """
+        self.close()
+        self._shm.unlink()
+
+    def query(self, loc: Location) -> Iterator[RTreeEntry[T]]:
+        """
+        Queries leaf entries for a location (either a point or a rectangle), returning an iterable.
+        :param loc: Location to query. This may either be a Point or a Rect, or a tuple/list of coordinates representing
+            either a point or a rectangle.
+        :return: Iterable of leaf entries that matched the location query.
+        """
+        for i in self._query(loc):
+            yield self._get_entry(i)
+
+    def count(self, loc: Location) -> int:
+        """
+        Returns the number of leaf entries that intersect a location (either a point or a rectangle), without
+        deserializing their data.
+        :param loc: Location to query. This may either be a Point or a Rect, or a tuple/list of coordinates representing
+            either a point or a rectangle.
+        :return: Number of leaf entries that matched the location query.
+        """
+        return sum(1 for _ in self._query(loc))
+
+    def nearest(self, loc: Location, k: int = 1) -> Iterator[RTreeEntry[T]]:
+        """
+        Finds the k leaf entries nearest to a location (either a point or a rectangle), using a best-first search (see
+        RTreeBase.nearest).
+        :param loc: Location to query. This may either be a Point or a Rect, or a tuple/list of coordinates representing
+            either a point or a rectangle.
+        :param k: Number of entries to return. Optional (defaults to 1). If None, all entries are returned (lazily), in
+            order of increasing distance.
+        :return: Iterable of up to k leaf entries, in order of increasing distance from the location.
+        """
+        arrays = self._get_arrays()
+        rects, refs, offsets, node_leaf = arrays.entry_rects, arrays.entry_refs, arrays.node_entry_offsets, \
+            arrays.node_leaf
+        min_x, min_y, max_x, max_y = _get_bounds(loc)
+        counter = itertools.count()
+        # Heap of (distance, tie-breaker, is_entry, index), where index is a leaf entry index or a node index
+        heap: List[Tuple[float, int, bool, int]] = [(0.0, next(counter), False, 0)]
+        found = 0
+        while heap and (k is None or found < k):
+            _, _, is_entry, i = heapq.heappop(heap)
+            if is_entry:
+                found += 1
+                yield self._get_entry(i)
+                continue
+            is_leaf = bool(node_leaf[i])
+            for j in range(offsets[i], offsets[i + 1]):
+                r = 4 * j
+                dx = max(min_x - rects[r + 2], rects[r] - max_x, 0)
+                dy = max(min_y - rects[r + 3], rects[r + 1] - max_y, 0)
+                heapq.heappush(heap, (math.hypot(dx, dy), next(counter), is_leaf, j if is_leaf else refs[j]))
+
+    def _query(self, loc: Location) -> Iterator[int]:
+        """Yields the indices of the leaf entries that intersect a location (in the same order as RTreeBase.query)."""
+        arrays = self._get_arrays()
+        rects, refs, offsets, node_leaf = arrays.entry_rects, arrays.entry_refs, arrays.node_entry_offsets, \
+            arrays.node_leaf
+        intersects = _get_intersection_fn(loc)
+        stack = [0]
+        while stack:
+            i = stack.pop()
+            matches = [j for j in range(offsets[i], offsets[i + 1])
+                       if intersects(rects[4 * j], rects[4 * j + 1], rects[4 * j + 2], rects[4 * j + 3])]
+            if node_leaf[i]:
+                yield from matches
+            else:
+                stack.extend(refs[j] for j in reversed(matches))
+
+    def _get_entry(self, i: int) -> RTreeEntry[T]:
+        arrays = self._get_arrays()
+        rects, payload_offsets = arrays.entry_rects, arrays.payload_offsets
+        ref = arrays.entry_refs[i]
+        data = self.loads(bytes(arrays.payloads[payload_offsets[ref]:payload_offsets[ref + 1]]))
+        return RTreeEntry(Rect(rects[4 * i], rects[4 * i + 1], rects[4 * i + 2], rects[4 * i + 3]), data=data)
+
+    def _get_arrays(self) -> TreeArrays:
+        if self._arrays is None:
+            raise RuntimeError("The shared R-tree has been closed")
+        return self._arrays
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """
+    Attaches to an existing shared memory block without registering it with the resource tracker. Only the publishing
+    process should unlink the block: a registered block is unlinked by the tracker once the processes using it exit,
+    and attaching processes may share the tracker of the publisher (for example, workers started using spawn or
+    forkserver), in which case unregistering the block would remove the publisher's own registration.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    # Before Python 3.13, SharedMemory always registers the block, so the registration is suppressed while attaching
+    with _register_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def _get_bounds(loc: Location) -> Tuple[float, float, float, float]:
+    loc = parse_loc(loc)
+    if isinstance(loc, Point):
+        return loc.x, loc.y, loc.x, loc.y
+    return loc.min_x, loc.min_y, loc.max_x, loc.max_y
+
+
+def _get_intersection_fn(loc: Location) -> Callable[[float, float, float, float], bool]:
+    """
+    Returns a function that tests whether a rectangle (given by its coordinates) intersects a location, with the same
+    semantics as get_loc_intersection_fn (points on the edge of a rectangle intersect it, while rectangles must overlap
+    by a non-zero area).
+    """
+    loc = parse_loc(loc)
+    if isinstance(loc, Point):
+        x, y = loc.x, loc.y
+        return lambda min_x, min_y, max_x, max_y: min_x <= x <= max_x and min_y <= y <= max_y
+    x1, x2 = min(loc.min_x, loc.max_x), max(loc.min_x, loc.max_x)
+    y1, y2 = min(loc.min_y, loc.max_y), max(loc.min_y, loc.max_y)
+    return lambda min_x, min_y, max_x, max_y: \
+        max(min_x, x1) < min(max_x, x2) and max(min_y, y1) < min(max_y, y2)
@@ -0,0 +1,195 @@
+"""
+Module containing utility functions for exporting R-trees to (and importing R-trees from) a SQLite database. This
+mirrors the pg module, but only requires the standard library (and no database server).
+
+The R-tree is stored in the rtree, rtree_node, and rtree_entry tables, which have the same layout as the tables used by
+the pg module, except that bounding boxes are stored as plain numeric columns (min_x, min_y, max_x, max_y) rather than
+as geometries. This allows SQLite's own R*Tree module to be used for querying the exported entries (see the
+spatial_index parameter of create_rtree_tables).
+
+The functions in this module accept either a sqlite3 connection, or keyword arguments that can be used to establish a
+connection (which are passed to sqlite3.connect, for example database='rtree.db').
+"""
+
+import sqlite3
+from typing import Union, Type, Callable, Any, Dict, Iterable, List, Tuple
+from .rtree import RTreeBase, RTreeNode, RTreeEntry, DEFAULT_MAX_ENTRIES
+from .db import TreeBuilder, get_sql_from_template, get_datatype, count_rows, assign_ids, coords
+
+
+def create_rtree_tables(conn: sqlite3.Connection = None, schema: str = 'main', datatype: Union[Type, str] = None,
+                        page_size: int = 4096, wal: bool = True, spatial_index: bool = False, **kwargs):
+    """
+    Creates the necessary tables/indexes for storing R-tree data. This must be called prior to exporting an R-tree.
+    :param conn: sqlite3 connection (Optional).
+    :param schema: Database schema, that is, the name of the (attached) database (Optional, defaults to "main").
+    :param datatype: Data type of the R-tree leaf entries. This can either be a string, in which case it will be used as
+        the column type, or a Python type (see pg.create_rtree_tables). By default, the data column has no declared
+        type, so values are stored as is (without any type conversion).
+    :param page_size: Page size of the database, in bytes (Optional, defaults to 4096). This must be a power of two
+        between 512 and 65536, and only takes effect if the database is still empty.
+    :param wal: If True, the database is switched to write-ahead logging (WAL) mode, which allows readers to continue
+        reading while an R-tree is being exported. Optional (defaults to True).
+    :param spatial_index: If True, also creates the rtree_entry_index table (an R*Tree virtual table), which can be
+        populated with the leaf entries of an exported R-tree (see export_to_sqlite). Optional (defaults to False).
+    :param kwargs: Keyword arguments for establishing a database connection. These arguments will be passed to the
+        sqlite3.connect function. (Optional)
+    """
+    conn, close = _get_conn(conn, **kwargs)
+    try:
+        conn.execute(f'PRAGMA {schema}.page_size = {int(page_size)}')
+        if wal:
+            conn.execute(f'PRAGMA {schema}.journal_mode = WAL')
+        datatype = get_datatype(datatype) if datatype is not None else ''
+        sql = get_sql_from_template('sqlite_create_rtree_tables', schema=schema, datatype=datatype)
+        if spatial_index:
+            sql += get_sql_from_template('sqlite_create_rtree_spatial_index', schema=schema)
+        conn.executescript(sql)
+        conn.commit()
+    finally:
+        if close:
+            conn.close()
+
+
+def drop_rtree_tables(conn: sqlite3.Connection = None, schema: str = 'main', **kwargs):
+    """
+    Drops all R-tree tables created by create_rtree_tables.
+    :param conn: sqlite3 connection (Optional).
+    :param schema: Database schema (Optional, defaults to "main").
+    :param kwargs: Keyword arguments for establishing a database connection. These arguments will be passed to the
+        sqlite3.connect function. (Optional)
+    """
+    conn, close = _get_conn(conn, **kwargs)
+    try:
+        conn.executescript(get_sql_from_template('sqlite_drop_rtree_tables', schema=schema))
+        conn.commit()
+    finally:
+        if close:
+            conn.close()
+
+
+def export_to_sqlite(rtree: RTreeBase, conn: sqlite3.Connection = None, schema: str = 'main',
+                     spatial_index: bool = False, **kwargs) -> int:
+    """
+    Exports the R-tree to SQLite, populating the rtree, rtree_node, and rtree_entry tables created by the
+    create_rtree_tables function (which must be called first). This function returns the ID of the newly-created
+    R-tree in the rtree table (note that multiple R-trees can be exported; they are differentiated by the ID).
+
+    The whole export runs in a single (immediate) transaction. IDs are assigned on the client, and the nodes and
+    entries are inserted one level at a time using executemany. If anything fails, the transaction is rolled back.
+
+    :param rtree: R-tree to export
+    :param conn: sqlite3 connection (Optional).
+    :param schema: Database schema (Optional, defaults to "main").
+    :param spatial_index: If True, the leaf entries of the tree are also added to the rtree_entry_index table (which
+        must have been created by passing spatial_index=True to create_rtree_tables). Optional (defaults to False).
+    :param kwargs: Keyword arguments for establishing a database connection. These arguments will be passed to the
+        sqlite3.connect function. (Optional)
+    :return: ID of the newly-created R-tree in the rtree table
+    """
+    conn, close = _get_conn(conn, **kwargs)
+    try:
+        cursor = conn.cursor()
+        if not conn.in_transaction:
+            cursor.execute('BEGIN IMMEDIATE')
+        try:
+            rtree_id = _insert_rtree_rows(cursor, schema, rtree)
+            if spatial_index:
+                cursor.execute(get_sql_from_template('sqlite_populate_rtree_spatial_index', schema=schema),
+                               {"rtree_id": rtree_id})
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return rtree_id
+    finally:
+        if close:
+            conn.close()
+
+
+def import_from_sqlite(rtree_id: int, conn: sqlite3.Connection = None, schema: str = 'main',
+                       tree_cls: Type[RTreeBase] = None, max_entries: int = DEFAULT_MAX_ENTRIES,
+                       min_entries: int = None, adapter: Callable[[Any], Any] = None, **kwargs) -> RTreeBase:
+    """
+    Loads an R-tree that was previously exported using export_to_sqlite. The tree is rebuilt node by node (without
+    invoking the insert strategy), so it has exactly the same structure as the tree that was exported.
+    :param rtree_id: ID of the R-tree in the rtree table (as returned by export_to_sqlite)
+    :param conn: sqlite3 connection (Optional).
+    :param schema: Database schema (Optional, defaults to "main").
+    :param tree_cls: R-tree class to instantiate (Optional, defaults to RTree).
+    :param max_entries: Maximum number of entries per node of the tree (Optional, defaults to 8). Since this is not
+        stored in the database, this should be the same value that was used by the tree that was exported.
+    :param min_entries: Minimum number of entries per node of the tree (Optional, defaults to half of max_entries).
+    :param adapter: Function used to convert the value of the data column of each leaf entry to the data stored in the
+        tree (Optional, by default the value returned by sqlite3 is used as is).
+    :param kwargs: Keyword arguments for establishing a database connection. These arguments will be passed to the
+        sqlite3.connect function. (Optional)
+    :return: R-tree having the same structure as the tree that was exported
+    """
+    if tree_cls is None:
+        from .strategies import RTreeGuttman
+        tree_cls = RTreeGuttman
+    conn, close = _get_conn(conn, **kwargs)
+    try:
+        builder = TreeBuilder(tree_cls(max_entries=max_entries, min_entries=min_entries), adapter)
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        params = {"rtree_id": rtree_id}
+        for row in cursor.execute(get_sql_from_template('sqlite_select_rtree_nodes', schema=schema), params):
+            builder.add_node(row)
+        if builder.root is None:
+            raise ValueError(f"R-tree with ID {rtree_id} was not found in {schema}.rtree_node")
+        for row in cursor.execute(get_sql_from_template('sqlite_select_rtree_entries', schema=schema), params):
+            builder.add_entry(row)
+        return builder.finish()
+    finally:
+        if close:
+            conn.close()
+
+
+def _get_conn(conn: sqlite3.Connection = None, **kwargs) -> Tuple[sqlite3.Connection, bool]:
+    """Returns the connection to use, along with whether it was opened here (and should therefore be closed)."""
+    if conn is not None:
+        return conn, False
+    if not kwargs:
+        raise RuntimeError("Exporting R-tree to SQLite requires either passing a connection object or providing "
+                           "keyword arguments that can be used to initalize a connection (such as database). Please "
+                           "check the documentation for details.")
+    return sqlite3.connect(**kwargs), True
+
+
+def _insert_rtree_rows(cursor: sqlite3.Cursor, schema: str, rtree: RTreeBase) -> int:
+    cursor.execute(get_sql_from_template('sqlite_insert_rtree', schema=schema), {
+        "obj_id": id(rtree),
+        "hex_id": hex(id(rtree))
+    })
+    rtree_id = cursor.lastrowid
+    # The transaction holds the write lock, so IDs following the current maximum IDs can be assigned on the client
+    levels = rtree.get_levels()
+    node_count, entry_count = count_rows(levels)
+    cursor.execute(get_sql_from_template('sqlite_max_rtree_ids', schema=schema))
+    last_node_id, last_entry_id = cursor.fetchone()
+    node_ids, entry_ids = assign_ids(levels, range(last_node_id + 1, last_node_id + node_count + 1),
+                                     range(last_entry_id + 1, last_entry_id + entry_count + 1))
+    insert_node = get_sql_from_template('sqlite_insert_rtree_node', schema=schema)
+    insert_entry = get_sql_from_template('sqlite_insert_rtree_entry', schema=schema)
+    for level, nodes in enumerate(levels):
+        cursor.executemany(insert_node, _node_rows(nodes, level, rtree_id, node_ids, entry_ids))
+        cursor.executemany(insert_entry, _entry_rows(nodes, node_ids, entry_ids))
+    return rtree_id
+
+
+def _node_rows(nodes: List[RTreeNode], level: int, rtree_id: int, node_ids: Dict[RTreeNode, int],
+               entry_ids: Dict[RTreeEntry, int]) -> Iterable[Tuple]:
+    for node in nodes:
+        parent_entry = node.parent_entry
+        yield (node_ids[node], id(node), hex(id(node)), rtree_id, level, *coords(node.get_bounding_rect()),
+               entry_ids[parent_entry] if parent_entry is not None else None, node.is_leaf)
+
+
+def _entry_rows(nodes: List[RTreeNode], node_ids: Dict[RTreeNode, int],
+                entry_ids: Dict[RTreeEntry, int]) -> Iterable[Tuple]:
+    for node in nodes:
+        for entry in node.entries:
+            yield (entry_ids[entry], id(entry), hex(id(entry)), node_ids[node], *coords(entry.rect), entry.is_leaf,
+                   entry.data)
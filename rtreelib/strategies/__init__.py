@@ -1,3 +1,4 @@
 from .guttman import RTreeGuttman
 from .rstar import RStarTree
 from .base import insert, adjust_tree_strategy, least_area_enlargement
+from .bulk import str_pack
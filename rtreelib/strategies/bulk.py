@@ -0,0 +1,76 @@
+"""
+This module contains functions for bulk loading (packing) an R-tree from a known set of entries, rather than inserting
+the entries one at a time. Packing is much faster than repeated insertion, and produces a tree with fully-utilized
+nodes and little overlap between them.
+"""
+
+import math
+from array import array
+from typing import TypeVar, List, Sequence
+from ..rtree import RTreeBase, RTreeEntry, RTreeNode
+from rtreelib.models import Rect
+
+T = TypeVar('T')
+
+
+def str_pack(tree: RTreeBase[T], coords: Sequence[float], data: Sequence[T]) -> RTreeBase[T]:
+    """
+    Replaces the contents of the tree with the given entries, using the Sort-Tile-Recursive (STR) packing algorithm
+    (Leutenegger et al., 1997). The entries are sorted by the x coordinate of their centers and divided into vertical
+    slices, and each slice is sorted by the y coordinate and divided into nodes. The nodes of each level are then packed
+    in the same way, until a single (root) node remains. The entries are divided as evenly as possible, so that every
+    node is at least half full.
+    :param tree: R-tree instance (any existing entries are discarded)
+    :param coords: Bounding rectangles of the entries, as a flat sequence of 4 values per entry (min_x, min_y, max_x,
+        max_y). An array('d') is the most compact way of collecting these.
+    :param data: Data of each entry
+    :return: The tree that was passed in
+    """
+    count = len(data)
+    if len(coords) != 4 * count:
+        raise ValueError(f"Expected {4 * count} coordinates for {count} entries, but got {len(coords)}")
+    tree.root = RTreeNode(tree, True)
+    tree._cache = None
+    if count == 0:
+        return tree
+    rects = [Rect(*coords[i:i + 4]) for i in range(0, len(coords), 4)]
+    nodes = [RTreeNode(tree, True, entries=[RTreeEntry(rects[i], data=data[i]) for i in group])
+             for group in _tile(rects, tree.max_entries)]
+    while len(nodes) > 1:
+        rects = [node.get_bounding_rect() for node in nodes]
+        parents = []
+        for group in _tile(rects, tree.max_entries):
+            parent = RTreeNode(tree, False, entries=[RTreeEntry(rects[i], child=nodes[i]) for i in group])
+            for i in group:
+                nodes[i].parent = parent
+            parents.append(parent)
+        nodes = parents
+    tree.root = nodes[0]
+    return tree
+
+
+def _tile(rects: List[Rect], max_entries: int) -> List[List[int]]:
+    """Divides the given rectangles into groups of at most max_entries (returning the indices of each group)."""
+    count = len(rects)
+    node_count = math.ceil(count / max_entries)
+    slice_count = math.ceil(math.sqrt(node_count))
+    # Spread the rectangles evenly over the nodes (rather than filling every node but the last one), so that no node
+    # ends up with fewer than half of max_entries
+    base, extra = divmod(count, node_count)
+    sizes = [base + 1] * extra + [base] * (node_count - extra)
+    center_x = array('d', (r.min_x + r.max_x for r in rects))
+    center_y = array('d', (r.min_y + r.max_y for r in rects))
+    order = sorted(range(count), key=center_x.__getitem__)
+    groups = []
+    start = 0
+    nodes_per_slice = math.ceil(node_count / slice_count)
+    for i in range(0, node_count, nodes_per_slice):
+        slice_sizes = sizes[i:i + nodes_per_slice]
+        end = start + sum(slice_sizes)
+        tile = sorted(order[start:end], key=center_y.__getitem__)
+        offset = 0
+        for size in slice_sizes:
+            groups.append(tile[offset:offset + size])
+            offset += size
+        start = end
+    return groups
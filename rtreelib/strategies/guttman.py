@@ -22,11 +22,19 @@ def guttman_choose_leaf(tree: RTreeBase[T], entry: RTreeEntry[T]) -> RTreeNode[T
     """
     node = tree.root
     while not node.is_leaf:
-        e: RTreeEntry = least_area_enlargement(node.entries, entry.rect)
-        node = e.child
+        node = guttman_choose_subtree(tree, node, entry)
     return node
 
 
+def guttman_choose_subtree(tree: RTreeBase[T], node: RTreeNode[T], entry: RTreeEntry[T]) -> RTreeNode[T]:
+    """
+    Select the child of a non-leaf node in which to place a new index entry (a single step of guttman_choose_leaf),
+    which is the child that requires least enlargement of its bounding box.
+    """
+    e: RTreeEntry = least_area_enlargement(node.entries, entry.rect)
+    return e.child
+
+
 def quadratic_split(tree: RTreeBase[T], node: RTreeNode[T]) -> RTreeNode[T]:
     """
     Split an overflowing node. This algorithm attempts to find a small-area split, but is not guaranteed to
@@ -136,6 +144,7 @@ class RTreeGuttman(RTreeBase[T]):
             min_entries=min_entries,
             insert=insert,
             choose_leaf=guttman_choose_leaf,
+            choose_subtree=guttman_choose_subtree,
             adjust_tree=adjust_tree_strategy,
             overflow_strategy=quadratic_split
         )
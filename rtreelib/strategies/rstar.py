@@ -102,6 +102,8 @@ def reinsert(tree: RTreeBase[T], node: RTreeNode[T], levels_from_leaf: int):
     # fit the remaining entries.
     node.entries = [e for e in node.entries if e not in entries_to_reinsert]
     node.parent_entry.rect = union_all([entry.rect for entry in node.entries])
+    if tree.observer is not None:
+        tree.observer.on_reinsert(tree, node, entries_to_reinsert)
 
     # Reinsert the entries at the same level in the tree.
     for e in entries_to_reinsert:
@@ -161,14 +163,27 @@ def rstar_choose_leaf(tree: RTreeBase[T], entry: RTreeEntry[T]) -> RTreeNode[T]:
     """
     node = tree.root
     while not node.is_leaf:
-        if _are_children_leaves(node):
-            e = least_overlap_enlargement(node.entries, entry.rect)
-        else:
-            e = least_area_enlargement(node.entries, entry.rect)
-        node = e.child
+        node = rstar_choose_subtree(tree, node, entry)
     return node
 
 
+def rstar_choose_subtree(tree: RTreeBase[T], node: RTreeNode[T], entry: RTreeEntry[T]) -> RTreeNode[T]:
+    """
+    Strategy used for choosing the child of a non-leaf node in which to place a new entry (a single step of
+    rstar_choose_leaf). If the children are leaf nodes, the child requiring minimum overlap enlargement is chosen;
+    otherwise, the child requiring least area enlargement is chosen.
+    :param tree: R-Tree instance
+    :param node: Non-leaf node
+    :param entry: Entry being inserted
+    :return: Child node where the entry should be inserted
+    """
+    if _are_children_leaves(node):
+        e = least_overlap_enlargement(node.entries, entry.rect)
+    else:
+        e = least_area_enlargement(node.entries, entry.rect)
+    return e.child
+
+
 def _are_children_leaves(node: RTreeNode[T]) -> bool:
     for entry in node.entries:
         if entry.child is not None:
@@ -333,6 +348,7 @@ class RStarTree(RTreeBase[T]):
             min_entries=min_entries,
             insert=rstar_insert,
             choose_leaf=rstar_choose_leaf,
+            choose_subtree=rstar_choose_subtree,
             adjust_tree=rstar_adjust_tree,
             overflow_strategy=rstar_overflow
         )
@@ -0,0 +1,120 @@
+"""
+Module containing functions for exporting R-tree plots to SVG. Unlike the diagram module, this module has no third-party
+dependencies, and the SVG file is written while traversing the tree (rather than building the whole document in
+memory), so it can be used to plot very large trees.
+
+The plot uses the same color scheme as diagram.plot_rtree: each node's bounding rectangle is drawn as a tan rectangle
+with dashed edges, and each leaf entry's bounding rectangle is drawn in blue. The rectangles of each level are written
+to a separate group (with a class of "level-<n>", where level 0 is the root level, or "leaf-entries" for the leaf
+entries), so that they can be styled (or hidden) per level.
+"""
+
+from typing import Iterable, Iterator, List, Tuple, TextIO
+from xml.sax.saxutils import escape
+from .rtree import RTreeBase, RTreeNode
+from rtreelib.models import Rect
+
+_LEAF_COLOR = (0.24, 0.52, 0.78)
+_NODE_COLOR = (0.82, 0.71, 0.55)
+_MAX_STROKE_WIDTH = 4
+
+
+def export_svg(tree: RTreeBase, path: str, levels: Iterable[int] = None, leaf_entries: bool = True,
+               width: int = 800, title: str = None) -> None:
+    """
+    Writes a cartesian plot of the R-tree nodes and entries to an SVG file. The file is written in a streaming fashion
+    while traversing the tree, using memory proportional to the height of the tree rather than its size. Each level is
+    written in a separate pass over the tree (only descending as deep as the level being written), from the leaf entries
+    up to the root, so that the rectangles of each level end up in their own group.
+    :param tree: R-tree to plot
+    :param path: Path of the SVG file to write
+    :param levels: Optional levels of nodes to include (with level 0 corresponding to the root). If not provided, the
+        nodes at all levels are included.
+    :param leaf_entries: Whether to include the leaf entries. Defaults to True.
+    :param width: Width of the image (in pixels). The height is derived from the aspect ratio of the tree's bounding
+        rectangle. Defaults to 800.
+    :param title: Optional title of the image
+    """
+    if width <= 0:
+        raise ValueError(f"Width must be positive (got {width})")
+    height = tree.get_height()
+    levels = range(height) if levels is None else sorted({level for level in levels if 0 <= level < height})
+    bounds = _get_bounds(tree)
+    with open(path, 'w', encoding='utf-8') as f:
+        _write_header(f, bounds, width, height, title)
+        if leaf_entries:
+            f.write('<g class="leaf-entries">\n')
+            for node in _get_nodes_at_level(tree, height - 1):
+                for entry in node.entries:
+                    _write_rect(f, entry.rect)
+            f.write('</g>\n')
+        for level in reversed(levels):
+            f.write(f'<g class="level-{level}">\n')
+            for node in _get_nodes_at_level(tree, level):
+                if node.entries:
+                    _write_rect(f, node.get_bounding_rect())
+            f.write('</g>\n')
+        f.write('</svg>\n')
+
+
+def _get_bounds(tree: RTreeBase) -> Rect:
+    """
+    Returns the region covered by the plot: the bounding rectangle of the tree, padded by 2% on each side (so that the
+    edges of the outermost rectangles are not clipped).
+    """
+    if not tree.root.entries:
+        return Rect(0, 0, 1, 1)
+    rect = tree.root.get_bounding_rect()
+    pad = 0.02 * max(rect.width, rect.height) or 1
+    return Rect(rect.min_x - pad, rect.min_y - pad, rect.max_x + pad, rect.max_y + pad)
+
+
+def _get_nodes_at_level(tree: RTreeBase, level: int) -> Iterator[RTreeNode]:
+    """
+    Iterates the nodes at the given level of the tree in depth-first order. An explicit stack of iterators is used
+    (rather than recursion or a level-order queue), so only one iterator per level is held at a time.
+    """
+    stack: List[Tuple[int, Iterator[RTreeNode]]] = [(0, iter([tree.root]))]
+    while stack:
+        depth, nodes = stack[-1]
+        node = next(nodes, None)
+        if node is None:
+            stack.pop()
+        elif depth == level:
+            yield node
+        elif not node.is_leaf:
+            stack.append((depth + 1, (entry.child for entry in node.entries)))
+
+
+def _write_header(f: TextIO, bounds: Rect, width: int, height: int, title: str = None) -> None:
+    image_height = max(1, round(width * bounds.height / bounds.width))
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{image_height}" '
+            f'viewBox="{_num(bounds.min_x)} {_num(-bounds.max_y)} {_num(bounds.width)} {_num(bounds.height)}">\n')
+    if title is not None:
+        f.write(f'<title>{escape(title)}</title>\n')
+    f.write('<style>\n')
+    f.write('rect { vector-effect: non-scaling-stroke; }\n')
+    f.write(f'.leaf-entries {{ fill: {_rgb(_LEAF_COLOR)}; fill-opacity: 0.5; stroke: {_rgb(_LEAF_COLOR)}; '
+            f'stroke-width: 1; }}\n')
+    for level in range(height):
+        # Nodes closer to the root are drawn with thicker edges, so that the structure of the tree remains visible
+        stroke_width = min(1 + 0.75 * (height - 1 - level), _MAX_STROKE_WIDTH)
+        f.write(f'.level-{level} {{ fill: {_rgb(_NODE_COLOR)}; fill-opacity: 0.25; stroke: {_rgb(_NODE_COLOR)}; '
+                f'stroke-opacity: 0.5; stroke-width: {_num(stroke_width)}; stroke-dasharray: 6 3; }}\n')
+    f.write('</style>\n')
+
+
+def _write_rect(f: TextIO, rect: Rect) -> None:
+    # SVG coordinates increase downwards, so the y coordinates are negated (and the view box starts at -max_y)
+    f.write(f'<rect x="{_num(rect.min_x)}" y="{_num(-rect.max_y)}" width="{_num(rect.width)}" '
+            f'height="{_num(rect.height)}"/>\n')
+
+
+def _num(value: float) -> str:
+    return f'{value:.10g}'
+
+
+def _rgb(color: Tuple[float, float, float]) -> str:
+    r, g, b = (round(255 * c) for c in color)
+    return f'rgb({r},{g},{b})'
@@ -0,0 +1,3 @@
+#!/usr/bin/env bash
+# Assumes working directory is root of the project
+python -m benchmarks "$@"
@@ -2,3 +2,18 @@ from .test_rect import TestRect
 from .test_common import TestCommon
 from .test_guttman import TestGuttman
 from .test_rstar import TestRStar
+from .test_binary import TestBinary
+from .test_disk import TestDisk, TestBufferPool
+from .test_pg import TestPostGIS
+from .test_pg_async import TestPostGISAsync
+from .test_sqlite import TestSQLite
+from .test_bulk import TestBulk
+from .test_diagram import TestDiagram
+from .test_svg import TestSVG
+from .test_benchmarks import TestBenchmarks
+from .test_observer import TestObserver
+from .test_oplog import TestOpLog
+from .test_memory import TestMemory
+from .test_sharded import TestSharded
+from .test_shared import TestShared
+from .test_concurrency import TestConcurrency
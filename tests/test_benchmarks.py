@@ -0,0 +1,133 @@
+import json
+import os
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+from unittest import TestCase
+from unittest.mock import patch
+from benchmarks.__main__ import main
+from benchmarks.datasets import DATASETS
+from benchmarks.suite import BENCHMARKS, STRATEGIES, UPDATE_ROUNDS, Case, measure, bench_update, _trees
+from rtreelib import RTreeBase
+
+
+class TestBenchmarks(TestCase):
+    """Tests for the benchmark suite (run on tiny datasets, to ensure the suite itself works)"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for name in os.listdir(self.dir):
+            os.remove(os.path.join(self.dir, name))
+        os.rmdir(self.dir)
+
+    def run_suite(self, *args: str) -> str:
+        out = StringIO()
+        with redirect_stdout(out):
+            self.assertEqual(0, main(['--size', '60', '--repeat', '2', '--max-entries', '4', *args]))
+        return out.getvalue()
+
+    def test_results_json(self):
+        """Ensure a result is written for every combination of benchmark, strategy, and dataset."""
+        # Arrange
+        path = os.path.join(self.dir, 'results.json')
+
+        # Act
+        self.run_suite('--datasets', 'uniform', 'clustered', '--output', path)
+
+        # Assert
+        with open(path, 'r', encoding='utf-8') as f:
+            output = json.load(f)
+        self.assertEqual(60, output['meta']['size'])
+        self.assertEqual(len(BENCHMARKS) * len(STRATEGIES) * 2, len(output['results']))
+        self.assertEqual(len(STRATEGIES) * 2, len(output['quality']))
+        self.assertTrue(all(q['stats']['leaf_entry_count'] == 60 for q in output['quality']))
+        for result in output['results']:
+            self.assertEqual(2, len(result['times']))
+            self.assertLessEqual(result['min'], result['median'])
+            self.assertGreater(result['ops'], 0)
+
+    def test_csv_dataset(self):
+        """Ensure a dataset can be loaded from a CSV file in the format of normal.csv."""
+        # Arrange
+        csv_path = os.path.join(self.dir, 'points.csv')
+        with open(csv_path, 'w', encoding='utf-8') as f:
+            f.write('id,category,x,y\n')
+            for i in range(100):
+                f.write(f'{i},a,{126 + i / 100},{37 + (i * 7 % 100) / 100}\n')
+        path = os.path.join(self.dir, 'results.json')
+
+        # Act
+        self.run_suite('--datasets', 'normal', '--csv', csv_path, '--strategies', 'guttman', '--output', path)
+
+        # Assert
+        with open(path, 'r', encoding='utf-8') as f:
+            results = json.load(f)['results']
+        self.assertEqual({'normal', 'points.csv'}, {result['dataset'] for result in results})
+        self.assertEqual({60}, {result['size'] for result in results})
+
+    def test_compare(self):
+        """Ensure the results can be compared against a previous run."""
+        # Arrange
+        path = os.path.join(self.dir, 'baseline.json')
+        self.run_suite('--datasets', 'normal', '--benchmarks', 'insert', 'full_scan', '--output', path)
+
+        # Act
+        out = self.run_suite('--datasets', 'normal', '--benchmarks', 'full_scan', '--compare', path)
+
+        # Assert
+        lines = out.split('Comparing against')[1].strip().splitlines()
+        self.assertEqual(2 + len(STRATEGIES), len(lines))
+        self.assertTrue(all(line.startswith('full_scan') for line in lines[2:]))
+
+    def test_insert_many(self):
+        """Ensure the batch insert benchmark inserts every rectangle of the dataset."""
+        for strategy in STRATEGIES:
+            # Act
+            result = measure('insert_many', Case(strategy, 'uniform', 4, DATASETS['uniform'](60)), 2)
+
+            # Assert
+            self.assertEqual(60, result['ops'])
+            self.assertEqual(2, len(result['times']))
+
+    def test_update(self):
+        """
+        Ensure the update benchmark moves every entry once per round (on a copy of the tree used by the other
+        benchmarks), and restores the rectangles before each run.
+        """
+        # Arrange
+        case = Case('rstar', 'clustered', 4, DATASETS['clustered'](60))
+        tree = _trees.get(case)
+        run = bench_update(case)
+        run.setup()
+        update = RTreeBase.update
+
+        # Act
+        with patch.object(RTreeBase, 'update', autospec=True, side_effect=update) as mock:
+            run.fn()
+        run.setup()
+        result = measure('update', case, 2)
+
+        # Assert
+        moved_trees = {call.args[0] for call in mock.call_args_list}
+        self.assertEqual(UPDATE_ROUNDS * 60, mock.call_count)
+        self.assertEqual(UPDATE_ROUNDS * 60, result['ops'])
+        self.assertEqual(1, len(moved_trees))
+        moved_tree = moved_trees.pop()
+        self.assertIsNot(tree, moved_tree)
+        for t in [tree, moved_tree]:
+            self.assertEqual(list(enumerate(case.rects)), sorted((e.data, e.rect) for e in t.get_leaf_entries()))
+
+    def test_export(self):
+        """Ensure the export benchmarks export the whole tree (repeatedly, in the case of SQLite)."""
+        # Arrange
+        case = Case('guttman', 'normal', 4, DATASETS['normal'](60))
+
+        # Act
+        results = [measure(name, case, 3) for name in ['export_sqlite', 'export_binary']]
+
+        # Assert
+        for result in results:
+            self.assertEqual(60, result['ops'])
+            self.assertEqual(3, len(result['times']))
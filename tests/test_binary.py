@@ -0,0 +1,85 @@
+import os
+import json
+import random
+import tempfile
+from unittest import TestCase
+from rtreelib import Rect, RTree, RStarTree, RTreeBase
+from rtreelib.binary import dumps_tree, loads_tree
+from tests.util import create_complex_tree, assert_valid_tree, assert_same_structure
+
+
+class TestBinary(TestCase):
+    """Tests for saving and loading R-trees using the binary format"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.rtree')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_save_load(self):
+        """Ensure a saved tree is loaded back with exactly the same structure."""
+        # Arrange
+        t = create_complex_tree(self)
+
+        # Act
+        t.save(self.path)
+        loaded = RTree.load(self.path)
+
+        # Assert
+        self.assertIsInstance(loaded, RTree)
+        self.assertEqual(t.max_entries, loaded.max_entries)
+        self.assertEqual(t.min_entries, loaded.min_entries)
+        self.assertTrue(loaded.root.is_root)
+        assert_same_structure(self, t.root, loaded.root)
+        self.assertCountEqual(['c', 'h'], [e.data for e in loaded.query(Rect(5, 2, 8, 4))])
+
+    def test_load_uses_saved_tree_class(self):
+        """When loading using RTreeBase.load, the class of the saved tree should be used."""
+        # Arrange
+        rnd = random.Random(0)
+        t = RStarTree(max_entries=4)
+        for i in range(50):
+            x, y = rnd.uniform(0, 100), rnd.uniform(0, 100)
+            t.insert(i, Rect(x, y, x + 1, y + 1))
+
+        # Act
+        t.save(self.path)
+        loaded = RTreeBase.load(self.path)
+
+        # Assert
+        self.assertIsInstance(loaded, RStarTree)
+        assert_same_structure(self, t.root, loaded.root)
+        assert_valid_tree(self, loaded)
+        # Ensure the loaded tree remains fully functional
+        loaded.insert('new', Rect(50, 50, 51, 51))
+        assert_valid_tree(self, loaded)
+
+    def test_save_load_custom_serializer(self):
+        """Ensure custom functions can be used for serializing the leaf entry data."""
+        # Arrange
+        t = RTree()
+        t.insert({'id': 1}, Rect(0, 0, 1, 1))
+        t.insert({'id': 2}, Rect(1, 1, 2, 2))
+
+        # Act
+        t.save(self.path, dumps=lambda d: json.dumps(d).encode('utf-8'))
+        loaded = RTree.load(self.path, loads=lambda b: json.loads(b.decode('utf-8')))
+
+        # Assert
+        self.assertCountEqual([{'id': 1}, {'id': 2}], [e.data for e in loaded.get_leaf_entries()])
+
+    def test_empty_tree(self):
+        """Ensure an empty tree can be serialized and deserialized."""
+        # Act
+        loaded = loads_tree(dumps_tree(RTree()))
+
+        # Assert
+        self.assertTrue(loaded.root.is_leaf)
+        self.assertEqual([], loaded.root.entries)
+
+    def test_invalid_header(self):
+        """Loading data that is not in the expected format should raise an error."""
+        with self.assertRaises(ValueError):
+            loads_tree(b'NOPE' + bytes(64))
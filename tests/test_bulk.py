@@ -0,0 +1,99 @@
+import random
+from array import array
+from unittest import TestCase
+from rtreelib import RTree, RStarTree, Rect, str_pack
+from tests.util import assert_valid_tree
+
+
+class TestBulk(TestCase):
+    """Tests for bulk loading R-trees"""
+
+    def test_str_pack_empty(self):
+        """Ensure packing no entries results in an empty tree."""
+        # Arrange
+        t = RTree()
+        t.insert('a', Rect(0, 0, 1, 1))
+
+        # Act
+        str_pack(t, array('d'), [])
+
+        # Assert
+        self.assertTrue(t.root.is_leaf)
+        self.assertEqual([], t.root.entries)
+
+    def test_str_pack_single_node(self):
+        """Ensure a tree with no more than max_entries entries is packed into a single leaf node."""
+        # Arrange
+        t = RTree(max_entries=4)
+
+        # Act
+        str_pack(t, array('d', [0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 5, 5]), ['a', 'b', 'c'])
+
+        # Assert
+        self.assertTrue(t.root.is_leaf)
+        self.assertEqual([('a', Rect(0, 0, 1, 1)), ('b', Rect(2, 2, 3, 3)), ('c', Rect(4, 4, 5, 5))],
+                         [(e.data, e.rect) for e in t.root.entries])
+
+    def test_str_pack_valid_tree(self):
+        """
+        Ensure packing results in a valid tree containing every entry (with every node at least half full), for a
+        range of sizes, and that queries return the same entries as a tree built by repeated insertion.
+        """
+        rnd = random.Random(17)
+        for count in [5, 9, 17, 63, 64, 65, 500, 2001]:
+            for max_entries in [4, 7, 16]:
+                # Arrange
+                rects = []
+                for _ in range(count):
+                    x, y = rnd.uniform(0, 1000), rnd.uniform(0, 1000)
+                    rects.append(Rect(x, y, x + rnd.uniform(0, 20), y + rnd.uniform(0, 20)))
+                coords = array('d', (c for r in rects for c in (r.min_x, r.min_y, r.max_x, r.max_y)))
+                reference = RTree(max_entries=max_entries)
+                for i, rect in enumerate(rects):
+                    reference.insert(i, rect)
+
+                # Act
+                t = str_pack(RStarTree(max_entries=max_entries), coords, list(range(count)))
+
+                # Assert
+                assert_valid_tree(self, t)
+                self.assertCountEqual(range(count), [e.data for e in t.get_leaf_entries()])
+                for _ in range(20):
+                    x, y = rnd.uniform(0, 1000), rnd.uniform(0, 1000)
+                    loc = Rect(x, y, x + 50, y + 50)
+                    self.assertCountEqual([e.data for e in reference.query(loc)], [e.data for e in t.query(loc)])
+
+    def test_str_pack_full_nodes(self):
+        """Ensure packing produces the minimum number of leaf nodes."""
+        # Arrange
+        coords = array('d')
+        for i in range(100):
+            for j in range(100):
+                coords.extend([i, j, i + 1, j + 1])
+
+        # Act
+        t = str_pack(RTree(max_entries=10), coords, list(range(10000)))
+
+        # Assert
+        self.assertEqual(1000, len(list(t.get_leaves())))
+        self.assertEqual(4, t.get_height())
+
+    def test_str_pack_insert_after_packing(self):
+        """Ensure entries can be inserted into (and deleted from) a packed tree."""
+        # Arrange
+        coords = array('d', (c for i in range(50) for c in (i, i, i + 1, i + 1)))
+        t = str_pack(RStarTree(max_entries=4), coords, list(range(50)))
+
+        # Act
+        t.insert(50, Rect(10.5, 10.5, 11, 11))
+        t.delete(next(iter(t.query((20.5, 20.5)))))
+
+        # Assert
+        assert_valid_tree(self, t)
+        self.assertEqual(50, len(list(t.get_leaf_entries())))
+
+    def test_str_pack_invalid_coords(self):
+        """Ensure an error is raised if the number of coordinates does not match the number of entries."""
+        # Act/Assert
+        with self.assertRaises(ValueError):
+            str_pack(RTree(), array('d', [0, 0, 1]), ['a'])
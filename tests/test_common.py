@@ -1,9 +1,14 @@
+import random
 from typing import Iterable
 from unittest import TestCase
 from unittest.mock import Mock
-from rtreelib import Point, Rect, RTree, RTreeEntry, RTreeNode
-from rtreelib.strategies.base import least_area_enlargement
-from tests.util import create_simple_tree, create_complex_tree
+from rtreelib import Point, Rect, RTree, RStarTree, RTreeEntry, RTreeNode, QueryStats
+from rtreelib.models import get_loc_distance_fn
+from rtreelib.models.location import rect_distance
+from rtreelib.rtree import RTreeBase
+from rtreelib.strategies.base import least_area_enlargement, insert, adjust_tree_strategy
+from rtreelib.strategies.guttman import guttman_choose_leaf, quadratic_split
+from tests.util import create_simple_tree, create_complex_tree, assert_valid_tree
 
 
 # noinspection PyPep8Naming
@@ -494,6 +499,62 @@ class TestCommon(TestCase):
         # Assert
         self.assertCountEqual(['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j'], [e.data for e in result])
 
+    def test_count(self):
+        """Ensures count returns the number of entries matching the location."""
+        # Arrange
+        t = create_complex_tree(self)
+
+        # Act
+        counts = [t.count(loc) for loc in [(0, 0), (2, 4), Rect(2, 3, 5, 6), t.root.get_bounding_rect()]]
+
+        # Assert
+        self.assertEqual([len(list(t.query(loc))) for loc in [(0, 0), (2, 4), Rect(2, 3, 5, 6)]] + [10], counts)
+
+    def test_nearest(self):
+        """Ensures nearest returns the k nearest entries, in increasing order of distance, for points and rects."""
+        # Arrange
+        rnd = random.Random(7)
+        t = RTree(max_entries=4)
+        for i in range(200):
+            x, y = rnd.uniform(0, 100), rnd.uniform(0, 100)
+            t.insert(i, Rect(x, y, x + rnd.uniform(0, 3), y + rnd.uniform(0, 3)))
+        all_entries = list(t.get_leaf_entries())
+
+        for loc in [(50, 50), (-10, 20), Rect(10, 10, 20, 15)]:
+            # Act
+            result = list(t.nearest(loc, k=10))
+
+            # Assert
+            distance = get_loc_distance_fn(loc)
+            expected = sorted(distance(e.rect) for e in all_entries)[:10]
+            self.assertEqual(expected, [distance(e.rect) for e in result])
+
+    def test_nearest_is_lazy(self):
+        """Ensures nearest can be used to iterate over all entries in order of distance, without a fixed k."""
+        # Arrange
+        t = create_complex_tree(self)
+
+        # Act
+        result = list(t.nearest((0, 0), k=None))
+        first = next(iter(t.nearest((0, 0))))
+
+        # Assert
+        self.assertEqual(10, len(result))
+        self.assertIs(result[0], first)
+        distances = [rect_distance(e.rect, Rect(0, 0, 0, 0)) for e in result]
+        self.assertEqual(sorted(distances), distances)
+
+    def test_nearest_empty_tree(self):
+        """Ensures nearest returns nothing for an empty tree."""
+        # Arrange
+        t = RTree()
+
+        # Act
+        result = list(t.nearest((0, 0), k=3))
+
+        # Assert
+        self.assertEqual([], result)
+
     def test_query_nodes_point_single_match(self):
         """Tests query_nodes method with a Point location returning a single match"""
         # Arrange
@@ -777,6 +838,440 @@ class TestCommon(TestCase):
         # Assert
         self.assertCountEqual([R, I2, L3, L4], result)
 
+    def test_insert_many(self):
+        """Ensure a batch insert creates entries for all items, and the resulting tree is valid and queryable."""
+        rnd = random.Random(0)
+        for t in [RTree(max_entries=4), RStarTree(max_entries=4)]:
+            # Arrange
+            t.insert('existing', Rect(0, 0, 1, 1))
+            items = [(i, Rect(x, y, x + 1, y + 1)) for i, (x, y) in
+                     enumerate((rnd.uniform(0, 100), rnd.uniform(0, 100)) for _ in range(200))]
+
+            # Act
+            entries = t.insert_many(items)
+
+            # Assert
+            self.assertEqual(list(range(200)), [e.data for e in entries])
+            self.assertCountEqual(['existing'] + list(range(200)), [e.data for e in t.get_leaf_entries()])
+            assert_valid_tree(self, t)
+            for entry in entries:
+                x, y = entry.rect.centroid()
+                self.assertIn(entry, list(t.query((x, y))))
+
+    def test_insert_many_empty(self):
+        """Inserting an empty batch should leave the tree unchanged."""
+        # Arrange
+        t = create_simple_tree(self)
+
+        # Act
+        entries = t.insert_many([])
+
+        # Assert
+        self.assertEqual([], entries)
+        self.assertCountEqual(['a', 'b', 'c', 'd', 'e'], [e.data for e in t.get_leaf_entries()])
+
+    def test_insert_many_large_batch(self):
+        """
+        Ensure large batches (which fill and flush the buffers at several levels of the tree) result in a valid tree,
+        and that the change set captures every node modified by the batch.
+        """
+        rnd = random.Random(1)
+        for t in [RTree(max_entries=4), RStarTree(max_entries=4)]:
+            # Arrange
+            t.insert_many([(i, Rect(i, i, i + 1, i + 1)) for i in range(50)])
+            changes = t.track_changes()
+            mirror = {n: [(e, e.rect, e.child) for e in n.entries] for n in t.get_nodes()}
+            items = [(i, Rect(x, y, x + 1, y + 1)) for i, (x, y) in
+                     enumerate((rnd.uniform(0, 100), rnd.uniform(0, 100)) for _ in range(1000))]
+
+            # Act
+            entries = t.insert_many(items)
+
+            # Assert
+            self.assertEqual(1050, len(list(t.get_leaf_entries())))
+            assert_valid_tree(self, t)
+            for entry in entries:
+                self.assertIn(entry, list(t.query(entry.rect.centroid())))
+            for node in changes.dirty_nodes:
+                mirror[node] = [(e, e.rect, e.child) for e in node.entries]
+            self.assertEqual({n: [(e, e.rect, e.child) for e in n.entries] for n in t.get_nodes()}, mirror)
+
+    def test_insert_many_without_choose_subtree(self):
+        """If the tree has no choose_subtree strategy, a batch should be inserted one entry at a time."""
+        # Arrange
+        t = RTreeBase(insert=insert, choose_leaf=guttman_choose_leaf, adjust_tree=adjust_tree_strategy,
+                      overflow_strategy=quadratic_split, max_entries=4)
+        items = [(i, Rect(i, i, i + 1, i + 1)) for i in range(30)]
+
+        # Act
+        entries = t.insert_many(items)
+
+        # Assert
+        self.assertEqual(list(range(30)), [e.data for e in entries])
+        self.assertCountEqual(list(range(30)), [e.data for e in t.get_leaf_entries()])
+        assert_valid_tree(self, t)
+
+    def test_update_within_leaf_updates_in_place(self):
+        """
+        When the new rectangle still fits within the leaf node containing the entry, the entry should stay in the same
+        leaf node, and the covering rectangles of its ancestors should be adjusted.
+        """
+        # Arrange
+        nodes = dict()
+        entries = dict()
+        t = create_simple_tree(self, nodes, entries)
+        a = entries['a']
+
+        # Act
+        result = t.update(a, Rect(1, 1, 2, 2))
+
+        # Assert
+        self.assertIs(a, result)
+        self.assertEqual(Rect(1, 1, 2, 2), a.rect)
+        self.assertIn(a, nodes['L1'].entries)
+        self.assertEqual(Rect(1, 1, 6, 6), nodes['L1'].parent_entry.rect)
+        assert_valid_tree(self, t)
+
+    def test_update_slight_enlargement_updates_in_place(self):
+        """
+        When the new rectangle fits within a slightly enlarged bounding rectangle of the leaf node, the entry should
+        stay in the same leaf node, and the leaf node should be enlarged to accommodate it.
+        """
+        # Arrange
+        nodes = dict()
+        entries = dict()
+        t = create_simple_tree(self, nodes, entries)
+        c = entries['c']
+
+        # Act
+        t.update(c, Rect(4.5, 4.5, 6.5, 6.5))
+
+        # Assert
+        self.assertIn(c, nodes['L1'].entries)
+        self.assertEqual(Rect(0, 0, 6.5, 6.5), nodes['L1'].parent_entry.rect)
+        assert_valid_tree(self, t)
+
+    def test_update_far_move_reinserts_entry(self):
+        """When an entry moves far away from its leaf node, it should be reinserted into a more suitable leaf node."""
+        # Arrange
+        nodes = dict()
+        entries = dict()
+        t = create_simple_tree(self, nodes, entries)
+        c = entries['c']
+
+        # Act
+        t.update(c, Rect(8, 9, 9, 10))
+
+        # Assert
+        self.assertIn(c, nodes['L2'].entries)
+        self.assertEqual(Rect(0, 0, 5, 5), nodes['L1'].parent_entry.rect)
+        self.assertCountEqual(['a', 'b', 'c', 'd', 'e'], [e.data for e in t.get_leaf_entries()])
+        assert_valid_tree(self, t)
+
+    def test_update_random_walk(self):
+        """Ensure the tree remains valid and queryable when all entries repeatedly move by small random steps."""
+        rnd = random.Random(0)
+        for t in [RTree(max_entries=4), RStarTree(max_entries=4)]:
+            # Arrange
+            points = {i: (rnd.uniform(0, 100), rnd.uniform(0, 100)) for i in range(100)}
+            entries = {i: t.insert(i, Rect(x, y, x + 1, y + 1)) for i, (x, y) in points.items()}
+
+            # Act
+            for _ in range(10):
+                for i, (x, y) in points.items():
+                    x, y = x + rnd.uniform(-5, 5), y + rnd.uniform(-5, 5)
+                    points[i] = (x, y)
+                    t.update(entries[i], Rect(x, y, x + 1, y + 1))
+
+            # Assert
+            assert_valid_tree(self, t)
+            self.assertCountEqual(range(100), [e.data for e in t.get_leaf_entries()])
+            for i, (x, y) in points.items():
+                self.assertIn(entries[i], list(t.query((x + 0.5, y + 0.5))))
+
+    def test_update_entry_not_in_tree_raises(self):
+        """Updating an entry that is not part of the tree should raise an error."""
+        # Arrange
+        t = create_simple_tree(self)
+        entry = RTreeEntry(Rect(0, 0, 1, 1), data='x')
+
+        # Act/Assert
+        with self.assertRaises(ValueError):
+            t.update(entry, Rect(1, 1, 2, 2))
+
+    def test_delete(self):
+        """Basic test of deleting an entry without causing an underflow."""
+        # Arrange
+        nodes = dict()
+        entries = dict()
+        t = create_simple_tree(self, nodes, entries)
+
+        # Act
+        t.delete(entries['c'])
+
+        # Assert
+        self.assertCountEqual(['a', 'b', 'd', 'e'], [e.data for e in t.get_leaf_entries()])
+        self.assertEqual(Rect(0, 0, 5, 5), nodes['L1'].parent_entry.rect)
+        assert_valid_tree(self, t)
+
+    def test_delete_condenses_tree(self):
+        """
+        When a deletion causes a node to underflow, the node should be eliminated and its remaining entries reinserted,
+        and the tree should be shortened if the root is left with a single child.
+        """
+        # Arrange
+        entries = dict()
+        t = RTree(max_entries=3, min_entries=2)
+        for data, rect in [('a', Rect(0, 0, 1, 1)), ('b', Rect(1, 1, 2, 2)), ('c', Rect(8, 8, 9, 9)),
+                           ('d', Rect(9, 9, 10, 10))]:
+            entries[data] = t.insert(data, rect)
+        self.assertEqual(2, len(t.get_levels()))
+
+        # Act
+        t.delete(entries['a'])
+
+        # Assert
+        self.assertEqual(1, len(t.get_levels()))
+        self.assertCountEqual(['b', 'c', 'd'], [e.data for e in t.get_leaf_entries()])
+        self.assertIs(entries['b'], next(iter(t.query((1.5, 1.5)))))
+        assert_valid_tree(self, t)
+
+    def test_delete_all_entries(self):
+        """Deleting every entry should leave an empty tree."""
+        # Arrange
+        entries = dict()
+        t = create_complex_tree(self, entries=entries)
+
+        # Act
+        for entry in entries.values():
+            t.delete(entry)
+
+        # Assert
+        self.assertTrue(t.root.is_leaf)
+        self.assertEqual([], t.root.entries)
+
+    def test_track_changes_disabled_by_default(self):
+        """Change tracking should be disabled unless explicitly enabled."""
+        # Arrange
+        t = create_simple_tree(self)
+
+        # Assert
+        self.assertIsNone(t.changes)
+
+    def test_track_changes_insert(self):
+        """Inserting an entry should mark the leaf node it was inserted into (and its ancestors) as dirty."""
+        # Arrange
+        nodes = dict()
+        t = create_simple_tree(self, nodes)
+        changes = t.track_changes()
+
+        # Act
+        t.insert('f', Rect(8, 9, 9, 10))
+
+        # Assert
+        self.assertCountEqual([nodes['L2'], nodes['R']], changes.dirty_nodes)
+        self.assertEqual([], changes.removed_nodes)
+        self.assertEqual([], changes.removed_entries)
+
+    def test_track_changes_mirror(self):
+        """
+        Ensure the change set captures every change made by inserts (including splits and forced reinserts), updates,
+        and deletes, by applying only the changes to a copy of the tree and comparing the copy to the actual tree.
+        """
+        rnd = random.Random(2)
+        for t in [RTree(max_entries=4), RStarTree(max_entries=4)]:
+            # Arrange
+            entries = [t.insert(i, Rect(i, i, i + 1, i + 1)) for i in range(20)]
+            changes = t.track_changes()
+            mirror = {n: [(e, e.rect, e.child) for e in n.entries] for n in t.get_nodes()}
+
+            for step in range(30):
+                # Act
+                for _ in range(rnd.randint(1, 5)):
+                    op = rnd.random()
+                    if op < 0.4 or len(entries) < 5:
+                        x, y = rnd.uniform(0, 50), rnd.uniform(0, 50)
+                        entries.append(t.insert(len(entries), Rect(x, y, x + 1, y + 1)))
+                    elif op < 0.7:
+                        x, y = rnd.uniform(0, 50), rnd.uniform(0, 50)
+                        t.update(rnd.choice(entries), Rect(x, y, x + 1, y + 1))
+                    else:
+                        t.delete(entries.pop(rnd.randrange(len(entries))))
+                old_entries = {e for n in mirror for e, _, _ in mirror[n]}
+                for node in changes.removed_nodes:
+                    mirror.pop(node, None)
+                for node in changes.dirty_nodes:
+                    mirror[node] = [(e, e.rect, e.child) for e in node.entries]
+
+                # Assert
+                actual = {n: [(e, e.rect, e.child) for e in n.entries] for n in t.get_nodes()}
+                self.assertEqual(actual, mirror)
+                new_entries = {e for n in actual for e, _, _ in actual[n]}
+                self.assertTrue(set(old_entries - new_entries) <= set(changes.removed_entries))
+                self.assertFalse(new_entries & set(changes.removed_entries))
+                self.assertEqual(t.get_height(), len(t.get_levels()))
+                changes.clear(t.get_height())
+                assert_valid_tree(self, t)
+
+    def test_query_stats(self):
+        """Ensure the statistics of a query account for every node visited and every rectangle and entry tested."""
+        # Arrange
+        t = create_complex_tree(self)
+        loc = Rect(2, 3, 5, 6)
+        stats = QueryStats()
+
+        # Act
+        entries = list(t.query(loc, stats))
+
+        # Assert
+        self.assertEqual(list(t.query(loc)), entries)
+        self.assertEqual(len(entries), stats.hits)
+        leaves = list(t.query_nodes(loc))
+        levels = t.get_levels()
+        expected_visits = [len([n for n in level if loc.intersects(n.get_bounding_rect())]) for level in levels]
+        self.assertEqual(expected_visits, stats.nodes_visited)
+        self.assertEqual(sum(len(leaf.entries) for leaf in leaves), stats.entries_tested)
+        self.assertEqual(1 + sum(len(n.entries) for level in levels[:-1] for n in level
+                                 if loc.intersects(n.get_bounding_rect())), stats.mbr_tests)
+        self.assertGreater(stats.elapsed, 0)
+
+    def test_query_stats_no_match(self):
+        """Ensure only the root rectangle is tested when the location is outside of the tree."""
+        # Arrange
+        t = create_complex_tree(self)
+
+        # Act
+        stats = t.explain(Point(100, 100))
+
+        # Assert
+        self.assertEqual([], stats.nodes_visited)
+        self.assertEqual((1, 0, 0), (stats.mbr_tests, stats.entries_tested, stats.hits))
+
+    def test_explain(self):
+        """Ensure explain returns the same statistics as iterating the query with a stats object."""
+        # Arrange
+        t = create_complex_tree(self)
+        stats = QueryStats()
+        list(t.query(Point(4, 5), stats))
+
+        # Act
+        result = t.explain(Point(4, 5))
+
+        # Assert
+        self.assertEqual((stats.nodes_visited, stats.mbr_tests, stats.entries_tested, stats.hits),
+                         (result.nodes_visited, result.mbr_tests, result.entries_tested, result.hits))
+        self.assertEqual(result.total_nodes_visited, sum(result.nodes_visited))
+
+    def test_search_stats(self):
+        """Ensure search and search_nodes count each condition evaluation, and return the same results as without."""
+        # Arrange
+        t = create_complex_tree(self)
+        node_condition = Mock(side_effect=lambda n: n.get_bounding_rect().min_x < 5)
+        entry_condition = Mock(side_effect=lambda e: e.rect.min_y < 5)
+        expected_entries = list(t.search(node_condition, entry_condition))
+        expected_nodes = list(t.search_nodes(node_condition, leaves=False))
+        node_condition.reset_mock()
+        entry_condition.reset_mock()
+        entry_stats, node_stats = QueryStats(), QueryStats()
+
+        # Act
+        entries = list(t.search(node_condition, entry_condition, stats=entry_stats))
+        node_calls = node_condition.call_count
+        nodes = list(t.search_nodes(node_condition, leaves=False, stats=node_stats))
+
+        # Assert
+        self.assertEqual(expected_entries, entries)
+        self.assertEqual(expected_nodes, nodes)
+        self.assertEqual(node_calls, entry_stats.mbr_tests)
+        self.assertEqual(entry_condition.call_count, entry_stats.entries_tested)
+        self.assertEqual(len(entries), entry_stats.hits)
+        self.assertEqual(len(nodes), node_stats.hits)
+        self.assertEqual(len(nodes), node_stats.total_nodes_visited)
+        self.assertEqual(1, node_stats.nodes_visited[0])
+
+    def test_query_stats_accumulate(self):
+        """Ensure the same stats object accumulates the statistics of multiple queries."""
+        # Arrange
+        t = create_complex_tree(self)
+        stats = QueryStats()
+        single = t.explain(Point(4, 5))
+
+        # Act
+        for _ in range(3):
+            list(t.query(Point(4, 5), stats))
+
+        # Assert
+        self.assertEqual([3 * n for n in single.nodes_visited], stats.nodes_visited)
+        self.assertEqual(3 * single.hits, stats.hits)
+
+    def test_stats(self):
+        """Ensure the quality metrics of each level are computed correctly."""
+        # Arrange
+        t = create_simple_tree(self)
+
+        # Act
+        stats = t.stats()
+
+        # Assert
+        self.assertEqual(2, stats.height)
+        self.assertEqual([0, 1], [level.level for level in stats.levels])
+        self.assertEqual([1, 2], [level.node_count for level in stats.levels])
+        self.assertEqual([2, 5], [level.entry_count for level in stats.levels])
+        self.assertEqual([2 / 3, 5 / 6], [level.fill_factor for level in stats.levels])
+        self.assertEqual([100, 40], [level.mbr_area for level in stats.levels])
+        self.assertEqual([40, 32], [level.mbr_perimeter for level in stats.levels])
+        self.assertEqual([0, 6], [level.overlap_area for level in stats.levels])
+        self.assertEqual([60, 8], [level.dead_space for level in stats.levels])
+        self.assertEqual((3, 5, 0, 68, 140, 72, 7 / 9),
+                         (stats.node_count, stats.leaf_entry_count, stats.overlap_area, stats.dead_space,
+                          stats.mbr_area, stats.mbr_perimeter, stats.fill_factor))
+
+    def test_stats_dead_space_overlapping_entries(self):
+        """Ensure the dead space is exact when 3 or more entries overlap (counting the area they share only once)."""
+        # Arrange
+        t = RTree(max_entries=8)
+        for i in range(3):
+            t.insert(i, Rect(0, 0, 1, 1))
+
+        # Act
+        stats = t.stats()
+        t.insert(3, Rect(0, 0, 4, 1))
+        stats_wide = t.stats()
+
+        # Assert
+        self.assertEqual((1, 0), (stats.mbr_area, stats.dead_space))
+        self.assertEqual((4, 0), (stats_wide.mbr_area, stats_wide.dead_space))
+
+    def test_stats_matches_levels(self):
+        """Ensure the node counts and areas of each level match the nodes returned by get_levels."""
+        for t in [RTree(max_entries=4), RStarTree(max_entries=4)]:
+            # Arrange
+            rnd = random.Random(4)
+            for i in range(200):
+                x, y = rnd.uniform(0, 100), rnd.uniform(0, 100)
+                t.insert(i, Rect(x, y, x + rnd.uniform(0, 5), y + rnd.uniform(0, 5)))
+            levels = t.get_levels()
+
+            # Act
+            stats = t.stats()
+
+            # Assert
+            self.assertEqual(t.get_height(), stats.height)
+            self.assertEqual([len(level) for level in levels], [level.node_count for level in stats.levels])
+            for level, level_stats in zip(levels, stats.levels):
+                self.assertAlmostEqual(sum(n.get_bounding_rect().area() for n in level), level_stats.mbr_area)
+            self.assertEqual(200, stats.leaf_entry_count)
+            self.assertEqual(stats.height, len(stats.as_dict()['levels']))
+
+    def test_stats_empty_tree(self):
+        """Ensure the metrics of an empty tree can be computed."""
+        # Act
+        stats = RTree().stats()
+
+        # Assert
+        self.assertEqual((1, 1, 0, 0.0, 0.0), (stats.height, stats.node_count, stats.leaf_entry_count,
+                                               stats.mbr_area, stats.fill_factor))
+
 
 def _yield_node(node: RTreeNode) -> Iterable[RTreeNode]:
     yield node
@@ -0,0 +1,167 @@
+import random
+import sys
+import threading
+from unittest import TestCase
+from rtreelib import RStarTree, RTree, Rect, ConcurrentRTree
+from rtreelib.concurrency import ReadWriteLock
+from tests.util import assert_valid_tree
+
+
+class TestConcurrency(TestCase):
+    """Tests for thread-safe R-trees"""
+
+    def test_write_lock_excludes_readers(self):
+        """Ensure a writer waits for the current readers to release the lock."""
+        # Arrange
+        lock = ReadWriteLock()
+        acquired = threading.Event()
+
+        def write():
+            with lock.write_lock():
+                acquired.set()
+
+        # Act
+        lock.acquire_read()
+        writer = threading.Thread(target=write)
+        writer.start()
+        acquired_while_reading = acquired.wait(0.2)
+        lock.release_read()
+        writer.join(5)
+
+        # Assert
+        self.assertFalse(acquired_while_reading)
+        self.assertTrue(acquired.is_set())
+
+    def test_waiting_writer_blocks_new_readers(self):
+        """Ensure new readers wait for a waiting writer, so that writers are not starved."""
+        # Arrange
+        lock = ReadWriteLock()
+        order = []
+
+        def write():
+            with lock.write_lock():
+                order.append('write')
+
+        def read():
+            with lock.read_lock():
+                order.append('read')
+
+        # Act
+        lock.acquire_read()
+        writer = threading.Thread(target=write)
+        writer.start()
+        while not lock._waiting_writers:
+            threading.Event().wait(0.01)
+        reader = threading.Thread(target=read)
+        reader.start()
+        reader.join(0.2)
+        lock.release_read()
+        writer.join(5)
+        reader.join(5)
+
+        # Assert
+        self.assertEqual(['write', 'read'], order)
+
+    def test_concurrent_readers(self):
+        """Ensure several readers can hold the lock at the same time."""
+        # Arrange
+        lock = ReadWriteLock()
+        barrier = threading.Barrier(3, timeout=5)
+        errors = []
+
+        def read():
+            try:
+                with lock.read_lock():
+                    barrier.wait()
+            except threading.BrokenBarrierError as e:
+                errors.append(e)
+
+        # Act
+        threads = [threading.Thread(target=read) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+
+        # Assert
+        self.assertEqual([], errors)
+
+    def test_stress(self):
+        """
+        Ensure queries from several threads see a consistent tree (matching a scan of its leaf entries, and satisfying
+        the tree invariants) while another thread inserts and deletes entries.
+        """
+        # Arrange
+        t = ConcurrentRTree(RStarTree(max_entries=4))
+        done = threading.Event()
+        errors = []
+
+        def write():
+            rnd = random.Random(1)
+            entries = []
+            try:
+                for i in range(200):
+                    x, y = rnd.uniform(0, 100), rnd.uniform(0, 100)
+                    entries.append(t.insert(i, Rect(x, y, x + 5, y + 5)))
+                    if i % 5 == 4:
+                        t.delete(entries.pop(rnd.randrange(len(entries))))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                done.set()
+
+        def read(seed: int):
+            rnd = random.Random(seed)
+            try:
+                while not done.is_set():
+                    x, y = rnd.uniform(0, 80), rnd.uniform(0, 80)
+                    loc = Rect(x, y, x + 20, y + 20)
+                    with t.read() as tree:
+                        result = [e.data for e in tree.query(loc)]
+                        expected = [e.data for e in tree.get_leaf_entries() if e.rect.intersects(loc)]
+                        self.assertCountEqual(expected, result)
+                        assert_valid_tree(self, tree)
+                    t.count(loc)
+                    t.nearest((x, y), 3)
+            except Exception as e:
+                errors.append(e)
+
+        # Act
+        threads = [threading.Thread(target=write)] + [threading.Thread(target=read, args=(i,)) for i in range(4)]
+        # Switch threads much more often than usual, so that queries are likely to interleave with each insert
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-5)
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join(120)
+        finally:
+            sys.setswitchinterval(switch_interval)
+
+        # Assert
+        self.assertEqual([], errors)
+        self.assertEqual(160, len(t.get_leaf_entries()))
+        with t.read() as tree:
+            assert_valid_tree(self, tree)
+
+    def test_wrapped_methods(self):
+        """Ensure the wrapped methods behave like those of the underlying tree."""
+        # Arrange
+        t = ConcurrentRTree(RTree(max_entries=4))
+
+        # Act
+        entries = t.insert_many([(i, Rect(i, i, i + 1, i + 1)) for i in range(10)])
+        t.update(entries[0], Rect(20, 20, 21, 21))
+        t.delete(entries[1])
+        extra = t.insert('extra', Rect(5, 5, 6, 6))
+
+        # Assert
+        self.assertCountEqual([5, 'extra'], [e.data for e in t.query(Rect(5.5, 5.5, 5.6, 5.6))])
+        self.assertEqual(2, t.count((5.5, 5.5)))
+        self.assertEqual([0], [e.data for e in t.nearest((25, 25))])
+        self.assertEqual([extra], t.search(None, lambda e: e.data == 'extra'))
+        self.assertEqual(2, t.explain((5.5, 5.5)).hits)
+        self.assertEqual(10, len(t.get_leaf_entries()))
+        self.assertEqual(10, t.stats().leaf_entry_count)
+        self.assertEqual(t.tree.get_height(), t.get_height())
@@ -0,0 +1,217 @@
+import os
+import random
+import shutil
+import tempfile
+from unittest import TestCase, skipIf
+from array import array
+from rtreelib import RTree, Rect, str_pack
+from rtreelib.disk import DiskRTree, write_disk_tree
+from tests.util import create_complex_tree
+
+try:
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.image as mpimg
+    from matplotlib.figure import Figure
+    import pydot
+    from rtreelib import diagram
+except (ImportError, RuntimeError):
+    diagram = None
+
+
+@skipIf(diagram is None, "matplotlib, pydot, and tqdm are not installed")
+class TestDiagram(TestCase):
+    """Tests for plotting R-trees and creating R-tree diagrams"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.dir, name)
+
+    def test_plot_rtree(self):
+        """Ensure a plot of the tree can be saved to a file."""
+        # Arrange
+        t = create_complex_tree(self)
+        entry = next(iter(t.get_leaf_entries()))
+
+        # Act
+        diagram.plot_rtree(t, filename=self.path('plot.png'), show=False, highlight_entry=entry)
+
+        # Assert
+        self.assertEqual(4, mpimg.imread(self.path('plot.png')).shape[2])
+
+    def test_highlight_images(self):
+        """
+        Ensure the images rendered by overlaying highlights on a single static plot have the same size as a plot
+        rendered from scratch (give or take a pixel), and only differ from each other around the highlighted node or
+        entry.
+        """
+        # Arrange
+        t = create_complex_tree(self)
+        entries = list(t.get_leaf_entries())
+        node = t.root.entries[0].child
+        diagram.plot_rtree(t, filename=self.path('full.png'), show=False)
+        plot = diagram._RTreePlot(t)
+
+        # Act
+        plot.save(self.path('none.png'))
+        plot.save(self.path('entry0.png'), highlight_entry=entries[0])
+        plot.save(self.path('entry1.png'), highlight_entry=entries[1])
+        plot.save(self.path('node.png'), highlight_node=node)
+        plot.save(self.path('none2.png'))
+
+        # Assert
+        images = {name: mpimg.imread(self.path(f'{name}.png'))
+                  for name in ['full', 'none', 'entry0', 'entry1', 'node', 'none2']}
+        # The crop may differ by a pixel due to rounding
+        for expected, actual in zip(images['full'].shape, images['none'].shape):
+            self.assertAlmostEqual(expected, actual, delta=1)
+        self.assertTrue((images['none'] == images['none2']).all())
+        for name in ['entry0', 'entry1', 'node']:
+            changed = (images[name] != images['none']).any(axis=2).mean()
+            self.assertGreater(changed, 0)
+            self.assertLess(changed, 0.5)
+        self.assertFalse((images['entry0'] == images['entry1']).all())
+
+    def test_draw_rtree_nodes(self):
+        """Ensure an image is rendered for each node and leaf entry of the diagram."""
+        # Arrange
+        rnd = random.Random(3)
+        t = RTree(max_entries=4)
+        for i in range(30):
+            x, y = rnd.uniform(0, 100), rnd.uniform(0, 100)
+            t.insert(i, Rect(x, y, x + 2, y + 2))
+        graph = pydot.Dot(graph_type='digraph')
+
+        # Act
+        diagram._draw_rtree_nodes(graph, t, include_images=True)
+
+        # Assert
+        nodes = [n for subgraph in graph.get_subgraphs() for n in subgraph.get_nodes()]
+        self.assertEqual(len(list(t.get_nodes())) + 30, len(nodes))
+        images = [n.get_label().split('<img src="')[1].split('"')[0] for n in nodes]
+        try:
+            self.assertTrue(all(os.path.getsize(img) > 0 for img in images))
+        finally:
+            for img in images:
+                os.remove(img)
+
+    def test_draw_rtree_nodes_in_parallel(self):
+        """Ensure images rendered by a process pool (from a snapshot of the tree) match the images rendered serially."""
+        # Arrange
+        rnd = random.Random(5)
+        t = RTree(max_entries=4)
+        for i in range(20):
+            x, y = rnd.uniform(0, 100), rnd.uniform(0, 100)
+            t.insert(object(), Rect(x, y, x + 2, y + 2))
+        serial, parallel = pydot.Dot(graph_type='digraph'), pydot.Dot(graph_type='digraph')
+
+        # Act
+        diagram._draw_rtree_nodes(serial, t, include_images=True)
+        diagram._draw_rtree_nodes(parallel, t, include_images=True, workers=2)
+
+        # Assert
+        images = []
+        for graph in [serial, parallel]:
+            nodes = [n for subgraph in graph.get_subgraphs() for n in subgraph.get_nodes()]
+            images.append([n.get_label().split('<img src="')[1].split('"')[0] for n in nodes])
+        try:
+            self.assertEqual(len(list(t.get_nodes())) + 20, len(images[1]))
+            for img1, img2 in zip(*images):
+                self.assertTrue((mpimg.imread(img1) == mpimg.imread(img2)).all())
+        finally:
+            for img in images[0] + images[1]:
+                os.remove(img)
+
+    def plot(self, t: RTree, **kwargs):
+        ax = Figure().subplots(1)
+        diagram._plot_rtree(ax, t, **kwargs)
+        return ax
+
+    def large_tree(self, count: int) -> RTree:
+        rnd = random.Random(9)
+        coords = array('d')
+        for _ in range(count):
+            x, y = rnd.uniform(0, 1000), rnd.uniform(0, 1000)
+            coords.extend([x, y, x + 1, y + 1])
+        return str_pack(RTree(max_entries=16), coords, list(range(count)))
+
+    def test_plot_all_entries(self):
+        """Ensure every node and leaf entry is plotted (and every leaf entry labeled) by default."""
+        # Arrange
+        t = create_complex_tree(self)
+
+        # Act
+        ax = self.plot(t)
+
+        # Assert
+        self.assertEqual(sorted(str(e.data) for e in t.get_leaf_entries()), sorted(a.get_text() for a in ax.texts))
+        self.assertEqual([10, 7], [len(c.get_paths()) for c in ax.collections])
+
+    def test_plot_level_of_detail(self):
+        """Ensure the number of plotted patches and labels is bounded by max_entries, regardless of the tree size."""
+        # Arrange
+        t = self.large_tree(20000)
+
+        # Act
+        ax = self.plot(t, max_entries=200)
+
+        # Assert
+        self.assertEqual(0, len(ax.texts))
+        density, nodes = ax.collections
+        self.assertLessEqual(len(density.get_paths()), 200)
+        self.assertLessEqual(len(nodes.get_paths()), 1 + 200 + 200)
+        alphas = [color[3] for color in density.get_facecolor()]
+        self.assertGreater(max(alphas), min(alphas))
+
+    def test_plot_level_of_detail_reads_only_visible_levels(self):
+        """Ensure a level-of-detail plot does not visit the subtrees of the nodes it shades (to estimate density)."""
+        # Arrange
+        path = os.path.join(self.dir, 'tree.rtd')
+        write_disk_tree(self.large_tree(20000), path)
+
+        with DiskRTree(path) as d:
+            # Act
+            d.pages_read = 0
+            ax = self.plot(d, max_entries=200)
+
+            # Assert
+            density, nodes = ax.collections
+            self.assertGreater(len(density.get_paths()), 0)
+            self.assertLess(d.pages_read, d.node_count / 2)
+
+    def test_plot_viewport(self):
+        """Ensure only the entries within the viewport are plotted (and labeled) when zoomed in."""
+        # Arrange
+        t = self.large_tree(20000)
+        viewport = Rect(100, 100, 130, 130)
+
+        # Act
+        ax = self.plot(t, max_entries=200, viewport=viewport)
+
+        # Assert
+        self.assertEqual((100, 130), ax.get_xlim())
+        self.assertEqual((100, 130), ax.get_ylim())
+        self.assertCountEqual([str(e.data) for e in t.query(viewport)], [a.get_text() for a in ax.texts])
+        self.assertGreater(len(ax.texts), 0)
+
+    def test_plot_max_level(self):
+        """Ensure nodes below max_level are not plotted."""
+        # Arrange
+        t = create_complex_tree(self)
+
+        # Act
+        ax = self.plot(t, max_level=0)
+
+        # Assert
+        self.assertEqual([10, 1], [len(c.get_paths()) for c in ax.collections])
+
+    def test_plot_invalid_viewport(self):
+        """Ensure an error is raised if the viewport is not a rectangle."""
+        # Act/Assert
+        with self.assertRaises(TypeError):
+            self.plot(create_complex_tree(self), viewport=(1, 2))
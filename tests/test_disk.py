@@ -0,0 +1,286 @@
+import os
+import random
+import tempfile
+from unittest import TestCase
+from rtreelib import Rect, RTree, RStarTree, RTreeNode
+from rtreelib.models import get_loc_distance_fn
+from rtreelib.disk import DiskRTree, BufferPool, write_disk_tree, max_entries_per_page
+from tests.util import create_complex_tree
+
+
+class TestDisk(TestCase):
+    """Tests for the disk-resident (memory-mapped) R-tree"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.rtd')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_query_matches_in_memory_tree(self):
+        """Ensure queries on a disk tree return the same entries as the original tree."""
+        # Arrange
+        t = create_complex_tree(self)
+        write_disk_tree(t, self.path)
+        locs = [(0, 0), (2, 4), (6, 5), Rect(2, 3, 5, 6), Rect(0, 0, 20, 20), Rect(50, 50, 60, 60)]
+
+        with DiskRTree(self.path) as d:
+            for loc in locs:
+                # Act
+                result = [e.data for e in d.query(loc)]
+
+                # Assert
+                self.assertEqual([e.data for e in t.query(loc)], result)
+                self.assertEqual(t.count(loc), d.count(loc))
+
+    def test_structure_matches_in_memory_tree(self):
+        """Ensure the nodes of a disk tree have the same structure (and levels) as the original tree."""
+        # Arrange
+        t = create_complex_tree(self)
+        write_disk_tree(t, self.path)
+
+        # Act
+        with DiskRTree(self.path) as d:
+            expected = [[[(e.rect, e.data) for e in n.entries] for n in level] for level in t.get_levels()]
+            actual = [[[(e.rect, e.data) for e in n.entries] for n in level] for level in d.get_levels()]
+            levels = [[n.level for n in level] for level in d.get_levels()]
+
+        # Assert
+        self.assertEqual(expected, actual)
+        self.assertEqual([[0], [1, 1], [2, 2, 2, 2]], levels)
+
+    def test_query_reads_only_search_path(self):
+        """Ensure a small query only reads the pages along the search path, rather than the whole tree."""
+        # Arrange
+        rnd = random.Random(3)
+        t = RTree(max_entries=8)
+        for i in range(2000):
+            x, y = rnd.uniform(0, 1000), rnd.uniform(0, 1000)
+            t.insert(i, Rect(x, y, x + 1, y + 1))
+        write_disk_tree(t, self.path)
+        loc = Rect(500, 500, 510, 510)
+
+        with DiskRTree(self.path) as d:
+            # Act
+            d.pages_read = 0
+            result = [e.data for e in d.query(loc)]
+
+            # Assert
+            self.assertCountEqual([e.data for e in t.query(loc)], result)
+            self.assertEqual(len(list(t.query_nodes(loc, leaves=False))) - 1, d.pages_read)
+            self.assertLess(d.pages_read, d.node_count / 10)
+
+    def test_nearest_reads_only_expanded_nodes(self):
+        """Ensure a nearest neighbour query only reads the pages of the nodes it expands, rather than their siblings."""
+        # Arrange
+        rnd = random.Random(3)
+        t = RTree(max_entries=8)
+        for i in range(2000):
+            x, y = rnd.uniform(0, 1000), rnd.uniform(0, 1000)
+            t.insert(i, Rect(x, y, x + 1, y + 1))
+        write_disk_tree(t, self.path)
+
+        for loc, k in [((500, 500), 1), ((20, 980), 1), ((250, 750), 5)]:
+            with DiskRTree(self.path) as d:
+                # Act
+                d.pages_read = 0
+                result = [e.data for e in d.nearest(loc, k)]
+
+                # Assert
+                expected = list(t.nearest(loc, k))
+                self.assertEqual([e.data for e in expected], result)
+                # A best-first search only needs to expand the nodes that are no further away than the k-th result
+                distance = get_loc_distance_fn(loc)
+                max_distance = distance(expected[-1].rect)
+                expanded = [n for n in t.get_nodes() if not n.is_root and distance(n.parent_entry.rect) <= max_distance]
+                self.assertLessEqual(d.pages_read, len(expanded))
+
+    def test_nearest_matches_in_memory_tree(self):
+        """Ensure nearest neighbour queries on a disk tree return the same entries as the original tree."""
+        # Arrange
+        rnd = random.Random(5)
+        t = RStarTree(max_entries=6)
+        for i in range(300):
+            x, y = rnd.uniform(0, 100), rnd.uniform(0, 100)
+            t.insert(i, Rect(x, y, x + 1, y + 1))
+        write_disk_tree(t, self.path)
+
+        # Act
+        with DiskRTree(self.path) as d:
+            result = [e.data for e in d.nearest((40, 60), k=5)]
+
+        # Assert
+        self.assertEqual([e.data for e in t.nearest((40, 60), k=5)], result)
+
+    def test_empty_tree(self):
+        """Ensure an empty tree can be written and queried."""
+        # Arrange
+        write_disk_tree(RTree(), self.path)
+
+        # Act
+        with DiskRTree(self.path) as d:
+            result = list(d.query((0, 0)))
+
+        # Assert
+        self.assertEqual([], result)
+
+    def test_custom_serialization(self):
+        """Ensure custom dumps/loads functions are used to serialize the data of leaf entries."""
+        # Arrange
+        t = RTree()
+        t.insert('foo', Rect(0, 0, 1, 1))
+        write_disk_tree(t, self.path, dumps=lambda s: s.encode('utf-8'))
+
+        # Act
+        with DiskRTree(self.path, loads=lambda b: bytes(b).decode('utf-8')) as d:
+            result = [e.data for e in d.query((0, 0))]
+
+        # Assert
+        self.assertEqual(['foo'], result)
+
+    def test_read_only(self):
+        """Ensure a disk tree cannot be modified."""
+        # Arrange
+        t = create_complex_tree(self)
+        write_disk_tree(t, self.path)
+
+        with DiskRTree(self.path) as d:
+            entry = next(iter(d.query((0, 0))))
+
+            # Act/Assert
+            with self.assertRaises(RuntimeError):
+                d.insert('x', Rect(0, 0, 1, 1))
+            with self.assertRaises(RuntimeError):
+                d.delete(entry)
+            with self.assertRaises(RuntimeError):
+                d.update(entry, Rect(0, 0, 1, 1))
+
+    def test_page_size_too_small(self):
+        """Ensure an error is raised if a node cannot fit in a page."""
+        # Arrange
+        t = RTree(max_entries=max_entries_per_page(512) + 1)
+
+        # Act/Assert
+        with self.assertRaises(ValueError):
+            write_disk_tree(t, self.path, page_size=512)
+
+    def test_invalid_file(self):
+        """Ensure an error is raised when opening a file that is not a disk tree."""
+        # Arrange
+        with open(self.path, 'wb') as f:
+            f.write(bytes(4096))
+
+        # Act/Assert
+        with self.assertRaises(ValueError):
+            DiskRTree(self.path)
+
+
+class TestBufferPool(TestCase):
+    """Tests for the buffer pool used to cache the nodes of a disk-resident R-tree"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.rtd')
+        os.close(fd)
+        self.loaded = []
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def load(self, page: int) -> RTreeNode:
+        self.loaded.append(page)
+        node = RTreeNode(None, True)
+        node.level = 0 if page == 0 else 2
+        return node
+
+    def test_lru_evicts_least_recently_used(self):
+        """Ensure the LRU policy evicts the node that was used least recently."""
+        # Arrange
+        pool = BufferPool(capacity=3, policy='lru')
+        for page in [1, 2, 3]:
+            pool.get(page, self.load)
+
+        # Act
+        pool.get(1, self.load)
+        pool.get(4, self.load)
+
+        # Assert
+        self.assertIn(1, pool)
+        self.assertNotIn(2, pool)
+        self.assertIn(3, pool)
+        self.assertIn(4, pool)
+        self.assertEqual((1, 4, 1), (pool.hits, pool.misses, pool.evictions))
+
+    def test_clock_gives_referenced_nodes_second_chance(self):
+        """Ensure the CLOCK policy evicts a node that has not been referenced since the hand last passed it."""
+        # Arrange
+        pool = BufferPool(capacity=3, policy='clock')
+        for page in [1, 2, 3]:
+            pool.get(page, self.load)
+        # The hand clears all reference bits and evicts page 1, leaving the hand on page 2
+        pool.get(4, self.load)
+
+        # Act
+        pool.get(2, self.load)
+        pool.get(5, self.load)
+
+        # Assert
+        self.assertEqual([2, 4, 5], sorted(p for p in range(1, 6) if p in pool))
+        self.assertEqual(3, len(pool))
+        self.assertEqual(2, pool.evictions)
+
+    def test_pinned_nodes_are_not_evicted(self):
+        """Ensure nodes in the pinned levels stay in the pool, and do not count towards its capacity."""
+        # Arrange
+        pool = BufferPool(capacity=1)
+
+        # Act
+        pool.get(0, self.load)
+        for page in range(1, 10):
+            pool.get(page, self.load)
+        pool.get(0, self.load)
+
+        # Assert
+        self.assertIn(0, pool)
+        self.assertEqual(1, pool.pinned_count)
+        self.assertEqual(1, len(pool))
+        self.assertEqual(1, self.loaded.count(0))
+
+    def test_invalid_parameters(self):
+        """Ensure invalid capacities and policies are rejected."""
+        # Act/Assert
+        with self.assertRaises(ValueError):
+            BufferPool(capacity=0)
+        with self.assertRaises(ValueError):
+            BufferPool(capacity=10, policy='fifo')
+
+    def test_zipfian_workload(self):
+        """
+        Ensure that under a skewed (zipfian) query workload, a small buffer pool serves most node lookups from memory
+        while never exceeding its capacity, for both eviction policies.
+        """
+        # Arrange
+        rnd = random.Random(11)
+        t = RTree(max_entries=8)
+        for i in range(3000):
+            x, y = rnd.uniform(0, 1000), rnd.uniform(0, 1000)
+            t.insert(i, Rect(x, y, x + 1, y + 1))
+        write_disk_tree(t, self.path)
+        hotspots = [(rnd.uniform(0, 990), rnd.uniform(0, 990)) for _ in range(200)]
+        weights = [1 / (rank + 1) for rank in range(len(hotspots))]
+        queries = [Rect(x, y, x + 10, y + 10) for x, y in rnd.choices(hotspots, weights, k=2000)]
+
+        for policy in ['lru', 'clock']:
+            pool = BufferPool(capacity=100, policy=policy)
+            with DiskRTree(self.path, buffer_pool=pool) as d:
+                for loc in queries:
+                    # Act
+                    result = [e.data for e in d.query(loc)]
+                    # Assert
+                    self.assertEqual([e.data for e in t.query(loc)], result)
+                    self.assertLessEqual(len(pool), pool.capacity)
+
+                # Assert
+                self.assertGreater(pool.evictions, 0)
+                self.assertGreater(pool.hit_ratio, 0.8)
+                self.assertEqual(pool.misses, d.pages_read)
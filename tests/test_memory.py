@@ -0,0 +1,110 @@
+import random
+import sys
+from unittest import TestCase
+from rtreelib import RTree, Rect
+from rtreelib.memory import footprint
+
+
+class TestMemory(TestCase):
+    """Tests for measuring the memory footprint of R-trees"""
+
+    @staticmethod
+    def create_tree(count: int, data=None):
+        rnd = random.Random(1)
+        t = RTree(max_entries=8)
+        for i in range(count):
+            x, y = rnd.uniform(0, 100), rnd.uniform(0, 100)
+            t.insert(f'item{i}' if data is None else data, Rect(x, y, x + 1, y + 1))
+        return t
+
+    def test_footprint(self):
+        """Ensure the footprint of a tree is broken down into each component."""
+        # Arrange
+        t = self.create_tree(500)
+
+        # Act
+        result = footprint(t)
+
+        # Assert
+        self.assertFalse(result.estimated)
+        self.assertEqual(500, result.leaf_entry_count)
+        self.assertEqual(len(list(t.get_nodes())), result.node_count)
+        self.assertGreater(result.rects, 0)
+        self.assertGreater(result.entries, 0)
+        self.assertGreater(result.nodes, 0)
+        self.assertGreater(result.lists, 0)
+        self.assertEqual(sum(sys.getsizeof(e.data) for e in t.get_leaf_entries()), result.payload)
+        self.assertEqual(result.rects + result.entries + result.nodes + result.lists + result.payload, result.total)
+        self.assertAlmostEqual(result.total / 500, result.bytes_per_leaf_entry)
+        self.assertEqual(result.total, result.as_dict()['total'])
+
+    def test_footprint_shared_payload(self):
+        """Ensure a payload object shared by several entries is only counted once."""
+        # Arrange
+        data = {'shared': True}
+        t = self.create_tree(100, data=data)
+
+        # Act
+        result = footprint(t)
+
+        # Assert
+        self.assertEqual(sys.getsizeof(data), result.payload)
+
+    def test_footprint_grows_with_tree(self):
+        """Ensure a tree with more entries has a larger footprint, with a similar cost per leaf entry."""
+        # Act
+        small = footprint(self.create_tree(200))
+        large = footprint(self.create_tree(2000))
+
+        # Assert
+        self.assertGreater(large.total, 5 * small.total)
+        self.assertAlmostEqual(small.bytes_per_leaf_entry, large.bytes_per_leaf_entry,
+                               delta=0.2 * small.bytes_per_leaf_entry)
+
+    def test_footprint_estimate(self):
+        """Ensure estimating the footprint by sampling leaf nodes is close to the exact footprint."""
+        # Arrange
+        t = self.create_tree(2000)
+
+        # Act
+        exact = footprint(t)
+        estimate = footprint(t, sample=50, seed=1)
+
+        # Assert
+        self.assertTrue(estimate.estimated)
+        self.assertEqual(exact.node_count, estimate.node_count)
+        self.assertEqual(exact.leaf_entry_count, estimate.leaf_entry_count)
+        self.assertAlmostEqual(exact.total, estimate.total, delta=0.05 * exact.total)
+
+    def test_footprint_sample_larger_than_tree(self):
+        """Ensure the footprint is measured exactly when the sample is at least as large as the number of leaves."""
+        # Arrange
+        t = self.create_tree(50)
+
+        # Act
+        result = footprint(t, sample=1000)
+
+        # Assert
+        self.assertFalse(result.estimated)
+        self.assertEqual(footprint(t).as_dict(), result.as_dict())
+
+    def test_footprint_invalid_sample(self):
+        """Ensure a non-positive sample size raises a ValueError."""
+        # Arrange
+        t = self.create_tree(10)
+
+        # Act/Assert
+        with self.assertRaises(ValueError):
+            footprint(t, sample=0)
+
+    def test_footprint_empty_tree(self):
+        """Ensure the footprint of an empty tree only includes the root node."""
+        # Act
+        result = footprint(RTree())
+
+        # Assert
+        self.assertEqual(1, result.node_count)
+        self.assertEqual(0, result.leaf_entry_count)
+        self.assertGreater(result.nodes, 0)
+        self.assertEqual(0, result.rects + result.entries + result.payload)
+        self.assertEqual(0.0, result.bytes_per_leaf_entry)
@@ -0,0 +1,132 @@
+import math
+import random
+from unittest import TestCase
+from rtreelib import RTree, RStarTree, Rect, RTreeObserver, CountingObserver
+from rtreelib.strategies.base import insert
+from rtreelib.strategies.guttman import guttman_choose_leaf, quadratic_split
+from tests.util import assert_valid_tree
+
+
+class TestObserver(TestCase):
+    """Tests for observing strategy events"""
+
+    @staticmethod
+    def insert_random(t, count: int, seed: int = 1):
+        rnd = random.Random(seed)
+        for i in range(count):
+            x, y = rnd.uniform(0, 100), rnd.uniform(0, 100)
+            t.insert(i, Rect(x, y, x + 1, y + 1))
+
+    def test_counting_observer_guttman(self):
+        """Ensure every insert, overflow, split, and root split is counted for a Guttman tree."""
+        # Arrange
+        t = RTree(max_entries=4)
+        observer = t.observe(CountingObserver())
+
+        # Act
+        self.insert_random(t, 200)
+
+        # Assert
+        self.assertEqual(200, observer.inserts)
+        self.assertEqual(200, observer.choose_leaf)
+        self.assertGreater(observer.splits, 0)
+        self.assertEqual(observer.overflows, observer.splits)
+        self.assertEqual(0, observer.reinserts)
+        self.assertEqual(t.get_height() - 1, observer.grow_tree)
+        self.assertEqual(observer.grow_tree, observer.root_splits)
+        # Each split creates a node, and each time the tree grows a new root node is created
+        self.assertEqual(1 + observer.splits + observer.grow_tree, len(list(t.get_nodes())))
+        self.assertEqual(200, sum(observer.splits_per_insert.values()))
+        self.assertEqual(observer.splits, sum(k * v for k, v in observer.splits_per_insert.items()))
+        self.assertEqual(observer.splits, sum(observer.splits_by_level.values()))
+        self.assertEqual(1000 * observer.splits / 200, observer.per_1k_inserts(observer.splits))
+
+    def test_counting_observer_rstar(self):
+        """Ensure forced reinserts are counted for an R*-tree."""
+        # Arrange
+        t = RStarTree(max_entries=4)
+        observer = t.observe(CountingObserver())
+
+        # Act
+        self.insert_random(t, 200)
+
+        # Assert
+        self.assertEqual(200, observer.inserts)
+        self.assertGreater(observer.reinserts, 0)
+        self.assertEqual(observer.reinserts * math.ceil(0.3 * 5), observer.reinserted_entries)
+        self.assertEqual(observer.reinserts, sum(observer.reinserts_by_level.values()))
+        self.assertTrue(all(count <= t.get_height() - 1 for count in observer.reinserts_per_insert))
+        self.assertEqual(1 + observer.splits + observer.grow_tree, len(list(t.get_nodes())))
+        self.assertEqual(observer.inserts, observer.as_dict()['inserts'])
+        assert_valid_tree(self, t)
+
+    def test_observe_does_not_change_tree(self):
+        """Ensure observing a tree does not change the resulting tree structure."""
+        # Arrange
+        t1, t2 = RStarTree(max_entries=4), RStarTree(max_entries=4)
+        t2.observe(CountingObserver())
+
+        # Act
+        self.insert_random(t1, 100)
+        self.insert_random(t2, 100)
+
+        # Assert (the order of the nodes within each level may differ, since R* splits are computed using sets)
+        levels1, levels2 = t1.get_levels(), t2.get_levels()
+        self.assertEqual(len(levels1), len(levels2))
+        for level1, level2 in zip(levels1, levels2):
+            self.assertCountEqual([n.get_bounding_rect() for n in level1], [n.get_bounding_rect() for n in level2])
+
+    def test_detach(self):
+        """Ensure detaching the observer restores the original strategies, and no more events are received."""
+        # Arrange
+        t = RTree(max_entries=4)
+        observer = t.observe(CountingObserver())
+        self.insert_random(t, 10)
+
+        # Act
+        t.observe(None)
+        self.insert_random(t, 10, seed=2)
+
+        # Assert
+        self.assertIsNone(t.observer)
+        self.assertIs(insert, t.insert_strategy)
+        self.assertIs(guttman_choose_leaf, t.choose_leaf)
+        self.assertIs(quadratic_split, t.overflow_strategy)
+        self.assertEqual(10, observer.inserts)
+
+    def test_detach_with_change_tracking(self):
+        """Ensure detaching the observer keeps change tracking (enabled after attaching the observer) working."""
+        # Arrange
+        t = RTree(max_entries=4)
+        observer = t.observe(CountingObserver())
+        changes = t.track_changes()
+
+        # Act
+        t.observe(None)
+        self.insert_random(t, 20)
+
+        # Assert
+        self.assertEqual(0, observer.inserts)
+        self.assertEqual(0, observer.overflows)
+        self.assertTrue(changes)
+        assert_valid_tree(self, t)
+
+    def test_custom_observer(self):
+        """Ensure a custom observer only needs to override the events it is interested in."""
+        # Arrange
+        class RootObserver(RTreeObserver):
+            def __init__(self):
+                self.roots = []
+
+            def on_grow_tree(self, tree, root):
+                self.roots.append(root)
+
+        t = RTree(max_entries=4)
+        observer = t.observe(RootObserver())
+
+        # Act
+        self.insert_random(t, 50)
+
+        # Assert
+        self.assertEqual(t.get_height() - 1, len(observer.roots))
+        self.assertIs(t.root, observer.roots[-1])
@@ -0,0 +1,178 @@
+import io
+import json
+import os
+import random
+import tempfile
+from contextlib import redirect_stdout
+from unittest import TestCase
+from rtreelib import RTree, RStarTree, Rect, Point
+from rtreelib.oplog import read_oplog, INSERT, DELETE, UPDATE, QUERY_RECT, QUERY_POINT
+from rtreelib.replay import replay, summarize, main
+from tests.util import assert_valid_tree
+
+
+class TestOpLog(TestCase):
+    """Tests for recording and replaying operation logs"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.bin')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_record(self):
+        """Ensure inserts, updates, deletes, and queries are recorded in order."""
+        # Arrange
+        t = RTree(max_entries=4)
+        t.insert('a', Rect(0, 0, 1, 1))
+
+        # Act
+        t.record(self.path)
+        b = t.insert('b', Rect(1, 1, 2, 2))
+        c = t.insert('c', Rect(2, 2, 3, 3))
+        list(t.query(Rect(0, 0, 5, 5)))
+        t.update(b, Rect(4, 4, 5, 5))
+        t.delete(c)
+        t.count((1, 1))
+        t.record(None)
+        t.insert('d', Rect(3, 3, 4, 4))
+
+        # Assert
+        self.assertIsNone(t.oplog)
+        self.assertEqual([
+            (INSERT, 0, Rect(1, 1, 2, 2)),
+            (INSERT, 1, Rect(2, 2, 3, 3)),
+            (QUERY_RECT, None, Rect(0, 0, 5, 5)),
+            (UPDATE, 0, Rect(4, 4, 5, 5)),
+            (DELETE, 1, None),
+            (QUERY_POINT, None, Point(1, 1)),
+        ], list(read_oplog(self.path)))
+
+    def test_record_insert_many(self):
+        """Ensure entries inserted using insert_many are recorded as individual inserts."""
+        # Arrange
+        t = RStarTree(max_entries=4)
+        t.record(self.path)
+
+        # Act
+        t.insert_many([(i, Rect(i, i, i + 1, i + 1)) for i in range(10)])
+        t.record(None)
+
+        # Assert
+        self.assertEqual([(INSERT, i, Rect(i, i, i + 1, i + 1)) for i in range(10)], list(read_oplog(self.path)))
+
+    def test_record_append(self):
+        """Ensure recording to an existing log appends to it, continuing the entry IDs."""
+        # Arrange
+        t = RTree()
+        t.record(self.path)
+        t.insert('a', Rect(0, 0, 1, 1))
+        t.record(None)
+
+        # Act
+        t.record(self.path)
+        b = t.insert('b', Rect(1, 1, 2, 2))
+        t.delete(b)
+        t.record(None)
+
+        # Assert
+        self.assertEqual([
+            (INSERT, 0, Rect(0, 0, 1, 1)),
+            (INSERT, 1, Rect(1, 1, 2, 2)),
+            (DELETE, 1, None),
+        ], list(read_oplog(self.path)))
+
+    def test_read_invalid_header(self):
+        """Ensure reading a file that is not an operation log raises a ValueError."""
+        # Arrange
+        with open(self.path, 'wb') as f:
+            f.write(b'not an operation log')
+
+        # Act/Assert
+        with self.assertRaises(ValueError):
+            list(read_oplog(self.path))
+
+    def test_read_truncated(self):
+        """Ensure a truncated last record is ignored."""
+        # Arrange
+        t = RTree()
+        t.record(self.path)
+        t.insert('a', Rect(0, 0, 1, 1))
+        t.insert('b', Rect(1, 1, 2, 2))
+        t.record(None)
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 5)
+
+        # Act
+        ops = list(read_oplog(self.path))
+
+        # Assert
+        self.assertEqual([(INSERT, 0, Rect(0, 0, 1, 1))], ops)
+
+    def test_replay(self):
+        """Ensure replaying a log against another strategy results in a tree with the same leaf entries."""
+        # Arrange
+        rnd = random.Random(1)
+        t = RTree(max_entries=4)
+        t.record(self.path)
+        entries = []
+        for i in range(300):
+            x, y = rnd.uniform(0, 100), rnd.uniform(0, 100)
+            entries.append(t.insert(i, Rect(x, y, x + 1, y + 1)))
+            if i % 10 == 0:
+                t.count(Rect(x, y, x + 10, y + 10))
+        for entry in entries[:50]:
+            t.delete(entry)
+        for entry in entries[50:100]:
+            x, y = rnd.uniform(0, 100), rnd.uniform(0, 100)
+            t.update(entry, Rect(x, y, x + 1, y + 1))
+        t.record(None)
+        replayed = RStarTree(max_entries=8)
+
+        # Act
+        latencies = replay(self.path, replayed)
+
+        # Assert
+        assert_valid_tree(self, replayed)
+        self.assertCountEqual([(e.data, e.rect) for e in t.get_leaf_entries()],
+                              [(e.data, e.rect) for e in replayed.get_leaf_entries()])
+        self.assertEqual(300, len(latencies['insert']))
+        self.assertEqual(50, len(latencies['delete']))
+        self.assertEqual(50, len(latencies['update']))
+        self.assertEqual(30, len(latencies['query_rect']))
+        summary = summarize(latencies)
+        self.assertEqual(430, summary['total']['count'])
+        self.assertNotIn('query_point', summary)
+        self.assertLessEqual(summary['total']['p50_us'], summary['total']['p99_us'])
+        self.assertLessEqual(summary['total']['p99_us'], summary['total']['max_us'])
+
+    def test_replay_cli(self):
+        """Ensure the replay command writes its results as JSON."""
+        # Arrange
+        t = RTree()
+        t.record(self.path)
+        for i in range(20):
+            t.insert(i, Rect(i, i, i + 1, i + 1))
+        list(t.query(Point(5, 5)))
+        t.record(None)
+        fd, json_path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+
+        # Act
+        try:
+            with redirect_stdout(io.StringIO()):
+                result = main([self.path, '--tree', 'rstar', '--max-entries', '4', '--json', json_path])
+            with open(json_path, 'r', encoding='utf-8') as f:
+                output = json.load(f)
+        finally:
+            os.remove(json_path)
+
+        # Assert
+        self.assertEqual(0, result)
+        self.assertEqual('rstar', output['tree'])
+        self.assertEqual(4, output['max_entries'])
+        self.assertEqual(20, output['operations']['insert']['count'])
+        self.assertEqual(1, output['operations']['query_point']['count'])
+        self.assertEqual(21, output['operations']['total']['count'])
+        self.assertEqual(20, output['stats']['leaf_entry_count'])
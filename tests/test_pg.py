@@ -0,0 +1,498 @@
+import re
+import csv
+import io
+import threading
+from unittest import TestCase, skipIf
+from unittest.mock import MagicMock, patch
+from rtreelib import RTree, RStarTree, Rect
+from rtreelib import db
+from tests.util import create_complex_tree, assert_valid_tree, assert_same_structure
+
+try:
+    from rtreelib import pg
+except RuntimeError:
+    pg = None
+
+
+class MockCursor:
+    """Stand-in for a psycopg2 cursor, which records the statements it executes and the data copied to each table"""
+
+    def __init__(self):
+        self.statements = []
+        self.copied = []
+        self._result = None
+        self._next_ids = {'rtree': 1, 'rtree_node': 101, 'rtree_entry': 1001}
+        # obj_id -> id of the rows in each table (populated by copy_expert)
+        self.obj_ids = {'rtree_node': {}, 'rtree_entry': {}}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+        if 'INSERT INTO public.rtree ' in sql:
+            self._result = {'id': self._next_ids['rtree']}
+        elif 'obj_id = ANY' in sql:
+            ids = self.obj_ids['rtree_entry' if 'rtree_entry' in sql else 'rtree_node']
+            self._result = [{'id': ids[o], 'obj_id': o} for o in params['obj_ids'] if o in ids]
+        elif 'setval' in sql:
+            table = 'rtree_node' if 'rtree_node' in sql else 'rtree_entry'
+            self._next_ids[table] += params['count']
+            self._result = {'last_id': self._next_ids[table] - 1}
+        else:
+            self._result = None
+
+    def fetchone(self):
+        return self._result
+
+    def fetchall(self):
+        return self._result
+
+    def copy_expert(self, sql, file):
+        self.statements.append((sql, None))
+        rows = []
+        while True:
+            chunk = file.read(7)
+            if not chunk:
+                break
+            rows.append(chunk)
+        self.copied.append((sql, list(csv.reader(io.StringIO(''.join(rows))))))
+        table = 'rtree_node' if 'rtree_node' in sql else 'rtree_entry'
+        for row in self.copied[-1][1]:
+            self.obj_ids[table][int(row[1])] = int(row[0])
+
+
+class MockNamedCursor:
+    """Stand-in for a psycopg2 server-side cursor, which returns the rows of the table being queried"""
+
+    def __init__(self, tables, name):
+        self.tables = tables
+        self.name = name
+        self.itersize = None
+        self.rows = None
+        self.sql = None
+        self.params = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql, params=None):
+        self.sql, self.params = sql, params
+        if 'FROM public.rtree_entry' in sql:
+            self.rows = self.tables['rtree_entry']
+        elif 'FROM public.rtree_node' in sql:
+            self.rows = self.tables['rtree_node']
+        else:
+            self.rows = self.tables['query']
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class MockPool:
+    """Stand-in for a psycopg2 connection pool, which hands out mock connections and records when they are committed"""
+
+    def __init__(self, fail_worker: int = None):
+        self.conns = []
+        self.cursors = []
+        self.events = []
+        self.fail_worker = fail_worker
+        self._lock = threading.Lock()
+
+    def getconn(self):
+        with self._lock:
+            return self._getconn()
+
+    def _getconn(self):
+        index = len(self.conns)
+        cursor = MockCursor()
+        if index == self.fail_worker:
+            cursor.copy_expert = MagicMock(side_effect=RuntimeError("COPY failed"))
+        conn = MagicMock()
+        conn.cursor.return_value = cursor
+        conn.commit.side_effect = lambda: self.events.append(('commit', index))
+        conn.rollback.side_effect = lambda: self.events.append(('rollback', index))
+        self.conns.append(conn)
+        self.cursors.append(cursor)
+        return conn
+
+    def putconn(self, conn):
+        pass
+
+
+def to_import_rows(*cursors: MockCursor):
+    """Converts the rows copied by a bulk export to the rows returned by the queries used by import_from_postgis."""
+    tables = {'rtree_node': [], 'rtree_entry': []}
+    for sql, rows in [copied for cursor in cursors for copied in cursor.copied]:
+        for row in rows:
+            if 'rtree_node' in sql:
+                tables['rtree_node'].append({'id': int(row[0]), 'parent_entry_id': int(row[6]) if row[6] else None,
+                                             'leaf': row[7] == 't'})
+            else:
+                coords = [float(c) for c in re.findall(r'[-\d.]+', row[4].split(';')[1])]
+                tables['rtree_entry'].append({'id': int(row[0]), 'parent_node_id': int(row[3]), 'min_x': coords[0],
+                                              'min_y': coords[1], 'max_x': coords[4], 'max_y': coords[5],
+                                              'leaf': row[5] == 't', 'data': row[6]})
+    tables['rtree_node'].sort(key=lambda row: row['id'])
+    tables['rtree_entry'].sort(key=lambda row: row['id'])
+    return tables
+
+
+@skipIf(pg is None, "psycopg2 is not installed")
+class TestPostGIS(TestCase):
+    """Tests for exporting R-trees to PostGIS (using a mock connection)"""
+
+    def export(self, t: RTree, **kwargs) -> MockCursor:
+        cursor = MockCursor()
+        conn = MagicMock()
+        conn.cursor.return_value = cursor
+        rtree_id = pg.export_to_postgis(t, conn=conn, bulk=True, **kwargs)
+        self.assertEqual(1, rtree_id)
+        conn.commit.assert_called_once()
+        return cursor
+
+    def test_bulk_export_statements(self):
+        """
+        Ensure the bulk export reserves IDs, drops the indexes, copies each level, and then rebuilds the indexes (when
+        rebuild_indexes is True).
+        """
+        # Arrange
+        t = create_complex_tree(self)
+
+        # Act
+        cursor = self.export(t, rebuild_indexes=True)
+
+        # Assert
+        kinds = []
+        for sql, _ in cursor.statements:
+            kinds.append(next(k for k in ['INSERT', 'LOCK', 'setval', 'DROP INDEX', 'COPY public.rtree_node',
+                                          'COPY public.rtree_entry', 'CREATE INDEX'] if k in sql))
+        self.assertEqual(['INSERT', 'LOCK', 'setval', 'LOCK', 'setval', 'DROP INDEX'] +
+                         ['COPY public.rtree_node', 'COPY public.rtree_entry'] * 3 + ['CREATE INDEX'], kinds)
+        self.assertFalse(any('RETURNING' in sql for sql, _ in cursor.statements[1:]))
+
+    def test_bulk_export_rows(self):
+        """Ensure the copied rows use the reserved IDs, and that every parent is copied before its children."""
+        # Arrange
+        t = create_complex_tree(self)
+
+        # Act
+        cursor = self.export(t)
+
+        # Assert
+        nodes = [row for sql, rows in cursor.copied if 'rtree_node' in sql for row in rows]
+        entries = [row for sql, rows in cursor.copied if 'rtree_entry' in sql for row in rows]
+        self.assertEqual([str(i) for i in range(101, 108)], [row[0] for row in nodes])
+        self.assertEqual([str(i) for i in range(1001, 1017)], [row[0] for row in entries])
+        seen_nodes, seen_entries = set(), set()
+        for sql, rows in cursor.copied:
+            for row in rows:
+                if 'rtree_node' in sql:
+                    self.assertTrue(row[6] == '' or row[6] in seen_entries)
+                    seen_nodes.add(row[0])
+                else:
+                    self.assertIn(row[3], seen_nodes)
+                    seen_entries.add(row[0])
+        self.assertEqual(['f', 'f', 'f', 't', 't', 't', 't'], [row[7] for row in nodes])
+        self.assertCountEqual(list('abcdefghij'), [row[6] for row in entries if row[5] == 't'])
+
+    def test_bulk_export_geometry_and_data(self):
+        """Ensure bounding boxes are copied as EWKT polygons, and that NULLs can be told apart from empty strings."""
+        # Arrange
+        t = RTree()
+        t.insert('', Rect(0, 0.5, 1, 2))
+        t.insert(None, Rect(3, 4, 5, 6))
+        t.insert('say "hi", bye', Rect(7, 8, 9, 10))
+
+        # Act
+        cursor = self.export(t, srid=4326)
+
+        # Assert
+        _, node_rows = cursor.copied[0]
+        self.assertEqual(['1', '0', 'SRID=4326;POLYGON((0 0.5,0 10,9 10,9 0.5,0 0.5))', '', 't'], node_rows[0][3:])
+        sql, _ = cursor.copied[1]
+        self.assertIn('FORMAT csv', sql)
+        raw = [db.csv_row(e.data) for e in t.root.entries]
+        self.assertEqual(['""\n', '\n', '"say ""hi"", bye"\n'], raw)
+
+    def test_bulk_export_keep_indexes(self):
+        """Ensure the indexes are left alone by default (when rebuild_indexes is False)."""
+        # Arrange
+        t = create_complex_tree(self)
+
+        # Act
+        cursor = self.export(t)
+
+        # Assert
+        self.assertFalse(any('INDEX' in sql for sql, _ in cursor.statements))
+
+    def test_templates_are_cached(self):
+        """Ensure SQL templates are only read once."""
+        # Arrange
+        db.get_template.cache_clear()
+        t = create_complex_tree(self)
+
+        # Act
+        self.export(t, rebuild_indexes=True)
+
+        # Assert
+        info = db.get_template.cache_info()
+        self.assertEqual(7, info.misses)
+        self.assertGreater(info.hits, 0)
+
+    def import_tree(self, t: RTree, tables=None, **kwargs):
+        tables = tables or to_import_rows(self.export(t))
+        conn = MagicMock()
+        named_cursors = []
+
+        def cursor(name=None, **_):
+            named_cursors.append(MockNamedCursor(tables, name))
+            return named_cursors[-1]
+
+        conn.cursor.side_effect = cursor
+        result = pg.import_from_postgis(1, conn=conn, **kwargs)
+        self.assertEqual(2, len(named_cursors))
+        self.assertTrue(all(c.name is not None and c.itersize == kwargs.get('batch_size', 10000)
+                            for c in named_cursors))
+        return result
+
+    def test_import(self):
+        """Ensure an imported tree has the same structure as the tree that was exported."""
+        # Arrange
+        t = create_complex_tree(self)
+
+        # Act
+        result = self.import_tree(t, batch_size=2)
+
+        # Assert
+        self.assertIsInstance(result, RTree)
+        self.assertIsNone(result.root.parent)
+        assert_same_structure(self, t.root, result.root)
+
+    def test_import_with_adapter(self):
+        """Ensure the data of each leaf entry is converted using the adapter, and the tree class is respected."""
+        # Arrange
+        t = RStarTree(max_entries=4)
+        for i in range(50):
+            t.insert(i, Rect(i, i, i + 1, i + 1))
+
+        # Act
+        result = self.import_tree(t, tree_cls=RStarTree, max_entries=4, adapter=int)
+
+        # Assert
+        self.assertIsInstance(result, RStarTree)
+        assert_same_structure(self, t.root, result.root)
+        assert_valid_tree(self, result)
+        result.insert(50, Rect(50, 50, 51, 51))
+        self.assertEqual(list(range(51)), sorted(e.data for e in result.get_leaf_entries()))
+
+    def test_import_not_found(self):
+        """Ensure an error is raised if the R-tree does not exist."""
+        # Arrange
+        conn = MagicMock()
+        conn.cursor.side_effect = lambda name=None, **_: MockNamedCursor({'rtree_node': [], 'rtree_entry': []}, name)
+
+        # Act/Assert
+        with self.assertRaises(ValueError):
+            pg.import_from_postgis(42, conn=conn)
+
+    def sync(self, t: RTree, cursor: MockCursor):
+        cursor.statements.clear()
+        conn = MagicMock()
+        conn.cursor.return_value = cursor
+        with patch.object(pg, 'execute_values') as execute_values:
+            pg.sync_to_postgis(t, 1, conn=conn)
+        conn.commit.assert_called_once()
+        calls = {}
+        for args, kwargs in execute_values.call_args_list:
+            _, sql, rows = args
+            kind = next(k for k in ['INSERT INTO public.rtree_node', 'INSERT INTO public.rtree_entry',
+                                    'UPDATE public.rtree_node', 'UPDATE public.rtree_entry'] if k in sql)
+            calls[kind] = rows
+        return calls
+
+    def test_sync_requires_change_tracking(self):
+        """Ensure an error is raised when syncing a tree that does not have change tracking enabled."""
+        # Arrange
+        t = create_complex_tree(self)
+
+        # Act/Assert
+        with self.assertRaises(RuntimeError):
+            pg.sync_to_postgis(t, 1, conn=MagicMock())
+
+    def test_sync_insert(self):
+        """Ensure syncing after an insert only writes the new entry and the modified nodes."""
+        # Arrange
+        t = RTree(max_entries=8)
+        for i in range(500):
+            t.insert(i, Rect(i, i % 50, i + 1, i % 50 + 1))
+        cursor = self.export(t)
+        changes = t.track_changes()
+
+        # Act
+        entry = t.insert('new', Rect(250.2, 10.2, 250.8, 10.8))
+        calls = self.sync(t, cursor)
+
+        # Assert
+        new_rows = calls['INSERT INTO public.rtree_entry']
+        self.assertEqual([(id(entry), 'new')], [(row[1], row[-1]) for row in new_rows])
+        self.assertNotIn('INSERT INTO public.rtree_node', calls)
+        updated_nodes = calls['UPDATE public.rtree_node']
+        self.assertEqual(t.get_height(), len(updated_nodes))
+        self.assertEqual(list(range(t.get_height())), sorted(row[1] for row in updated_nodes))
+        self.assertLess(len(calls['UPDATE public.rtree_entry']), 3 * t.max_entries)
+        self.assertFalse(changes)
+        self.assertFalse(any('DELETE' in sql or 'level + ' in sql for sql, _ in cursor.statements))
+
+    def test_sync_split_and_delete(self):
+        """Ensure syncing after splits, root growth, and deletes writes new nodes, shifts levels, and deletes rows."""
+        # Arrange
+        t = RTree(max_entries=4)
+        entries = [t.insert(i, Rect(i, i, i + 1, i + 1)) for i in range(16)]
+        cursor = self.export(t)
+        t.track_changes()
+        height = t.get_height()
+
+        # Act
+        for i in range(16, 40):
+            t.insert(i, Rect(i, i, i + 1, i + 1))
+        for entry in entries[:10]:
+            t.delete(entry)
+        calls = self.sync(t, cursor)
+
+        # Assert
+        self.assertGreater(t.get_height(), height)
+        shift = next(params for sql, params in cursor.statements if 'level + ' in sql)
+        self.assertEqual(t.get_height() - height, shift['delta'])
+        new_nodes = calls['INSERT INTO public.rtree_node']
+        self.assertTrue(new_nodes)
+        self.assertTrue(all(row[0] >= 101 + len(cursor.obj_ids['rtree_node']) for row in new_nodes))
+        deleted = next(params for sql, params in cursor.statements if 'DELETE' in sql)
+        exported_entries = {int(row[0]): row[6] for _, rows in cursor.copied[1::2] for row in rows}
+        deleted_data = sorted(int(exported_entries[i]) for i in deleted['entry_ids'] if exported_entries[i])
+        self.assertEqual(list(range(10)), deleted_data)
+        updated = {row[0] for row in calls['UPDATE public.rtree_node']}
+        self.assertFalse(updated & set(deleted['node_ids']))
+
+    def test_parallel_export(self):
+        """
+        Ensure a parallel export writes each subtree on a separate connection, writes the top levels last (after all
+        workers have committed), and links the subtrees to their parent entries, resulting in the same tree.
+        """
+        # Arrange
+        t = RTree(max_entries=4)
+        for i in range(200):
+            t.insert(i, Rect(i % 20, i // 20, i % 20 + 1, i // 20 + 1))
+        mock_pool = MockPool()
+
+        # Act
+        with patch.object(pg, 'pool', mock_pool), patch.object(pg, 'execute_values') as execute_values:
+            rtree_id = pg.export_to_postgis(t, workers=3)
+
+        # Assert
+        self.assertEqual(1, rtree_id)
+        self.assertEqual(4, len(mock_pool.conns))
+        main, workers = mock_pool.cursors[0], mock_pool.cursors[1:]
+        self.assertTrue(all(cursor.copied for cursor in workers))
+        self.assertEqual([('commit', 0)], mock_pool.events[:1])
+        self.assertCountEqual([('commit', i) for i in range(1, 4)], mock_pool.events[1:4])
+        self.assertEqual([('commit', 0)], mock_pool.events[4:])
+        # Top levels are written by the main connection, after the subtrees
+        main_levels = {int(row[4]) for sql, rows in main.copied if 'rtree_node' in sql for row in rows}
+        worker_levels = {int(row[4]) for c in workers for sql, rows in c.copied if 'rtree_node' in sql for row in rows}
+        self.assertEqual(set(range(len(t.get_levels()))), main_levels | worker_levels)
+        self.assertLess(max(main_levels), min(worker_levels))
+        # Linking the subtrees to their parent entries results in the original tree
+        tables = to_import_rows(*mock_pool.cursors)
+        (_, sql, links), _ = execute_values.call_args
+        self.assertIn('parent_entry_id', sql)
+        nodes = {row['id']: row for row in tables['rtree_node']}
+        for node_id, parent_entry_id in links:
+            self.assertIsNone(nodes[node_id]['parent_entry_id'])
+            nodes[node_id]['parent_entry_id'] = parent_entry_id
+        assert_same_structure(self, t.root, self.import_tree(t, tables, adapter=int).root)
+
+    def test_parallel_export_failure(self):
+        """Ensure all workers are rolled back, and committed rows are deleted, if a worker fails."""
+        # Arrange
+        t = create_complex_tree(self)
+        mock_pool = MockPool(fail_worker=2)
+
+        # Act
+        with patch.object(pg, 'pool', mock_pool), patch.object(pg, 'execute_values'):
+            with self.assertRaises(RuntimeError):
+                pg.export_to_postgis(t, workers=2)
+
+        # Assert
+        self.assertNotIn(('commit', 1), mock_pool.events)
+        self.assertIn(('rollback', 1), mock_pool.events)
+        self.assertIn(('rollback', 2), mock_pool.events)
+        self.assertTrue(any('DELETE FROM public.rtree ' in sql for sql, _ in mock_pool.cursors[0].statements))
+        self.assertEqual(('commit', 0), mock_pool.events[-1])
+
+    def test_parallel_export_requires_pool(self):
+        """Ensure a parallel export cannot be done using a single connection object."""
+        # Act/Assert
+        with self.assertRaises(ValueError):
+            pg.export_to_postgis(create_complex_tree(self), conn=MagicMock(), workers=2)
+
+    def build_from_query(self, rows, *args, **kwargs):
+        conn = MagicMock()
+        named_cursors = []
+
+        def cursor(name=None, **_):
+            named_cursors.append(MockNamedCursor({'query': rows}, name))
+            return named_cursors[-1]
+
+        conn.cursor.side_effect = cursor
+        result = pg.build_from_query(*args, conn=conn, **kwargs)
+        self.assertEqual(1, len(named_cursors))
+        self.assertIsNotNone(named_cursors[0].name)
+        conn.commit.assert_called_once()
+        return result, named_cursors[0]
+
+    def test_build_from_query(self):
+        """Ensure a tree is bulk-loaded from the rows of a query, streamed using a server-side cursor."""
+        # Arrange
+        rows = [{'gid': i, 'x1': i % 30, 'y1': i // 30, 'x2': i % 30 + 1, 'y2': i // 30 + 1} for i in range(900)]
+
+        # Act
+        t, cursor = self.build_from_query(rows, 'SELECT * FROM parcels WHERE zone = %(zone)s',
+                                          ['x1', 'y1', 'x2', 'y2'], 'gid', tree_cls=RStarTree, max_entries=16,
+                                          params={'zone': 'A'}, batch_size=100)
+
+        # Assert
+        self.assertEqual('SELECT * FROM parcels WHERE zone = %(zone)s', cursor.sql)
+        self.assertEqual({'zone': 'A'}, cursor.params)
+        self.assertEqual(100, cursor.itersize)
+        self.assertIsInstance(t, RStarTree)
+        assert_valid_tree(self, t)
+        self.assertEqual(3, t.get_height())
+        self.assertCountEqual(range(900), [e.data for e in t.get_leaf_entries()])
+        self.assertCountEqual([31, 32, 61, 62], [e.data for e in t.query(Rect(1.5, 1.5, 2.5, 2.5))])
+
+    def test_build_from_query_geometry_column(self):
+        """Ensure the envelopes are computed by the database when a geometry column is given."""
+        # Arrange
+        rows = [{'min_x': 0, 'min_y': 0, 'max_x': 1, 'max_y': 1, 'name': 'a'}]
+
+        # Act
+        t, cursor = self.build_from_query(rows, 'SELECT * FROM parcels;', 'geom', 'name')
+
+        # Assert
+        self.assertIn('ST_XMin(q.geom) AS min_x', cursor.sql)
+        self.assertIn('FROM (SELECT * FROM parcels) q', cursor.sql)
+        self.assertIn('q.name', cursor.sql)
+        self.assertEqual([('a', Rect(0, 0, 1, 1))], [(e.data, e.rect) for e in t.get_leaf_entries()])
+
+    def test_build_from_query_invalid_columns(self):
+        """Ensure an error is raised if rect_columns does not name four columns."""
+        # Act/Assert
+        with self.assertRaises(ValueError):
+            pg.build_from_query('SELECT * FROM parcels', ['x', 'y'], 'gid', conn=MagicMock())
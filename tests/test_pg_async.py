@@ -0,0 +1,234 @@
+import asyncio
+import csv
+import io
+from unittest import TestCase, skipIf
+from unittest.mock import patch
+from rtreelib import RTree, Rect
+from tests.util import create_complex_tree
+from tests.test_pg import to_import_rows
+
+try:
+    from rtreelib import pg_async
+except RuntimeError:
+    pg_async = None
+
+
+class StubCopy:
+    """Stand-in for a psycopg 3 AsyncCopy object, which collects the data written to it"""
+
+    def __init__(self, cursor, sql):
+        self.cursor = cursor
+        self.sql = sql
+        self.chunks = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        self.cursor.copied.append((self.sql, list(csv.reader(io.StringIO(''.join(self.chunks))))))
+
+    async def write(self, data):
+        self.chunks.append(data)
+
+
+class StubAsyncCursor:
+    """Stand-in for a psycopg 3 AsyncCursor (or AsyncServerCursor if a name is given), backed by in-memory tables"""
+
+    def __init__(self, conn, name=None):
+        self.conn = conn
+        self.name = name
+        self.itersize = None
+        self.statements = conn.statements
+        self.copied = conn.copied
+        self._result = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+        if 'INSERT INTO public.rtree ' in sql:
+            self._result = [{'id': 1}]
+        elif 'setval' in sql:
+            table = 'rtree_node' if 'rtree_node' in sql else 'rtree_entry'
+            self.conn.next_ids[table] += params['count']
+            self._result = [{'last_id': self.conn.next_ids[table] - 1}]
+        elif sql.startswith('SELECT'):
+            self._result = self.conn.tables['rtree_entry' if 'FROM public.rtree_entry' in sql else 'rtree_node']
+        else:
+            self._result = None
+
+    async def fetchone(self):
+        return self._result[0]
+
+    def copy(self, sql):
+        self.statements.append((sql, None))
+        return StubCopy(self, sql)
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for row in self._result:
+            yield row
+
+
+class StubAsyncConnection:
+    """Stand-in for a psycopg 3 AsyncConnection"""
+
+    def __init__(self, tables=None):
+        self.tables = tables
+        self.statements = []
+        self.copied = []
+        self.cursors = []
+        self.next_ids = {'rtree_node': 101, 'rtree_entry': 1001}
+        self.commits = 0
+        self.closed = False
+
+    def cursor(self, name=None, row_factory=None):
+        self.cursors.append(StubAsyncCursor(self, name))
+        return self.cursors[-1]
+
+    async def commit(self):
+        self.commits += 1
+
+    async def close(self):
+        self.closed = True
+
+
+@skipIf(pg_async is None, "psycopg is not installed")
+class TestPostGISAsync(TestCase):
+    """Tests for exporting R-trees to PostGIS asynchronously (using a stub connection)"""
+
+    def test_create_tables(self):
+        """Ensure the tables are created using the same template as the pg module."""
+        # Arrange
+        conn = StubAsyncConnection()
+
+        # Act
+        asyncio.run(pg_async.create_rtree_tables(conn, srid=4326, datatype=int))
+
+        # Assert
+        sql, _ = conn.statements[0]
+        self.assertIn('CREATE TABLE public.rtree_entry', sql)
+        self.assertIn('GEOMETRY(Polygon, 4326)', sql)
+        self.assertIn('data INT', sql)
+        self.assertEqual(1, conn.commits)
+
+    def test_export_statements(self):
+        """Ensure the export reserves IDs without combining statements, and copies each level (nodes first)."""
+        # Arrange
+        t = create_complex_tree(self)
+        conn = StubAsyncConnection()
+
+        # Act
+        rtree_id = asyncio.run(pg_async.export_to_postgis(t, conn))
+
+        # Assert
+        self.assertEqual(1, rtree_id)
+        self.assertEqual(1, conn.commits)
+        self.assertFalse(conn.closed)
+        self.assertTrue(all(params is None or sql.count(';') == 1 for sql, params in conn.statements))
+        kinds = [next(k for k in ['INSERT', 'LOCK', 'setval', 'DROP INDEX', 'COPY public.rtree_node',
+                                  'COPY public.rtree_entry', 'CREATE INDEX'] if k in sql)
+                 for sql, _ in conn.statements]
+        self.assertEqual(['INSERT', 'LOCK', 'setval', 'LOCK', 'setval'] +
+                         ['COPY public.rtree_node', 'COPY public.rtree_entry'] * 3, kinds)
+        nodes = [row for sql, rows in conn.copied if 'rtree_node' in sql for row in rows]
+        entries = [row for sql, rows in conn.copied if 'rtree_entry' in sql for row in rows]
+        self.assertEqual([str(i) for i in range(101, 108)], [row[0] for row in nodes])
+        self.assertEqual([str(i) for i in range(1001, 1017)], [row[0] for row in entries])
+
+    def test_export_rebuild_indexes(self):
+        """Ensure the indexes are dropped before copying and rebuilt afterwards when rebuild_indexes is True."""
+        # Arrange
+        t = create_complex_tree(self)
+        conn = StubAsyncConnection()
+
+        # Act
+        asyncio.run(pg_async.export_to_postgis(t, conn, rebuild_indexes=True))
+
+        # Assert
+        statements = [sql for sql, _ in conn.statements]
+        drop = next(i for i, sql in enumerate(statements) if 'DROP INDEX' in sql)
+        create = next(i for i, sql in enumerate(statements) if 'CREATE INDEX' in sql)
+        copies = [i for i, sql in enumerate(statements) if 'COPY' in sql]
+        self.assertLess(drop, min(copies))
+        self.assertEqual(len(statements) - 1, create)
+
+    def test_export_writes_in_chunks(self):
+        """Ensure large levels are written to COPY in several chunks rather than all at once."""
+        # Arrange
+        t = RTree(max_entries=4)
+        for i in range(2000):
+            t.insert(i, Rect(i, i, i + 1, i + 1))
+        conn = StubAsyncConnection()
+        copies = []
+        copy = StubAsyncCursor.copy
+
+        def record_copy(cursor, sql):
+            copies.append(copy(cursor, sql))
+            return copies[-1]
+
+        # Act
+        with patch.object(StubAsyncCursor, 'copy', record_copy), patch.object(pg_async, 'COPY_CHUNK_SIZE', 1000):
+            asyncio.run(pg_async.export_to_postgis(t, conn))
+
+        # Assert
+        leaf_entries = copies[-1]
+        self.assertGreater(len(leaf_entries.chunks), 1)
+        self.assertTrue(all(len(chunk) < 1200 for chunk in leaf_entries.chunks))
+        self.assertEqual(2000, len(conn.copied[-1][1]))
+
+    def test_round_trip(self):
+        """Ensure a tree exported asynchronously can be imported asynchronously with the same structure."""
+        # Arrange
+        t = create_complex_tree(self)
+        export_conn = StubAsyncConnection()
+        asyncio.run(pg_async.export_to_postgis(t, export_conn))
+        conn = StubAsyncConnection(to_import_rows(export_conn))
+
+        # Act
+        result = asyncio.run(pg_async.import_from_postgis(1, conn, batch_size=500))
+
+        # Assert
+        self.assertEqual([[[(e.rect, e.data) for e in n.entries] for n in level] for level in t.get_levels()],
+                         [[[(e.rect, e.data) for e in n.entries] for n in level] for level in result.get_levels()])
+        self.assertTrue(all(n.parent is None or n.parent_entry.child is n for n in result.get_nodes()))
+        self.assertEqual(['rtree_node_1', 'rtree_entry_1'], [c.name for c in conn.cursors])
+        self.assertTrue(all(c.itersize == 500 for c in conn.cursors))
+        self.assertEqual(1, conn.commits)
+
+    def test_import_missing_tree(self):
+        """Ensure an error is raised if the tree does not exist."""
+        # Arrange
+        conn = StubAsyncConnection({'rtree_node': [], 'rtree_entry': []})
+
+        # Act/Assert
+        with self.assertRaises(ValueError):
+            asyncio.run(pg_async.import_from_postgis(1, conn))
+
+    def test_connect_with_kwargs(self):
+        """Ensure a connection is opened (and closed afterwards) when connection keyword arguments are given."""
+        # Arrange
+        conn = StubAsyncConnection()
+
+        async def connect(**kwargs):
+            self.assertEqual({'dbname': 'test'}, kwargs)
+            return conn
+
+        # Act
+        with patch.object(pg_async.psycopg.AsyncConnection, 'connect', connect):
+            asyncio.run(pg_async.export_to_postgis(create_complex_tree(self), dbname='test'))
+
+        # Assert
+        self.assertTrue(conn.closed)
+
+    def test_requires_connection(self):
+        """Ensure an error is raised if neither a connection nor connection keyword arguments are given."""
+        # Act/Assert
+        with self.assertRaises(RuntimeError):
+            asyncio.run(pg_async.create_rtree_tables())
@@ -142,3 +142,10 @@ class TestRect(TestCase):
         # Assert
         self.assertTrue(isclose(4, centroid[0], rel_tol=EPSILON))
         self.assertTrue(isclose(3.5, centroid[1], rel_tol=EPSILON))
+
+    def test_contains(self):
+        """Tests that a rectangle contains rectangles within (or on) its borders, but not partially overlapping ones"""
+        r = Rect(min_x=0, min_y=0, max_x=4, max_y=4)
+        self.assertTrue(r.contains(Rect(min_x=1, min_y=1, max_x=2, max_y=2)))
+        self.assertTrue(r.contains(Rect(min_x=0, min_y=0, max_x=4, max_y=4)))
+        self.assertFalse(r.contains(Rect(min_x=3, min_y=3, max_x=5, max_y=5)))
@@ -0,0 +1,138 @@
+import random
+from unittest import TestCase
+from rtreelib import RTree, RStarTree, Rect, Point, ShardedRTree
+from rtreelib.models.location import rect_distance
+
+
+class TestSharded(TestCase):
+    """Tests for sharded R-trees"""
+
+    @staticmethod
+    def create_items(count: int, seed: int = 1):
+        rnd = random.Random(seed)
+        items = []
+        for i in range(count):
+            x, y = rnd.uniform(0, 100), rnd.uniform(0, 100)
+            items.append((i, Rect(x, y, x + rnd.uniform(0, 3), y + rnd.uniform(0, 3))))
+        return items
+
+    @staticmethod
+    def create_reference(items):
+        t = RTree(max_entries=8)
+        for data, rect in items:
+            t.insert(data, rect)
+        return t
+
+    def assert_same_results(self, reference: RTree, sharded: ShardedRTree, locations):
+        for loc in locations:
+            self.assertCountEqual([e.data for e in reference.query(loc)], [e.data for e in sharded.query(loc)])
+            self.assertEqual(reference.count(loc), sharded.count(loc))
+
+    def assert_same_nearest(self, reference: RTree, sharded: ShardedRTree, loc: Rect, k: int):
+        expected = [rect_distance(loc, e.rect) for e in reference.nearest(loc, k)]
+        actual = [rect_distance(loc, e.rect) for e in sharded.nearest(loc, k)]
+        self.assertEqual(expected, actual)
+
+    def test_grid(self):
+        """Ensure queries against a grid-sharded tree (with worker processes) match a single tree."""
+        # Arrange
+        items = self.create_items(500)
+        reference = self.create_reference(items)
+        locations = [Rect(10, 10, 40, 30), Rect(45, 45, 55, 55), Point(50, 50), Rect(-10, -10, 200, 200),
+                     Rect(200, 200, 300, 300)]
+
+        # Act
+        with ShardedRTree.grid(Rect(0, 0, 100, 100), 2, 2) as sharded:
+            for data, rect in items:
+                sharded.insert(data, rect)
+
+            # Assert
+            self.assertEqual(4, len(sharded.partitions))
+            self.assertEqual(500, sum(sharded.sizes))
+            self.assertTrue(all(size > 0 for size in sharded.sizes))
+            self.assert_same_results(reference, sharded, locations)
+            for k in [1, 5, 30]:
+                self.assert_same_nearest(reference, sharded, Rect(50, 50, 50, 50), k)
+                self.assert_same_nearest(reference, sharded, Rect(-20, 30, -20, 30), k)
+            self.assertEqual(500, sum(stats.leaf_entry_count for stats in sharded.stats()))
+
+    def test_routing_by_center(self):
+        """Ensure entries are routed to the partition containing their center (or the nearest partition)."""
+        # Arrange
+        sharded = ShardedRTree.grid(Rect(0, 0, 10, 10), 1, 2, processes=False)
+
+        # Act
+        sharded.insert('left', Rect(1, 1, 2, 2))
+        sharded.insert('straddling', Rect(2, 2, 7, 3))
+        sharded.insert('outside', Rect(20, 5, 21, 6))
+
+        # Assert
+        self.assertEqual([2, 1], sharded.sizes)
+        self.assertEqual(Rect(1, 1, 7, 3), sharded.bounds[0])
+        self.assertEqual(Rect(20, 5, 21, 6), sharded.bounds[1])
+        # Entries extending beyond their partition are still found by queries in the other partition
+        self.assertEqual(['straddling'], [e.data for e in sharded.query(Rect(6, 2, 8, 4))])
+        self.assertEqual(['outside'], [e.data for e in sharded.nearest((30, 5))])
+
+    def test_from_sample(self):
+        """Ensure STR partitioning from a sample balances the shards, with queries matching a single tree."""
+        # Arrange
+        items = self.create_items(400, seed=2)
+        reference = self.create_reference(items)
+
+        # Act
+        sharded = ShardedRTree.from_sample([rect for _, rect in items[::4]], 4, tree_cls=RStarTree, max_entries=4,
+                                           processes=False)
+        sharded.insert_many(items)
+
+        # Assert
+        self.assertEqual(4, len(sharded.partitions))
+        self.assertEqual(400, sum(sharded.sizes))
+        self.assertTrue(all(50 <= size <= 150 for size in sharded.sizes))
+        self.assert_same_results(reference, sharded, [Rect(0, 0, 50, 50), Rect(30, 60, 70, 65), Point(25, 75)])
+        self.assert_same_nearest(reference, sharded, Rect(50, 50, 60, 60), 20)
+
+    def test_nearest_all(self):
+        """Ensure nearest returns every entry, in order of increasing distance, when k is None."""
+        # Arrange
+        items = self.create_items(100, seed=3)
+        reference = self.create_reference(items)
+        sharded = ShardedRTree.grid(Rect(0, 0, 100, 100), 3, 3, processes=False)
+        sharded.insert_many(items)
+
+        # Act
+        result = sharded.nearest((0, 0), None)
+
+        # Assert
+        self.assertEqual(100, len(result))
+        self.assert_same_nearest(reference, sharded, Rect(0, 0, 0, 0), None)
+
+    def test_nearest_empty(self):
+        """Ensure nearest returns no entries for an empty tree."""
+        # Arrange
+        sharded = ShardedRTree.grid(Rect(0, 0, 100, 100), 2, 2, processes=False)
+
+        # Act/Assert
+        self.assertEqual([], sharded.nearest((0, 0), 3))
+        self.assertEqual([], sharded.query(Rect(0, 0, 100, 100)))
+        self.assertEqual(0, sharded.count(Rect(0, 0, 100, 100)))
+
+    def test_worker_error(self):
+        """Ensure an error raised by a worker process is raised by the sharded tree."""
+        # Arrange
+        with ShardedRTree.grid(Rect(0, 0, 10, 10), 1, 1) as sharded:
+            sharded.insert('a', Rect(1, 1, 2, 2))
+
+            # Act/Assert
+            with self.assertRaises(ValueError):
+                sharded._fan_out([0], 'unknown')
+            self.assertEqual(1, sharded.count((1, 1)))
+
+    def test_invalid_partitions(self):
+        """Ensure invalid partitioning parameters raise a ValueError."""
+        with self.assertRaises(ValueError):
+            ShardedRTree([], processes=False)
+        with self.assertRaises(ValueError):
+            ShardedRTree.grid(Rect(0, 0, 1, 1), 0, 2, processes=False)
+        with self.assertRaises(ValueError):
+            ShardedRTree.from_sample([], 2, processes=False)
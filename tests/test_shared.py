@@ -0,0 +1,197 @@
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+from unittest import TestCase, skipUnless
+from rtreelib import RTree, RStarTree, Rect, Point
+from rtreelib.shared import SharedRTree
+from tests.util import create_complex_tree
+
+QUERIES = [Rect(10, 10, 40, 30), Rect(45, 45, 55, 55), Point(50, 50), Point(3.5, 7.25), Rect(-10, -10, 200, 200),
+           Rect(200, 200, 300, 300), (20, 20, 20, 80)]
+
+
+ATTACH_SCRIPT = """
+import sys
+from rtreelib.shared import SharedRTree
+with SharedRTree(sys.argv[1]) as t:
+    print(sorted(e.data for e in t.query((0, 0, 50, 50))))
+"""
+
+SPAWN_SCRIPT = """
+import multiprocessing
+from tests.test_shared import TestShared, _query_worker
+from rtreelib.shared import SharedRTree
+if __name__ == '__main__':
+    published = SharedRTree.publish(TestShared.create_tree(300))
+    with multiprocessing.get_context('spawn').Pool(2) as pool:
+        print(pool.map(_query_worker, [(published, loc) for loc in [(10, 10, 60, 60), (50, 50), (90, 5)]]))
+    published.unlink()
+"""
+
+
+def _query_worker(args):
+    t, loc = args
+    return sorted(e.data for e in t.query(loc)), [e.data for e in t.nearest(loc, 5)]
+
+
+class TestShared(TestCase):
+    """Tests for R-trees stored in shared memory"""
+
+    @staticmethod
+    def create_tree(count: int, tree_cls=RTree):
+        rnd = random.Random(1)
+        t = tree_cls(max_entries=4)
+        for i in range(count):
+            x, y = rnd.uniform(0, 100), rnd.uniform(0, 100)
+            t.insert(f'item{i}', Rect(x, y, x + rnd.uniform(0, 5), y + rnd.uniform(0, 5)))
+        return t
+
+    @staticmethod
+    def get_env():
+        """Returns the environment for running scripts that import the package (and the tests) in a new interpreter."""
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+
+    def test_query(self):
+        """Ensure queries against a shared tree return the same entries (in the same order) as the original tree."""
+        # Arrange
+        t = self.create_tree(300)
+
+        # Act
+        with SharedRTree.publish(t) as shared:
+
+            # Assert
+            for loc in QUERIES:
+                expected = [(e.data, e.rect) for e in t.query(loc)]
+                self.assertEqual(expected, [(e.data, e.rect) for e in shared.query(loc)])
+                self.assertEqual(len(expected), shared.count(loc))
+
+    def test_query_complex_tree(self):
+        """Ensure queries against a shared copy of the complex test tree match the original tree."""
+        # Arrange
+        t = create_complex_tree(self)
+
+        # Act
+        with SharedRTree.publish(t) as shared:
+
+            # Assert
+            for loc in [Rect(2, 5, 8, 9), Point(5, 8), Rect(0, 0, 100, 100)]:
+                self.assertEqual([e.data for e in t.query(loc)], [e.data for e in shared.query(loc)])
+
+    def test_nearest(self):
+        """Ensure nearest returns entries at the same distances as the original tree."""
+        # Arrange
+        t = self.create_tree(300, tree_cls=RStarTree)
+
+        # Act
+        with SharedRTree.publish(t) as shared:
+
+            # Assert
+            for loc, k in [((50, 50), 1), ((50, 50), 10), ((-20, 130), 7), ((10, 10, 30, 20), 25), ((0, 0), None)]:
+                self.assertEqual([e.rect for e in t.nearest(loc, k)], [e.rect for e in shared.nearest(loc, k)])
+
+    def test_attach(self):
+        """Ensure a tree can be attached to by name, using zero-copy views of the shared memory block."""
+        # Arrange
+        t = self.create_tree(100)
+        published = SharedRTree.publish(t)
+
+        # Act
+        try:
+            with SharedRTree(published.name) as attached:
+                result = [e.data for e in attached.query(Rect(0, 0, 50, 50))]
+                arrays = attached._arrays
+                rects = arrays.entry_rects
+                max_entries = attached.max_entries
+        finally:
+            published.unlink()
+
+        # Assert
+        self.assertEqual([e.data for e in t.query(Rect(0, 0, 50, 50))], result)
+        self.assertEqual(4, max_entries)
+        if sys.byteorder == 'little':
+            self.assertIsInstance(rects, memoryview)
+
+    def test_empty_tree(self):
+        """Ensure an empty tree can be published and queried."""
+        # Act
+        with SharedRTree.publish(RTree()) as shared:
+
+            # Assert
+            self.assertEqual([], list(shared.query(Rect(0, 0, 10, 10))))
+            self.assertEqual([], list(shared.nearest((0, 0), 3)))
+
+    def test_closed(self):
+        """Ensure querying a closed tree raises a RuntimeError."""
+        # Arrange
+        shared = SharedRTree.publish(self.create_tree(10))
+        shared.unlink()
+
+        # Act/Assert
+        with self.assertRaises(RuntimeError):
+            list(shared.query((1, 1)))
+
+    @skipUnless('fork' in multiprocessing.get_all_start_methods(), 'Requires the fork start method')
+    def test_worker_processes(self):
+        """Ensure worker processes can query a tree passed to them (which attaches to it by name)."""
+        # Arrange
+        t = self.create_tree(300)
+        locations = [(10, 10, 60, 60), (50, 50), (90, 5)]
+
+        # Act
+        with SharedRTree.publish(t) as shared:
+            with multiprocessing.get_context('fork').Pool(2) as pool:
+                results = pool.map(_query_worker, [(shared, loc) for loc in locations])
+
+        # Assert
+        for loc, (query_result, nearest_result) in zip(locations, results):
+            self.assertEqual(sorted(e.data for e in t.query(loc)), query_result)
+            self.assertEqual([e.data for e in t.nearest(loc, 5)], nearest_result)
+
+    def test_attach_from_separate_processes(self):
+        """
+        Ensure processes that attach to a tree and exit (each with its own resource tracker) do not free the block,
+        so that other processes can attach to it afterwards, and the publisher can still unlink it.
+        """
+        # Arrange
+        t = self.create_tree(100)
+        expected = str(sorted(e.data for e in t.query((0, 0, 50, 50))))
+        published = SharedRTree.publish(t)
+
+        # Act
+        try:
+            results = [subprocess.run([sys.executable, '-c', ATTACH_SCRIPT, published.name], env=self.get_env(),
+                                      capture_output=True, text=True, timeout=60)
+                       for _ in range(2)]
+            result = sorted(e.data for e in published.query((0, 0, 50, 50)))
+        finally:
+            published.unlink()
+
+        # Assert
+        for process in results:
+            self.assertEqual(0, process.returncode, process.stderr)
+            self.assertEqual(expected, process.stdout.strip())
+            self.assertNotIn('leaked', process.stderr)
+        self.assertEqual(expected, str(result))
+
+    @skipUnless('spawn' in multiprocessing.get_all_start_methods(), 'Requires the spawn start method')
+    def test_spawn_worker_processes(self):
+        """
+        Ensure spawned worker processes (which share the resource tracker of the publishing process) can query a tree,
+        without removing the publisher's registration of the block, so that it can still be unlinked cleanly.
+        """
+        # Arrange
+        t = self.create_tree(300)
+        locations = [(10, 10, 60, 60), (50, 50), (90, 5)]
+
+        # Act
+        # The scenario runs in a new interpreter, so that the output of its resource tracker can be captured
+        process = subprocess.run([sys.executable, '-c', SPAWN_SCRIPT], env=self.get_env(), capture_output=True,
+                                 text=True, timeout=120)
+
+        # Assert
+        self.assertEqual(0, process.returncode, process.stderr)
+        self.assertEqual('', process.stderr)
+        self.assertEqual(str([_query_worker((t, loc)) for loc in locations]), process.stdout.strip())
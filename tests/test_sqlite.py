@@ -0,0 +1,159 @@
+import os
+import random
+import sqlite3
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+from rtreelib import RTree, RStarTree, Rect
+from rtreelib import sqlite
+from tests.util import create_complex_tree, assert_same_structure
+
+
+class TestSQLite(TestCase):
+    """Tests for exporting R-trees to (and importing R-trees from) SQLite"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        os.remove(self.path)
+        self.conn = sqlite3.connect(self.path)
+
+    def tearDown(self):
+        self.conn.close()
+        for suffix in ['', '-wal', '-shm']:
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def test_create_tables(self):
+        """Ensure the tables are created with the given page size, in WAL mode."""
+        # Act
+        sqlite.create_rtree_tables(self.conn, page_size=8192)
+
+        # Assert
+        tables = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        self.assertEqual({'rtree', 'rtree_node', 'rtree_entry'}, tables)
+        self.assertEqual(8192, self.conn.execute('PRAGMA page_size').fetchone()[0])
+        self.assertEqual('wal', self.conn.execute('PRAGMA journal_mode').fetchone()[0])
+
+    def test_round_trip(self):
+        """Ensure an exported tree can be imported with exactly the same structure."""
+        # Arrange
+        t = create_complex_tree(self)
+        sqlite.create_rtree_tables(self.conn)
+
+        # Act
+        rtree_id = sqlite.export_to_sqlite(t, self.conn)
+        result = sqlite.import_from_sqlite(rtree_id, self.conn)
+
+        # Assert
+        self.assertEqual(1, rtree_id)
+        assert_same_structure(self, t.root, result.root)
+
+    def test_round_trip_preserves_data_types(self):
+        """Ensure the data of leaf entries is stored as is when no data type is given."""
+        # Arrange
+        t = RTree()
+        for i, data in enumerate([1, 2.5, 'a', b'\x00\x01', None]):
+            t.insert(data, Rect(i, i, i + 1, i + 1))
+        sqlite.create_rtree_tables(self.conn)
+
+        # Act
+        result = sqlite.import_from_sqlite(sqlite.export_to_sqlite(t, self.conn), self.conn)
+
+        # Assert
+        self.assertEqual([1, 2.5, 'a', b'\x00\x01', None], [e.data for e in result.get_leaf_entries()])
+
+    def test_multiple_trees(self):
+        """Ensure multiple trees can be exported to the same tables, and imported separately."""
+        # Arrange
+        rnd = random.Random(7)
+        trees = []
+        for _ in range(3):
+            t = RStarTree(max_entries=4)
+            for i in range(rnd.randint(1, 60)):
+                x, y = rnd.uniform(0, 100), rnd.uniform(0, 100)
+                t.insert(i, Rect(x, y, x + 1, y + 1))
+            trees.append(t)
+        sqlite.create_rtree_tables(self.conn, datatype=int)
+
+        # Act
+        ids = [sqlite.export_to_sqlite(t, self.conn) for t in trees]
+        results = [sqlite.import_from_sqlite(i, self.conn, tree_cls=RStarTree, max_entries=4) for i in ids]
+
+        # Assert
+        self.assertEqual([1, 2, 3], ids)
+        for t, result in zip(trees, results):
+            self.assertIsInstance(result, RStarTree)
+            assert_same_structure(self, t.root, result.root)
+
+    def test_export_is_a_single_transaction(self):
+        """Ensure a failed export is rolled back completely."""
+        # Arrange
+        t = create_complex_tree(self)
+        sqlite.create_rtree_tables(self.conn)
+
+        # Act
+        with patch.object(sqlite, '_entry_rows', side_effect=RuntimeError("failed")):
+            with self.assertRaises(RuntimeError):
+                sqlite.export_to_sqlite(t, self.conn)
+
+        # Assert
+        for table in ['rtree', 'rtree_node', 'rtree_entry']:
+            self.assertEqual(0, self.conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0])
+        self.assertFalse(self.conn.in_transaction)
+
+    def test_spatial_index(self):
+        """Ensure the leaf entries can be queried using SQLite's R*Tree module."""
+        # Arrange
+        t = create_complex_tree(self)
+        sqlite.create_rtree_tables(self.conn, spatial_index=True)
+        loc = Rect(2, 3, 5, 6)
+
+        # Act
+        sqlite.export_to_sqlite(t, self.conn, spatial_index=True)
+        rows = self.conn.execute(
+            'SELECT e.data FROM rtree_entry_index i JOIN rtree_entry e ON e.id = i.id '
+            'WHERE i.max_x > ? AND i.min_x < ? AND i.max_y > ? AND i.min_y < ?',
+            (loc.min_x, loc.max_x, loc.min_y, loc.max_y)).fetchall()
+
+        # Assert
+        self.assertCountEqual([e.data for e in t.query(loc)], [row[0] for row in rows])
+
+    def test_connect_with_kwargs(self):
+        """Ensure a connection is opened (and closed) when connection keyword arguments are given."""
+        # Arrange
+        t = create_complex_tree(self)
+        sqlite.create_rtree_tables(database=self.path)
+
+        # Act
+        rtree_id = sqlite.export_to_sqlite(t, database=self.path)
+        result = sqlite.import_from_sqlite(rtree_id, database=self.path)
+
+        # Assert
+        assert_same_structure(self, t.root, result.root)
+
+    def test_import_missing_tree(self):
+        """Ensure an error is raised if the tree does not exist."""
+        # Arrange
+        sqlite.create_rtree_tables(self.conn)
+
+        # Act/Assert
+        with self.assertRaises(ValueError):
+            sqlite.import_from_sqlite(1, self.conn)
+
+    def test_drop_tables(self):
+        """Ensure all tables are dropped."""
+        # Arrange
+        sqlite.create_rtree_tables(self.conn, spatial_index=True)
+
+        # Act
+        sqlite.drop_rtree_tables(self.conn)
+
+        # Assert
+        self.assertEqual([], self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall())
+
+    def test_requires_connection(self):
+        """Ensure an error is raised if neither a connection nor connection keyword arguments are given."""
+        # Act/Assert
+        with self.assertRaises(RuntimeError):
+            sqlite.create_rtree_tables()
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import xml.etree.ElementTree as ElementTree
+from unittest import TestCase
+from rtreelib import RTree, Rect
+from rtreelib.svg import export_svg
+from tests.util import create_complex_tree
+
+_NS = {'svg': 'http://www.w3.org/2000/svg'}
+
+
+class TestSVG(TestCase):
+    """Tests for exporting R-tree plots to SVG"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.svg')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def export(self, t: RTree, **kwargs) -> dict:
+        """Exports the tree and returns the rects of each group (keyed by class), as (x, y, width, height) tuples."""
+        export_svg(t, self.path, **kwargs)
+        root = ElementTree.parse(self.path).getroot()
+        return {g.get('class'): [tuple(float(r.get(a)) for a in ['x', 'y', 'width', 'height'])
+                                 for r in g.findall('svg:rect', _NS)]
+                for g in root.findall('svg:g', _NS)}
+
+    def test_export_svg(self):
+        """Ensure the leaf entries and the nodes of each level are written to separate groups."""
+        # Arrange
+        t = create_complex_tree(self)
+        levels = t.get_levels()
+
+        # Act
+        groups = self.export(t)
+
+        # Assert
+        self.assertEqual(['leaf-entries', 'level-2', 'level-1', 'level-0'], list(groups.keys()))
+        self.assertCountEqual([(e.rect.min_x, -e.rect.max_y, e.rect.width, e.rect.height)
+                               for e in t.get_leaf_entries()], groups['leaf-entries'])
+        for i, nodes in enumerate(levels):
+            rects = [n.get_bounding_rect() for n in nodes]
+            self.assertCountEqual([(r.min_x, -r.max_y, r.width, r.height) for r in rects], groups[f'level-{i}'])
+
+    def test_export_svg_levels(self):
+        """Ensure only the requested levels are written."""
+        # Arrange
+        t = create_complex_tree(self)
+
+        # Act
+        groups = self.export(t, levels=[0, 2, 5], leaf_entries=False)
+
+        # Assert
+        self.assertEqual(['level-2', 'level-0'], list(groups.keys()))
+
+    def test_export_svg_view_box(self):
+        """Ensure the view box covers the (padded) bounding rectangle of the tree, with the y axis flipped."""
+        # Arrange
+        t = RTree()
+        t.insert('a', Rect(0, 0, 10, 5))
+        t.insert('b', Rect(40, 20, 50, 25))
+
+        # Act
+        export_svg(t, self.path, width=500, title='a & b')
+
+        # Assert
+        root = ElementTree.parse(self.path).getroot()
+        self.assertEqual([-1, -26, 52, 27], [float(v) for v in root.get('viewBox').split()])
+        self.assertEqual(('500', '260'), (root.get('width'), root.get('height')))
+        self.assertEqual('a & b', root.find('svg:title', _NS).text)
+
+    def test_export_empty_tree(self):
+        """Ensure an empty tree can be exported."""
+        # Act
+        groups = self.export(RTree())
+
+        # Assert
+        self.assertEqual({'leaf-entries': [], 'level-0': []}, groups)
@@ -4,7 +4,7 @@ Utility functions for creating R-trees shared across multiple tests. These use t
 
 from typing import Dict, Optional
 from unittest import TestCase
-from rtreelib import Rect, RTree, RTreeEntry, RTreeNode
+from rtreelib import Rect, RTree, RTreeBase, RTreeEntry, RTreeNode
 
 
 def create_simple_tree(test: TestCase, nodes: Optional[Dict[str, RTreeNode]] = None,
@@ -214,3 +214,37 @@ def create_complex_tree(test: TestCase, nodes: Optional[Dict[str, RTreeNode]] =
 
 def get_entry(node: RTreeNode, data: str):
     return next((e for e in node.entries if e.data == data))
+
+
+def assert_valid_tree(test: TestCase, t: RTreeBase) -> None:
+    """
+    Asserts that the R-tree is structurally valid: all leaves are at the same level, every node (other than the root)
+    has between min_entries and max_entries entries, parent pointers are consistent, and the rectangle of every
+    non-leaf entry is the bounding rectangle of its child node.
+    """
+    levels = t.get_levels()
+    for i, level in enumerate(levels):
+        for node in level:
+            test.assertEqual(i == len(levels) - 1, node.is_leaf)
+            test.assertLessEqual(len(node.entries), t.max_entries)
+            if not node.is_root:
+                test.assertGreaterEqual(len(node.entries), t.min_entries)
+            if not node.is_leaf:
+                for entry in node.entries:
+                    test.assertIs(node, entry.child.parent)
+                    test.assertEqual(entry.child.get_bounding_rect(), entry.rect)
+
+
+def assert_same_structure(test: TestCase, expected: RTreeNode, actual: RTreeNode) -> None:
+    """
+    Asserts that two (sub)trees have the same structure: the same nodes, with the same entry rectangles (in the same
+    order) and the same leaf entry data, and with consistent parent pointers in the actual tree.
+    """
+    test.assertEqual(expected.is_leaf, actual.is_leaf)
+    test.assertEqual([e.rect for e in expected.entries], [e.rect for e in actual.entries])
+    for e1, e2 in zip(expected.entries, actual.entries):
+        if e1.is_leaf:
+            test.assertEqual(e1.data, e2.data)
+        else:
+            test.assertIs(actual, e2.child.parent)
+            assert_same_structure(test, e1.child, e2.child)